@@ -0,0 +1,317 @@
+"""
+Appels à l'API OpenAI (ou à un serveur compatible, cf. OPENAI_BASE_URL) et préparation du contexte pour la commande ai.
+"""
+
+import json
+import asyncio
+from datetime import datetime
+import aiohttp
+
+from config import (
+    OPENAI_API_KEY,
+    OPENAI_MODEL,
+    OPENAI_BASE_URL,
+    OPENAI_AUTH_HEADER,
+    OPENAI_AUTH_SCHEME,
+    AI_MAX_TOKENS,
+    AI_HTTP_POOL_LIMIT,
+    AI_HTTP_TIMEOUT,
+    AI_HTTP_CONNECT_TIMEOUT,
+    AI_HTTP_KEEPALIVE,
+    AI_STREAM_EDIT_INTERVAL,
+    AI_ARCHIVE_SCOPE,
+)
+from rate_limit import scheduler as default_scheduler, route_key
+from metrics import metrics
+
+DEFAULT_BASE_URL = 'https://api.openai.com/v1'
+SYSTEM_PROMPT = 'Tu es un assistant francophone pour Discord. Réponds de façon concise.'
+AI_TEMPERATURE = 0.7
+
+
+class PooledSession:
+    """Session aiohttp unique et réutilisée pour tous les appels à l'IA.
+
+    Les connexions restent ouvertes (keep-alive) entre deux commandes: plus de
+    résolution DNS ni de poignée de main TLS à chaque `!ai`. La session est créée
+    au premier appel et fermée par `close()` (à l'arrêt du client, pas lors des reconnexions).
+    """
+
+    def __init__(self, limit: int = AI_HTTP_POOL_LIMIT, timeout: float = AI_HTTP_TIMEOUT,
+                 connect_timeout: float = AI_HTTP_CONNECT_TIMEOUT, keepalive: float = AI_HTTP_KEEPALIVE):
+        self.limit = limit
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.keepalive = keepalive
+        self._session = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> aiohttp.ClientSession:
+        """Renvoie la session partagée (créée si besoin)."""
+        if self._session is not None and not self._session.closed:
+            return self._session
+        async with self._lock:
+            if self._session is None or self._session.closed:
+                connector = aiohttp.TCPConnector(
+                    limit=self.limit,
+                    keepalive_timeout=self.keepalive,
+                    ttl_dns_cache=300,
+                )
+                self._session = aiohttp.ClientSession(
+                    connector=connector,
+                    timeout=aiohttp.ClientTimeout(total=self.timeout, connect=self.connect_timeout),
+                )
+        return self._session
+
+    async def close(self):
+        """Ferme la session et ses connexions (elle sera recréée au prochain appel)."""
+        session, self._session = self._session, None
+        if session is not None and not session.closed:
+            await session.close()
+
+
+# Session partagée par toutes les commandes IA
+http_session = PooledSession()
+
+
+def build_chat_payload(prompt: str, stream: bool = False, system_prompt: str = SYSTEM_PROMPT, max_tokens: int = AI_MAX_TOKENS) -> dict:
+    """Corps de la requête chat/completions."""
+    payload = {
+        'model': OPENAI_MODEL,
+        'messages': [
+            {
+                'role': 'system',
+                'content': system_prompt
+            },
+            {
+                'role': 'user',
+                'content': prompt
+            }
+        ],
+        'temperature': AI_TEMPERATURE,
+        'max_tokens': max_tokens
+    }
+    if stream:
+        payload['stream'] = True
+        # Le dernier événement du flux porte alors le nombre de tokens consommés
+        payload['stream_options'] = {'include_usage': True}
+    return payload
+
+
+def chat_completions_url() -> str:
+    """URL de chat/completions du serveur configuré (OPENAI_BASE_URL)."""
+    return OPENAI_BASE_URL.rstrip('/') + '/chat/completions'
+
+
+def _auth_headers() -> dict:
+    headers = {'Content-Type': 'application/json'}
+    if OPENAI_API_KEY:
+        headers[OPENAI_AUTH_HEADER] = f'{OPENAI_AUTH_SCHEME} {OPENAI_API_KEY}' if OPENAI_AUTH_SCHEME else OPENAI_API_KEY
+    elif OPENAI_BASE_URL.rstrip('/') == DEFAULT_BASE_URL:
+        # Un serveur local peut se passer de clé, pas l'API d'OpenAI
+        raise RuntimeError('OPENAI_API_KEY manquant dans le fichier .env')
+    return headers
+
+
+async def _error_message(resp) -> str:
+    # Les serveurs locaux ne renvoient pas toujours une erreur JSON au format d'OpenAI
+    try:
+        data = await resp.json(content_type=None)
+        return data.get('error', {}).get('message', 'Erreur inconnue')
+    except (aiohttp.ContentTypeError, json.JSONDecodeError, AttributeError):
+        return f'HTTP {resp.status}'
+
+
+def record_usage(payload: dict, usage: dict = None, completion: str = ''):
+    """Compte les tokens d'une requête réussie: `usage` renvoyé par le serveur, sinon une estimation."""
+    if usage and usage.get('prompt_tokens') is not None:
+        metrics.ai_usage(usage.get('prompt_tokens', 0), usage.get('completion_tokens', 0))
+        return
+    from ai_context import count_tokens  # Import local: ai_context dépend de ce module
+    prompt_tokens = sum(count_tokens(message['content']) for message in payload['messages'])
+    metrics.ai_usage(prompt_tokens, count_tokens(completion), estimated=True)
+
+
+async def call_openai_chat(prompt: str, **options) -> str:
+    """Interroge l'API d'OpenAI et renvoie la réponse textuelle (options: system_prompt, max_tokens)."""
+    headers = _auth_headers()
+    payload = build_chat_payload(prompt, **options)
+
+    session = await http_session.get()
+    async with session.post(chat_completions_url(), json=payload, headers=headers) as resp:
+        if resp.status != 200:
+            metrics.ai_usage(0, 0, outcome='error')
+            raise RuntimeError(f'API OpenAI: {await _error_message(resp)}')
+        data = await resp.json(content_type=None)
+        choices = data.get('choices')
+        if not choices:
+            metrics.ai_usage(0, 0, outcome='error')
+            raise RuntimeError('Réponse vide de la part de l’IA')
+        content = choices[0]['message']['content']
+        record_usage(payload, data.get('usage'), content)
+        return content.strip()
+
+
+async def stream_openai_chat(prompt: str):
+    """Interroge l'API en mode streaming (server-sent events) et renvoie les morceaux de texte au fil de l'eau."""
+    headers = _auth_headers()
+    payload = build_chat_payload(prompt, stream=True)
+
+    session = await http_session.get()
+    async with session.post(chat_completions_url(), json=payload, headers=headers) as resp:
+        if resp.status != 200:
+            metrics.ai_usage(0, 0, outcome='error')
+            raise RuntimeError(f'API OpenAI: {await _error_message(resp)}')
+
+        usage = None
+        parts = []
+        # Chaque événement est une ligne "data: {...}", le flux se termine par "data: [DONE]"
+        async for raw_line in resp.content:
+            line = raw_line.decode('utf-8').strip()
+            if not line.startswith('data:'):
+                continue
+            data = line[len('data:'):].strip()
+            if data == '[DONE]':
+                break
+            try:
+                chunk = json.loads(data)
+            except json.JSONDecodeError:
+                continue
+            usage = chunk.get('usage') or usage
+            choices = chunk.get('choices') or []
+            if not choices:
+                continue
+            delta = choices[0].get('delta', {}).get('content')
+            if delta:
+                parts.append(delta)
+                yield delta
+        record_usage(payload, usage, ''.join(parts))
+
+
+class ThrottledEditor:
+    """Édite un message au plus une fois par `interval` secondes en ne gardant que le dernier contenu.
+
+    Les mises à jour arrivées entre deux éditions sont fusionnées: le message
+    suit le texte généré sans dépasser la limite d'édition de Discord.
+    """
+
+    def __init__(self, message, interval: float = AI_STREAM_EDIT_INTERVAL, scheduler=None):
+        self.message = message
+        self.interval = interval
+        self.scheduler = scheduler or default_scheduler
+        self.route = route_key('PATCH', f'/channels/{message.channel.id}/messages/{message.id}')
+        self.edits = 0
+        self._pending = None
+        self._sent = None
+        self._next_edit_at = 0.0
+        self._task = None
+
+    def update(self, content: str):
+        """Programme un nouveau contenu (non bloquant)."""
+        self._pending = content
+        if self._task is None:
+            self._task = asyncio.ensure_future(self._flush())
+
+    async def _flush(self):
+        loop = asyncio.get_running_loop()
+        try:
+            while self._pending is not None and self._pending != self._sent:
+                delay = self._next_edit_at - loop.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                content = self._pending
+                self._next_edit_at = loop.time() + self.interval
+                try:
+                    await self.scheduler.call(self.route, self.message.edit, content=content)
+                    self.edits += 1
+                except Exception as e:
+                    print(f'⚠️  Édition progressive impossible: {e}')
+                self._sent = content
+        finally:
+            self._task = None
+
+    def stop(self):
+        """Abandonne les éditions en attente (message supprimé ou modifié entre-temps)."""
+        self._pending = None
+        if self._task is not None:
+            self._task.cancel()
+
+    async def finish(self, content: str):
+        """Envoie le contenu final et attend que la dernière édition soit faite."""
+        self.update(content)
+        while self._task is not None:
+            await self._task
+
+
+def build_ai_prompt(context_text: str, user_prompt: str) -> str:
+    """Assemble le contexte du salon et l'instruction de l'utilisateur."""
+    prompt_parts = [
+        'Contexte récent de la conversation:',
+        context_text,
+        '',
+        'Instruction:',
+    ]
+    if user_prompt:
+        prompt_parts.append(user_prompt)
+    else:
+        prompt_parts.append('Réponds naturellement au dernier message du contexte.')
+    return '\n'.join(prompt_parts)
+
+
+def truncate_reply(text: str, limit: int = 1900) -> str:
+    """Coupe une réponse trop longue pour un message Discord."""
+    return text[:limit] + '…' if len(text) > limit else text
+
+
+async def fetch_recent_records(channel, limit: int, buffer=None) -> list:
+    """Les `limit` derniers messages du salon, du plus ancien au plus récent, en tuples (id, author_id, author_name, content).
+
+    Avec un `buffer` (message_cache.MessageRingBuffer), les messages sont lus en mémoire;
+    `channel.history()` n'est appelé qu'au démarrage à froid, pour remplir le tampon.
+    """
+    records = buffer.recent(channel.id, limit) if buffer is not None else None
+    if records is None:
+        history = [msg async for msg in channel.history(limit=limit)]
+        if buffer is not None:
+            buffer.stats['cold_fetches'] += 1
+            buffer.seed(channel.id, history)
+        history.reverse()
+        records = [(msg.id, msg.author.id, msg.author.display_name, msg.content) for msg in history]
+    return records
+
+
+def search_related(archive, channel, query: str, exclude_ids) -> list:
+    """Messages archivés les plus proches de `query` (message_archive.MessageArchive), en lignes de contexte."""
+    if AI_ARCHIVE_SCOPE == 'guild' and getattr(channel, 'guild', None):
+        hits = archive.search(query, guild_id=channel.guild.id, exclude_ids=exclude_ids)
+    else:
+        hits = archive.search(query, channel_id=channel.id, exclude_ids=exclude_ids)
+    lines = []
+    for _, author_name, content, created_at in hits:
+        date = datetime.fromtimestamp(created_at).strftime('%d/%m/%Y') if created_at else '?'
+        lines.append(f'[{date}] {author_name}: {content}')
+    return lines
+
+
+async def build_conversation_context(channel, limit: int, me, ignore_id: int = None, buffer=None, builder=None,
+                                     archive=None, query: str = None) -> str:
+    """Prépare un résumé textuel des derniers messages du salon.
+
+    Avec un `builder` (ai_context.ContextBuilder), le contexte est ajusté à un budget de tokens
+    et les messages plus anciens sont remplacés par un résumé. Avec une `archive`, les messages
+    anciens les plus proches de `query` (ou du dernier message) sont ajoutés.
+    """
+    entries = []
+    for message_id, author_id, author_name, content in await fetch_recent_records(channel, limit, buffer):
+        if ignore_id and message_id == ignore_id:
+            continue
+        if content:
+            author = 'Moi' if me and author_id == me.id else author_name
+            entries.append((message_id, f'{author}: {content}'))
+    if builder is not None:
+        related = []
+        if archive is not None:
+            exclude_ids = {message_id for message_id, _ in entries} | {ignore_id}
+            related = search_related(archive, channel, query or (entries[-1][1] if entries else ''), exclude_ids)
+        return builder.build(channel.id, entries, related=related)
+    return '\n'.join(line for _, line in entries) if entries else 'Aucun contexte disponible.'
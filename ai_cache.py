@@ -0,0 +1,136 @@
+"""
+Cache des réponses de l'IA à deux niveaux.
+
+1. LRU en mémoire (OrderedDict), consulté en premier
+2. SQLite sur disque (exports/ai_cache.sqlite), qui survit aux redémarrages
+
+La clé est le hash de (modèle, prompt système, prompt construit, température,
+max_tokens, endpoint): une même instruction sur un contexte inchangé ne refait
+pas d'appel payant, et changer de serveur (OPENAI_BASE_URL) ou de longueur de
+réponse (AI_MAX_TOKENS) ne ressert pas les anciennes réponses.
+Les entrées expirent après `ttl` secondes et les plus anciennes sont évincées
+quand le fichier dépasse `max_bytes`.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+from collections import OrderedDict
+
+from config import EXPORT_DIR, AI_CACHE_TTL, AI_CACHE_MEMORY_ENTRIES, AI_CACHE_MAX_BYTES
+
+CACHE_PATH = os.path.join(EXPORT_DIR, 'ai_cache.sqlite')
+
+
+def cache_key(model: str, system_prompt: str, prompt: str, temperature: float, max_tokens: int, endpoint: str) -> str:
+    """Hash stable des paramètres qui déterminent la réponse."""
+    raw = json.dumps([model, system_prompt, prompt, temperature, max_tokens, endpoint], ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+class AIResponseCache:
+    """LRU en mémoire devant un cache SQLite, avec TTL et éviction par taille."""
+
+    def __init__(self, path: str = CACHE_PATH, ttl: float = AI_CACHE_TTL,
+                 memory_entries: int = AI_CACHE_MEMORY_ENTRIES, max_bytes: int = AI_CACHE_MAX_BYTES):
+        self.path = path
+        self.ttl = ttl
+        self.memory_entries = memory_entries
+        self.max_bytes = max_bytes
+        self.memory = OrderedDict()  # Clé -> (réponse, date de création)
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+        self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS responses ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, size INTEGER NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS responses_created_at ON responses (created_at)')
+            self._db.commit()
+        return self._db
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self.memory[key] = (value, created_at)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.memory_entries:
+            self.memory.popitem(last=False)
+
+    def get(self, key: str):
+        """Réponse en cache pour cette clé, ou None."""
+        now = time.time()
+        entry = self.memory.get(key)
+        if entry is not None:
+            value, created_at = entry
+            if now - created_at <= self.ttl:
+                self.memory.move_to_end(key)
+                self.stats['memory_hits'] += 1
+                return value
+            del self.memory[key]
+
+        row = self._conn().execute('SELECT value, created_at FROM responses WHERE key = ?', (key,)).fetchone()
+        if row is not None:
+            value, created_at = row
+            if now - created_at <= self.ttl:
+                self._remember(key, value, created_at)
+                self.stats['disk_hits'] += 1
+                return value
+            self._conn().execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._conn().commit()
+
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, key: str, value: str):
+        """Ajoute une réponse dans les deux niveaux."""
+        now = time.time()
+        self._remember(key, value, now)
+        db = self._conn()
+        db.execute('INSERT OR REPLACE INTO responses (key, value, created_at, size) VALUES (?, ?, ?, ?)',
+                   (key, value, now, len(value.encode('utf-8'))))
+        self.stats['stores'] += 1
+        self._evict(db, now)
+        db.commit()
+
+    def _evict(self, db: sqlite3.Connection, now: float):
+        # Entrées expirées, puis les plus anciennes tant que le total dépasse max_bytes
+        expired = db.execute('DELETE FROM responses WHERE created_at < ?', (now - self.ttl,)).rowcount
+        self.stats['evictions'] += max(0, expired)
+        total = db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in db.execute('SELECT key, size FROM responses ORDER BY created_at').fetchall():
+            if total <= self.max_bytes:
+                break
+            db.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self.memory.pop(key, None)
+            total -= size
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        """Vide les deux niveaux."""
+        self.memory.clear()
+        db = self._conn()
+        db.execute('DELETE FROM responses')
+        db.commit()
+
+    def summary(self) -> str:
+        """Compteurs lisibles pour la commande aicache."""
+        stats = self.stats
+        hits = stats['memory_hits'] + stats['disk_hits']
+        lookups = hits + stats['misses']
+        rate = f'{hits * 100 / lookups:.0f}%' if lookups else '-'
+        entries = self._conn().execute('SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses').fetchone()
+        return (f'**🧠 Cache IA:** {hits} hits ({stats["memory_hits"]} mémoire, {stats["disk_hits"]} disque), '
+                f'{stats["misses"]} misses, taux {rate}\n'
+                f'💾 {entries[0]} réponses sur disque ({entries[1] // 1024} Ko), {len(self.memory)} en mémoire, '
+                f'{stats["evictions"]} évincées')
+
+
+# Cache partagé par la commande ai
+response_cache = AIResponseCache()
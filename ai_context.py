@@ -0,0 +1,163 @@
+"""
+Contexte de `!ai` ajusté à un budget de tokens, avec résumé glissant par salon.
+
+Les messages les plus récents sont gardés tels quels tant qu'ils tiennent dans
+`AI_CONTEXT_TOKENS`. Les plus anciens, sortis de la fenêtre, sont condensés
+dans un résumé propre au salon. Le résumé n'est rafraîchi (un appel à l'IA, en
+arrière-plan) que lorsque `AI_SUMMARY_EVERY` nouveaux messages en sont sortis:
+les longues conversations gardent leur contexte sans allonger le prompt.
+Les messages anciens retrouvés dans l'archive (message_archive.py) prennent au
+plus `AI_ARCHIVE_TOKENS` du budget.
+
+Le comptage utilise tiktoken s'il est installé (`pip install tiktoken`), sinon
+une estimation d'environ 4 caractères par token.
+"""
+
+import asyncio
+
+from config import OPENAI_MODEL, AI_CONTEXT_TOKENS, AI_SUMMARY_TOKENS, AI_SUMMARY_EVERY, AI_ARCHIVE_TOKENS
+from ai import AI_TEMPERATURE, call_openai_chat, chat_completions_url
+from ai_cache import cache_key
+from ai_requests import ai_requests
+
+CHARS_PER_TOKEN = 4  # Estimation utilisée sans tiktoken
+SUMMARY_PROMPT = ('Tu résumes des conversations Discord en français. Garde les sujets, décisions, questions '
+                  'en suspens et qui a dit quoi d\'important. Réponds uniquement par le résumé.')
+
+_encoding = None
+
+
+def _tiktoken_encoding():
+    """Encodage tiktoken du modèle configuré, ou None si tiktoken n'est pas installé."""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+        except ImportError:
+            _encoding = False
+        else:
+            try:
+                _encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+            except KeyError:
+                _encoding = tiktoken.get_encoding('cl100k_base')
+    return _encoding or None
+
+
+def count_tokens(text: str) -> int:
+    """Nombre de tokens d'un texte (exact avec tiktoken, estimé sinon)."""
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Coupe un texte à `max_tokens` tokens (on garde le début)."""
+    encoding = _tiktoken_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens]) + '…'
+    limit = max_tokens * CHARS_PER_TOKEN
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+async def summarize_messages(previous_summary: str, lines: list, max_tokens: int = AI_SUMMARY_TOKENS) -> str:
+    """Met à jour le résumé d'un salon avec les messages sortis de la fenêtre.
+
+    L'appel passe par `ai_requests`, comme la commande ai: il compte dans
+    `AI_MAX_CONCURRENT` et un résumé identique déjà en cours est rejoint.
+    """
+    parts = []
+    if previous_summary:
+        parts += ['Résumé actuel:', previous_summary, '']
+    parts += ['Nouveaux messages à intégrer:', *lines, '',
+              f'Écris le résumé mis à jour en moins de {max_tokens} tokens.']
+    prompt = '\n'.join(parts)
+    key = cache_key(OPENAI_MODEL, SUMMARY_PROMPT, prompt, AI_TEMPERATURE, max_tokens, chat_completions_url())
+    return await ai_requests.run(
+        key, lambda progress: call_openai_chat(prompt, system_prompt=SUMMARY_PROMPT, max_tokens=max_tokens))
+
+
+class ContextBuilder:
+    """Sélectionne les derniers messages dans un budget de tokens et tient un résumé glissant des plus anciens."""
+
+    def __init__(self, budget: int = AI_CONTEXT_TOKENS, summary_tokens: int = AI_SUMMARY_TOKENS,
+                 refresh_every: int = AI_SUMMARY_EVERY, summarize=summarize_messages, related_tokens: int = AI_ARCHIVE_TOKENS):
+        self.budget = budget
+        self.summary_tokens = summary_tokens
+        self.related_tokens = related_tokens
+        self.refresh_every = refresh_every
+        self.summarize = summarize
+        self.summaries = {}  # ID du salon -> {'text', 'until' (dernier message résumé), 'task'}
+        self.stats = {'builds': 0, 'summaries': 0, 'summary_errors': 0, 'tokens': 0}
+
+    def _state(self, channel_id: int) -> dict:
+        return self.summaries.setdefault(channel_id, {'text': '', 'until': 0, 'task': None})
+
+    def build(self, channel_id: int, entries: list, related=()) -> str:
+        """Contexte d'un salon à partir de ses messages [(id, ligne)], du plus ancien au plus récent.
+
+        `related`: lignes de messages anciens pertinents (archive), dans la limite de `related_tokens`.
+        """
+        state = self._state(channel_id)
+        summary = state['text']
+        header = f'Résumé des messages précédents: {summary}' if summary else ''
+        remaining = self.budget - (count_tokens(header) + 1 if header else 0)
+
+        related_lines = []
+        related_budget = min(self.related_tokens, remaining // 2)
+        for line in related:
+            cost = count_tokens(line) + 1
+            if cost > related_budget:
+                continue
+            related_lines.append(line)
+            related_budget -= cost
+        if related_lines:
+            related_lines.insert(0, 'Messages plus anciens en rapport:')
+            remaining -= sum(count_tokens(line) + 1 for line in related_lines + ['Messages récents:'])
+
+        # Les plus récents d'abord, jusqu'à épuisement du budget
+        kept = []
+        for message_id, line in reversed(entries):
+            cost = count_tokens(line) + 1  # +1 pour le saut de ligne
+            if cost > remaining:
+                if not kept and remaining > 0:
+                    # Le dernier message seul dépasse le budget: on en garde le début
+                    kept.append(truncate_tokens(line, remaining - 1))
+                break
+            kept.append(line)
+            remaining -= cost
+        kept.reverse()
+
+        # Messages sortis de la fenêtre et pas encore résumés
+        overflow = [(message_id, line) for message_id, line in entries[:len(entries) - len(kept)]
+                    if message_id > state['until']]
+        if self.summarize and len(overflow) >= self.refresh_every and state['task'] is None:
+            state['task'] = asyncio.ensure_future(self._refresh(channel_id, overflow))
+
+        lines = ([header] if header else []) + related_lines
+        if related_lines and kept:
+            lines.append('Messages récents:')
+        lines += kept
+        context = '\n'.join(lines) if lines else 'Aucun contexte disponible.'
+        self.stats['builds'] += 1
+        self.stats['tokens'] += count_tokens(context)
+        return context
+
+    async def _refresh(self, channel_id: int, overflow: list):
+        # Le résumé est rafraîchi en arrière-plan: la commande en cours utilise l'ancien
+        state = self._state(channel_id)
+        try:
+            text = await self.summarize(state['text'], [line for _, line in overflow], self.summary_tokens)
+            state['text'] = truncate_tokens(text.strip(), self.summary_tokens)
+            state['until'] = overflow[-1][0]
+            self.stats['summaries'] += 1
+        except Exception as e:
+            self.stats['summary_errors'] += 1
+            print(f'⚠️  Résumé du contexte impossible: {e}')
+        finally:
+            state['task'] = None
+
+
+# Constructeur partagé par la commande ai
+context_builder = ContextBuilder()
@@ -0,0 +1,125 @@
+"""
+Gestion des requêtes IA en vol.
+
+- Concurrence bornée: au plus `AI_MAX_CONCURRENT` appels à l'API en même temps,
+  les suivants attendent leur tour au lieu de s'empiler sur l'API.
+- Single-flight: des commandes identiques lancées pendant qu'une requête est en
+  cours (même clé, cf. ai_cache.cache_key) attendent cette requête au lieu d'en
+  refaire une. En streaming, chacune reçoit la progression.
+- Délai par appel: `AI_REQUEST_DEADLINE` secondes, attente de la file comprise.
+- Annulation: si le message de la commande est supprimé ou modifié, la commande
+  abandonne; la requête partagée est annulée quand plus personne ne l'attend.
+"""
+
+import asyncio
+
+from config import AI_MAX_CONCURRENT, AI_REQUEST_DEADLINE
+
+
+class AIRequestCancelled(Exception):
+    """Le message à l'origine de la requête a été supprimé ou modifié."""
+
+
+class _Flight:
+    """Une requête en cours et les commandes qui l'attendent."""
+
+    def __init__(self):
+        self.task = None
+        self.waiters = 0
+        self.listeners = []
+        self.latest = None
+
+    def progress(self, text: str):
+        self.latest = text
+        for listener in list(self.listeners):
+            listener(text)
+
+
+class AIRequestManager:
+    """Sémaphore + fusion des requêtes identiques + délai + annulation par message."""
+
+    def __init__(self, concurrency: int = AI_MAX_CONCURRENT, deadline: float = AI_REQUEST_DEADLINE):
+        self.concurrency = concurrency
+        self.deadline = deadline
+        self.flights = {}  # Clé -> _Flight
+        self.watched = {}  # ID du message de commande -> (contenu d'origine, futur d'annulation)
+        self.stats = {'started': 0, 'merged': 0, 'cancelled': 0, 'timeouts': 0, 'errors': 0}
+        self._semaphore = None
+
+    async def _execute(self, key: str, flight: _Flight, produce):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        try:
+            async with self._semaphore:
+                return await produce(flight.progress)
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            if self.flights.get(key) is flight:
+                del self.flights[key]
+
+    async def run(self, key: str, produce, message_id: int = None, command_text: str = None, on_progress=None):
+        """Exécute `produce(progress)` (ou rejoint la requête identique en cours) et renvoie son résultat.
+
+        `on_progress(texte)` reçoit le texte partiel en streaming. Lève AIRequestCancelled si le
+        message `message_id` est supprimé ou modifié, RuntimeError si le délai est dépassé.
+        """
+        flight = self.flights.get(key)
+        if flight is None:
+            flight = self.flights[key] = _Flight()
+            flight.task = asyncio.ensure_future(self._execute(key, flight, produce))
+            self.stats['started'] += 1
+        else:
+            self.stats['merged'] += 1
+            if on_progress and flight.latest is not None:
+                on_progress(flight.latest)
+        flight.waiters += 1
+        if on_progress:
+            flight.listeners.append(on_progress)
+
+        waiting = [flight.task]
+        if message_id is not None:
+            cancel_signal = asyncio.get_running_loop().create_future()
+            self.watched[message_id] = (command_text, cancel_signal)
+            waiting.append(cancel_signal)
+        try:
+            done, _ = await asyncio.wait(waiting, timeout=self.deadline, return_when=asyncio.FIRST_COMPLETED)
+            if flight.task in done:
+                return flight.task.result()
+            if len(waiting) > 1 and waiting[1] in done:
+                self.stats['cancelled'] += 1
+                raise AIRequestCancelled(waiting[1].result())
+            self.stats['timeouts'] += 1
+            raise RuntimeError(f'pas de réponse après {self.deadline:.0f} s')
+        finally:
+            flight.waiters -= 1
+            if on_progress in flight.listeners:
+                flight.listeners.remove(on_progress)
+            if message_id is not None:
+                self.watched.pop(message_id, None)
+            if flight.waiters == 0 and not flight.task.done():
+                # Plus personne n'attend la réponse: libérer la place dans le sémaphore
+                flight.task.cancel()
+
+    def cancel(self, message_id: int, reason: str = 'supprimée'):
+        """Abandonne la commande liée à ce message (s'il y en a une en cours)."""
+        watched = self.watched.get(message_id)
+        if watched and not watched[1].done():
+            watched[1].set_result(reason)
+
+    def message_edited(self, message_id: int, content: str):
+        """Abandonne la commande si son texte a été modifié depuis son lancement."""
+        watched = self.watched.get(message_id)
+        if watched and content is not None and content != watched[0]:
+            self.cancel(message_id, 'modifiée')
+
+    def summary(self) -> str:
+        """Compteurs lisibles pour la commande aicache."""
+        stats = self.stats
+        return (f'🚦 Requêtes IA: {stats["started"]} lancées, {stats["merged"]} fusionnées, {len(self.flights)} en cours '
+                f'(max {self.concurrency}), {stats["cancelled"]} annulées, {stats["timeouts"]} hors délai, {stats["errors"]} erreurs')
+
+
+# Gestionnaire partagé par la commande ai et les événements de selfbot.py
+ai_requests = AIRequestManager()
@@ -0,0 +1,443 @@
+"""
+Sauvegarde et restauration des serveurs (rôles, catégories, salons).
+"""
+
+import os
+import re
+import asyncio
+import tempfile
+import discord
+from datetime import datetime
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor
+
+from config import EXPORT_DIR, BACKUP_FORMAT
+from backup_format import BACKUP_EXTENSIONS, encode_backup, decode_backup, extension_for
+from rate_limit import scheduler as default_scheduler, route_key
+
+
+# Sérialisation, compression et accès disque des backups: jamais sur la boucle d'événements
+# (un gros serveur bloquerait les heartbeats de la gateway et toutes les autres commandes)
+io_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix='backup-io')
+
+
+async def run_io(func, *args, **kwargs):
+    """Exécute une fonction bloquante (fichiers, sérialisation) dans le pool d'E/S des backups."""
+    return await asyncio.get_running_loop().run_in_executor(io_pool, partial(func, *args, **kwargs))
+
+
+def write_atomic(path: str, content: bytes):
+    """Écrit dans un fichier temporaire du même dossier puis le renomme: jamais de backup à moitié écrit."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_backup_file(filepath: str, payload: dict, backup_format: str = BACKUP_FORMAT):
+    """Encode (et compresse) un backup puis l'écrit de façon atomique. Bloquant: à appeler via run_io."""
+    write_atomic(filepath, encode_backup(payload, backup_format))
+
+
+def ensure_export_dir() -> str:
+    """Crée le dossier d'export si nécessaire et renvoie son chemin."""
+    os.makedirs(EXPORT_DIR, exist_ok=True)
+    return EXPORT_DIR
+
+
+def serialize_overwrites(chan) -> dict:
+    """Sérialise les overwrites d'un salon ou d'une catégorie (pair() n'est calculé qu'une fois par entrée)."""
+    overwrites = {}
+    for target, overwrite in chan.overwrites.items():
+        if isinstance(target, discord.Role):
+            key = f'role_{target.id}'
+        elif isinstance(target, discord.Member) or getattr(target, 'type', None) is discord.Member:
+            # Sans cache des membres (LOW_MEMORY), la cible est un discord.Object typé Member
+            key = f'member_{target.id}'
+        else:
+            continue
+        allow, deny = overwrite.pair()
+        overwrites[key] = {
+            'allow': allow.value if allow else 0,
+            'deny': deny.value if deny else 0
+        }
+    return overwrites if overwrites else None
+
+
+def serialize_channel(chan) -> dict:
+    """Sérialise un salon ou une catégorie au format du backup."""
+    channel_data = {
+        'id': chan.id,
+        'name': chan.name,
+        'type': str(chan.type),
+        'position': chan.position,
+    }
+    
+    # Si c'est une catégorie, enregistrer les informations spécifiques
+    if isinstance(chan, discord.CategoryChannel):
+        channel_data['is_category'] = True
+        channel_data['permissions'] = serialize_overwrites(chan)
+        return channel_data
+    
+    # Pour les salons normaux
+    channel_data['is_category'] = False
+    channel_data['category'] = chan.category.name if chan.category else None
+    channel_data['topic'] = getattr(chan, 'topic', None)
+    channel_data['nsfw'] = getattr(chan, 'nsfw', False)
+    channel_data['permissions'] = serialize_overwrites(chan)
+    
+    # Informations supplémentaires pour les salons vocaux et stage
+    if isinstance(chan, (discord.VoiceChannel, discord.StageChannel)):
+        channel_data['bitrate'] = chan.bitrate
+        channel_data['user_limit'] = chan.user_limit
+    return channel_data
+
+
+def serialize_role(role) -> dict:
+    """Sérialise un rôle au format du backup."""
+    role_data = {
+        'id': role.id,
+        'name': role.name,
+        'color': role.color.value,  # Valeur hexadécimale de la couleur
+        'hoist': role.hoist,  # Afficher séparément
+        'mentionable': role.mentionable,
+        'permissions': role.permissions.value,  # Valeur des permissions
+        'position': role.position,
+    }
+    
+    # Ajouter l'icône si disponible
+    if role.icon:
+        role_data['icon_url'] = role.icon.url if hasattr(role.icon, 'url') else None
+    
+    # Ajouter l'emoji unicode si disponible
+    if role.unicode_emoji:
+        role_data['unicode_emoji'] = role.unicode_emoji
+    return role_data
+
+
+def build_backup_payload(guild: discord.Guild):
+    """Construit le contenu du backup en un seul passage. Renvoie (payload, statistiques)."""
+    channels_payload = []
+    categories_count = 0
+    
+    # Exporter les salons et catégories
+    for chan in guild.channels:
+        channel_data = serialize_channel(chan)
+        if channel_data['is_category']:
+            categories_count += 1
+        channels_payload.append(channel_data)
+
+    # Exporter les rôles (sauf @everyone et les rôles gérés par des bots)
+    roles_payload = [serialize_role(role) for role in guild.roles if not (role.is_default() or role.managed)]
+    
+    # Trier les rôles par position (du plus bas au plus haut pour respecter l'ordre de création)
+    # Position plus élevée = rôle plus haut dans la hiérarchie
+    roles_payload.sort(key=lambda x: x['position'], reverse=False)
+
+    payload = {
+        'guild_name': guild.name,
+        'guild_id': guild.id,
+        'export_date': datetime.utcnow().isoformat(),
+        'categories_count': categories_count,
+        'roles_count': len(roles_payload),
+        'channels': channels_payload,
+        'roles': roles_payload
+    }
+    stats = {
+        'total': len(channels_payload),
+        'categories': categories_count,
+        'channels': len(channels_payload) - categories_count,
+        'roles': len(roles_payload),
+    }
+    return payload, stats
+
+
+def backup_filename(guild: discord.Guild, backup_format: str = 'json') -> str:
+    """Nom du fichier de backup d'un serveur (.json ou .sbk selon le format)."""
+    # Nettoyer le nom du serveur pour qu'il soit valide comme nom de fichier
+    safe_guild_name = re.sub(r'[<>:"/\\|?*]', '_', guild.name)
+    safe_guild_name = safe_guild_name.strip('. ')  # Enlever les points et espaces en début/fin
+    if not safe_guild_name:  # Si le nom est vide après nettoyage, utiliser l'ID
+        safe_guild_name = str(guild.id)
+    return f'backup_{safe_guild_name}{extension_for(backup_format)}'
+
+
+async def export_guild_channels(guild: discord.Guild, backup_format: str = BACKUP_FORMAT, snapshots=None):
+    """Sauvegarde les salons, catégories et rôles du serveur (JSON ou format compact, cf. backup_format.py).
+
+    Si `snapshots` (un SnapshotStore) est fourni, la sauvegarde est aussi ajoutée à l'historique dédupliqué.
+    Renvoie (chemin, statistiques): l'appelant n'a pas besoin de relire le fichier pour compter les éléments.
+    """
+    ensure_export_dir()
+    # Seule étape sur la boucle: lire les objets Discord. Le reste ne manipule que des dicts
+    payload, stats = build_backup_payload(guild)
+
+    filepath = os.path.join(EXPORT_DIR, backup_filename(guild, backup_format))
+    await run_io(write_backup_file, filepath, payload, backup_format)
+
+    if snapshots is not None:
+        stats['snapshot'] = await run_io(snapshots.save, payload)
+
+    return filepath, stats
+
+
+def find_backup_file(filename: str) -> str:
+    """Chemin d'un backup dans exports/, avec ou sans extension (.json, .sbk, .json.gz).
+
+    Sans extension, si plusieurs formats existent (un ancien .json et un .sbk
+    écrit après un changement de BACKUP_FORMAT), le plus récent est choisi.
+    """
+    candidates = [filename] if filename.endswith(BACKUP_EXTENSIONS) else [filename + ext for ext in BACKUP_EXTENSIONS]
+    found = [path for path in (os.path.join(EXPORT_DIR, candidate) for candidate in candidates) if os.path.exists(path)]
+    if not found:
+        raise FileNotFoundError(f'Fichier introuvable: {filename}')
+    return max(found, key=os.path.getmtime)
+
+
+def load_channels_from_file(filename: str) -> dict:
+    """Charge un backup (JSON historique ou format compact, détecté automatiquement).
+
+    Bloquant: depuis une coroutine, utiliser `read_backup`.
+    """
+    filepath = find_backup_file(filename)
+    
+    with open(filepath, 'rb') as f:
+        data = decode_backup(f.read())
+    # Compatibilité avec l'ancien format
+    if isinstance(data, list):
+        return {'channels': data, 'guild_name': 'Inconnu', 'categories_count': 0}
+    return data
+
+
+async def read_backup(filename: str) -> dict:
+    """load_channels_from_file exécuté dans le pool d'E/S (lecture, décompression et décodage)."""
+    return await run_io(load_channels_from_file, filename)
+
+
+def is_category_data(ch_data: dict) -> bool:
+    """Indique si une entrée sauvegardée est une catégorie."""
+    return bool(ch_data.get('is_category')) or ch_data.get('type') == 'ChannelType.category'
+
+
+async def create_role_from_backup(guild: discord.Guild, role_data: dict, scheduler=None):
+    """Crée un rôle depuis sa sauvegarde. Renvoie le rôle créé, ou None en cas d'échec."""
+    scheduler = scheduler or default_scheduler
+    try:
+        # Créer le rôle avec les permissions de base
+        permissions = discord.Permissions(permissions=role_data.get('permissions', 0))
+        
+        kwargs = {
+            'name': role_data['name'],
+            'permissions': permissions,
+            'colour': discord.Colour(role_data.get('color', 0)),
+            'hoist': role_data.get('hoist', False),
+            'mentionable': role_data.get('mentionable', False),
+        }
+        
+        return await scheduler.call(route_key('POST', f'/guilds/{guild.id}/roles'), guild.create_role, **kwargs)
+    except discord.Forbidden:
+        print(f'❌ Permissions insuffisantes pour créer le rôle {role_data.get("name", "inconnu")}')
+    except Exception as e:
+        print(f'❌ Erreur création rôle {role_data.get("name", "inconnu")}: {e}')
+    return None
+
+
+def sort_roles_for_creation(roles_data: list) -> list:
+    """Trie les rôles du plus haut au plus bas dans la hiérarchie.
+
+    Dans Discord, créer les rôles du plus haut au plus bas les place automatiquement dans le bon ordre.
+    """
+    return sorted(roles_data, key=lambda x: x.get('position', 0), reverse=True)
+
+
+class PermissionIndex:
+    """Index construits une seule fois par restauration pour résoudre les overwrites en O(1).
+
+    - ID du backup -> nom du rôle sauvegardé
+    - nom -> rôle existant sur le serveur (premier trouvé, comme discord.utils.get)
+    - ID -> membre lu à l'API quand il manque au cache (None s'il n'est pas sur le serveur)
+    """
+
+    def __init__(self, guild: discord.Guild, data: dict = None):
+        self.saved_role_names = {}
+        if isinstance(data, dict):
+            for saved_role in data.get('roles', []):
+                self.saved_role_names.setdefault(saved_role.get('id'), saved_role.get('name'))
+        self.guild_roles_by_name = {}
+        for role in guild.roles:
+            self.guild_roles_by_name.setdefault(role.name, role)
+        self.members = {}  # Rempli par RestoreExecutor avant de construire les overwrites
+
+    def find_role(self, role_id: int, guild: discord.Guild, role_map: dict):
+        """Rôle cible d'un overwrite sauvegardé (role_map, puis ID, puis nom, puis @everyone)."""
+        # Essayer d'abord avec le role_map (rôles créés depuis le backup)
+        role = role_map.get(role_id)
+        
+        # Si pas trouvé dans le role_map, chercher par ID sur le serveur
+        if not role:
+            role = guild.get_role(role_id)
+        
+        # Si toujours pas trouvé, chercher par nom (nom tiré des données sauvegardées)
+        if not role and role_id in self.saved_role_names:
+            role = self.guild_roles_by_name.get(self.saved_role_names[role_id])
+        
+        # Si toujours pas trouvé, essayer avec @everyone
+        return role or guild.default_role
+
+    def find_member(self, member_id: int, guild: discord.Guild):
+        """Membre cible d'un overwrite sauvegardé (membre déjà lu à l'API, puis cache du serveur)."""
+        if member_id in self.members:
+            return self.members[member_id]
+        return guild.get_member(member_id)
+
+
+@lru_cache(maxsize=4096)
+def overwrite_from_values(allow_value: int, deny_value: int) -> discord.PermissionOverwrite:
+    """PermissionOverwrite mémoïsé par paire (allow, deny).
+
+    L'objet est partagé entre les salons: il ne doit être que lu, jamais modifié.
+    """
+    allow_perms = discord.Permissions(permissions=allow_value)
+    deny_perms = discord.Permissions(permissions=deny_value)
+    return discord.PermissionOverwrite.from_pair(allow_perms, deny_perms)
+
+
+def build_permission_overwrites(permissions_data: dict, guild: discord.Guild, role_map: dict = None, data: dict = None,
+                                index: PermissionIndex = None) -> dict:
+    """Construit un dictionnaire d'overwrites de permissions depuis les données sauvegardées.
+
+    Passer un `index` construit une fois par restauration évite de le reconstruire pour chaque salon.
+    """
+    overwrites = {}
+    
+    if not permissions_data:
+        return overwrites
+    
+    if not role_map:
+        role_map = {}
+    
+    if index is None:
+        index = PermissionIndex(guild, data)
+    
+    for key, perm_data in permissions_data.items():
+        allow_value = perm_data.get('allow', 0)
+        deny_value = perm_data.get('deny', 0)
+        
+        # Ignorer si les deux valeurs sont 0 (pas de permissions spécifiques)
+        if allow_value == 0 and deny_value == 0:
+            continue
+        
+        if key.startswith('role_'):
+            role = index.find_role(int(key.split('_')[1]), guild, role_map)
+            if role:
+                overwrites[role] = overwrite_from_values(allow_value, deny_value)
+        elif key.startswith('member_'):
+            member = index.find_member(int(key.split('_')[1]), guild)
+            if member:
+                overwrites[member] = overwrite_from_values(allow_value, deny_value)
+    
+    return overwrites
+
+
+# Méthode de création à utiliser pour chaque type de salon
+CREATE_METHODS = {
+    discord.ChannelType.text: 'create_text_channel',
+    discord.ChannelType.voice: 'create_voice_channel',
+    discord.ChannelType.forum: 'create_forum_channel',
+    discord.ChannelType.stage_voice: 'create_stage_channel',
+    discord.ChannelType.news: 'create_text_channel',  # Avec news=True (pas de create_news_channel dans discord.py)
+}
+
+
+def resolve_channel_type(ch_data: dict):
+    """Détermine le type de salon depuis la chaîne sauvegardée ('ChannelType.text', ...)."""
+    channel_type_str = ch_data.get('type', 'ChannelType.text').lower()
+    # 'stage_voice' contient 'voice': tester stage avant voice
+    if 'stage' in channel_type_str:
+        return discord.ChannelType.stage_voice
+    elif 'voice' in channel_type_str:
+        return discord.ChannelType.voice
+    elif 'forum' in channel_type_str:
+        return discord.ChannelType.forum
+    elif 'news' in channel_type_str:
+        return discord.ChannelType.news
+    return discord.ChannelType.text  # 'text' et par défaut
+
+
+def build_channel_kwargs(ch_data: dict, channel_type, category=None) -> dict:
+    """Prépare tous les paramètres de création d'un salon pour un seul appel à l'API."""
+    kwargs = {
+        'name': ch_data['name'],
+        'category': category,
+        'position': ch_data.get('position', 0),
+        'nsfw': ch_data.get('nsfw', False)
+    }
+    if channel_type == discord.ChannelType.news:
+        kwargs['news'] = True
+    if channel_type in (discord.ChannelType.text, discord.ChannelType.news, discord.ChannelType.forum) and ch_data.get('topic'):
+        kwargs['topic'] = ch_data['topic']
+    if channel_type in (discord.ChannelType.voice, discord.ChannelType.stage_voice):
+        # Ajouter bitrate et user_limit pour les salons vocaux et stage
+        if 'bitrate' in ch_data:
+            kwargs['bitrate'] = ch_data['bitrate']
+        if 'user_limit' in ch_data:
+            kwargs['user_limit'] = ch_data['user_limit']
+    return kwargs
+
+
+async def create_with_overwrites(scheduler, route: str, create, kwargs: dict, overwrites: dict, label: str):
+    """Crée un salon ou une catégorie avec ses overwrites dans la même requête.
+
+    Si le compte n'a pas le droit de poser ces overwrites, le salon est quand même créé sans eux.
+    """
+    if overwrites:
+        try:
+            return await scheduler.call(route, create, overwrites=overwrites, **kwargs)
+        except discord.Forbidden:
+            print(f'⚠️  Permissions insuffisantes pour appliquer les overwrites ({label}), création sans overwrites')
+    return await scheduler.call(route, create, **kwargs)
+
+
+async def create_category_from_backup(guild: discord.Guild, cat_data: dict, role_map: dict = None, data: dict = None, scheduler=None,
+                                      index: PermissionIndex = None):
+    """Crée une catégorie avec ses overwrites. Renvoie la catégorie, ou None en cas d'échec."""
+    scheduler = scheduler or default_scheduler
+    try:
+        overwrites = build_permission_overwrites(cat_data.get('permissions'), guild, role_map, data, index)
+        return await create_with_overwrites(
+            scheduler, route_key('POST', f'/guilds/{guild.id}/channels'), guild.create_category,
+            {'name': cat_data['name'], 'position': cat_data.get('position', 0)},
+            overwrites, f'catégorie {cat_data["name"]}'
+        )
+    except Exception as e:
+        print(f'❌ Erreur création catégorie {cat_data["name"]}: {e}')
+    return None
+
+
+async def create_channel_from_backup(guild: discord.Guild, ch_data: dict, category=None, role_map: dict = None, data: dict = None, scheduler=None,
+                                     index: PermissionIndex = None):
+    """Crée un salon (topic, bitrate, user_limit, nsfw et overwrites en une seule requête). Renvoie le salon ou None."""
+    scheduler = scheduler or default_scheduler
+    try:
+        channel_type = resolve_channel_type(ch_data)
+        kwargs = build_channel_kwargs(ch_data, channel_type, category)
+        overwrites = build_permission_overwrites(ch_data.get('permissions'), guild, role_map, data, index)
+        create = getattr(guild, CREATE_METHODS.get(channel_type, 'create_text_channel'))
+        return await create_with_overwrites(
+            scheduler, route_key('POST', f'/guilds/{guild.id}/channels'), create, kwargs,
+            overwrites, f'salon {ch_data.get("name", "inconnu")}'
+        )
+    except discord.Forbidden:
+        print(f'❌ Permissions insuffisantes pour créer le salon {ch_data.get("name", "inconnu")}')
+    except Exception as e:
+        print(f'❌ Erreur création salon {ch_data.get("name", "inconnu")}: {e}')
+    return None
@@ -0,0 +1,126 @@
+"""
+Formats de fichier des backups.
+
+- `json`: format historique, JSON indenté (fichiers .json, y compris les anciens channels_*.json)
+- format compact (fichiers .sbk): une ligne d'en-tête `SBBACKUP/<version> <codec>` suivie
+  du contenu sérialisé puis compressé. Codecs: json+gzip, json+zstd, msgpack,
+  msgpack+gzip, msgpack+zstd.
+
+zstd et msgpack sont optionnels (`pip install zstandard msgpack`); gzip fait partie
+de la bibliothèque standard. Le chargement détecte le format tout seul.
+"""
+
+import gzip
+import json
+
+FORMAT_VERSION = 1
+HEADER_PREFIX = b'SBBACKUP/'
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+LEGACY_EXTENSION = '.json'
+COMPACT_EXTENSION = '.sbk'
+BACKUP_EXTENSIONS = (LEGACY_EXTENSION, COMPACT_EXTENSION, '.json.gz')
+
+CODECS = ('json+gzip', 'json+zstd', 'msgpack', 'msgpack+gzip', 'msgpack+zstd')
+
+
+class BackupFormatError(ValueError):
+    """Fichier de backup illisible (en-tête inconnu, version trop récente, codec indisponible)."""
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise BackupFormatError('Le paquet zstandard est requis pour ce format (pip install zstandard)')
+    return zstandard
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise BackupFormatError('Le paquet msgpack est requis pour ce format (pip install msgpack)')
+    return msgpack
+
+
+def extension_for(backup_format: str) -> str:
+    """Extension de fichier d'un format ('json' ou un codec compact)."""
+    return LEGACY_EXTENSION if backup_format == 'json' else COMPACT_EXTENSION
+
+
+def _serialize(payload: dict, serializer: str) -> bytes:
+    if serializer == 'json':
+        # JSON minifié: pas d'indentation ni d'espaces après les séparateurs
+        return json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if serializer == 'msgpack':
+        return _msgpack().packb(payload, use_bin_type=True)
+    raise BackupFormatError(f'Sérialiseur inconnu: {serializer}')
+
+
+def _deserialize(body: bytes, serializer: str) -> dict:
+    if serializer == 'json':
+        return json.loads(body.decode('utf-8'))
+    if serializer == 'msgpack':
+        return _msgpack().unpackb(body, raw=False, strict_map_key=False)
+    raise BackupFormatError(f'Sérialiseur inconnu: {serializer}')
+
+
+def _compress(body: bytes, compression: str) -> bytes:
+    if compression == 'gzip':
+        return gzip.compress(body, compresslevel=6)
+    if compression == 'zstd':
+        return _zstd().ZstdCompressor(level=10).compress(body)
+    if compression == '':
+        return body
+    raise BackupFormatError(f'Compression inconnue: {compression}')
+
+
+def _decompress(body: bytes, compression: str) -> bytes:
+    if compression == 'gzip':
+        return gzip.decompress(body)
+    if compression == 'zstd':
+        return _zstd().ZstdDecompressor().decompressobj().decompress(body)
+    if compression == '':
+        return body
+    raise BackupFormatError(f'Compression inconnue: {compression}')
+
+
+def encode_backup(payload: dict, backup_format: str = 'json') -> bytes:
+    """Encode un backup dans le format demandé ('json' ou un des CODECS)."""
+    if backup_format == 'json':
+        return json.dumps(payload, ensure_ascii=False, indent=2).encode('utf-8')
+    if backup_format not in CODECS:
+        raise BackupFormatError(f'Format de backup inconnu: {backup_format}')
+    serializer, _, compression = backup_format.partition('+')
+    header = HEADER_PREFIX + f'{FORMAT_VERSION} {backup_format}\n'.encode('ascii')
+    return header + _compress(_serialize(payload, serializer), compression)
+
+
+def decode_backup(raw: bytes):
+    """Décode un backup quel que soit son format (compact, JSON gzip, JSON historique)."""
+    if raw.startswith(HEADER_PREFIX):
+        header, _, body = raw.partition(b'\n')
+        try:
+            version, codec = header[len(HEADER_PREFIX):].decode('ascii').split(' ', 1)
+            version = int(version)
+        except ValueError:
+            raise BackupFormatError('En-tête de backup invalide')
+        if version > FORMAT_VERSION:
+            raise BackupFormatError(f'Backup au format v{version}, non supporté par cette version (v{FORMAT_VERSION})')
+        if codec not in CODECS:
+            raise BackupFormatError(f'Codec de backup inconnu: {codec}')
+        serializer, _, compression = codec.partition('+')
+        return _deserialize(_decompress(body, compression), serializer)
+    if raw.startswith(GZIP_MAGIC):
+        return json.loads(gzip.decompress(raw).decode('utf-8'))
+    if raw.startswith(ZSTD_MAGIC):
+        return json.loads(_decompress(raw, 'zstd').decode('utf-8'))
+    # Format historique: JSON texte (objet ou ancienne liste de salons)
+    return json.loads(raw.decode('utf-8-sig'))
+
+
+def is_backup_file(filename: str) -> bool:
+    """Fichier listé par load_backup (backup_* et channels_* pour compatibilité)."""
+    return (filename.startswith('backup_') or filename.startswith('channels_')) and filename.endswith(BACKUP_EXTENSIONS)
@@ -0,0 +1,163 @@
+"""
+Latence de bout en bout de `!ai` contre le faux serveur (tools/mock_openai.py), sans Discord.
+
+La commande passe par le vrai registre (parsing, contexte, cache désactivé,
+gestionnaire de requêtes, streaming et éditions throttlées); seuls le salon et
+le message sont simulés. Mesure le délai avant la première édition de contenu
+et avant la réponse finale, en percentiles.
+
+    python benchmarks/ai_latency.py --requests 50 --concurrency 5 --latency 0.3 --token-delay 0.02
+    python benchmarks/ai_latency.py --base-url http://127.0.0.1:1234/v1   # serveur local réel
+"""
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+
+def percentile(values: list, pct: float) -> float:
+    """Percentile au rang le plus proche (values triées)."""
+    if not values:
+        return float('nan')
+    index = max(0, min(len(values) - 1, int(round(pct / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class FakeUser:
+    def __init__(self, user_id: int, name: str):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.bot = False
+
+
+class FakeChannel:
+    def __init__(self, channel_id: int, author, backlog: int):
+        self.id = channel_id
+        self.history_messages = [FakeMessage(10_000 + i, f'message de contexte numéro {i}', author, self)
+                                 for i in range(backlog)]
+
+    async def history(self, limit: int = 100):
+        for message in reversed(self.history_messages[-limit:]):
+            yield message
+
+
+class FakeMessage:
+    def __init__(self, message_id: int, content: str, author, channel):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = None
+        self.mentions = []
+        self.edits = []  # (instant, contenu)
+
+    async def edit(self, content=None, **kwargs):
+        self.edits.append((time.perf_counter(), content))
+        return self
+
+
+class FakeBot:
+    def __init__(self, user):
+        self.user = user
+
+
+async def run_benchmark(args, base_url: str):
+    from command_registry import registry
+    import selfbot_commands  # noqa: F401 - enregistre la commande ai
+
+    me = FakeUser(1, 'Moi')
+    bot = FakeBot(me)
+    channel = FakeChannel(42, FakeUser(2, 'Alice'), args.backlog)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    first_edits, totals, failures = [], [], 0
+
+    async def one(index: int):
+        nonlocal failures
+        question = 'question identique' if args.same_prompt else f'question {index}'
+        message = FakeMessage(100_000 + index, f'!ai {question} --nocache', me, channel)
+        async with semaphore:
+            ctx = registry.build_context(bot, message, '!')
+            start = time.perf_counter()
+            await registry.invoke(ctx)
+            end = time.perf_counter()
+        # Première édition après le message d'attente = premier contenu visible
+        content_edits = [at for at, content in message.edits if content and not content.startswith('🤖')]
+        final = message.edits[-1][1] if message.edits else ''
+        if not final or final.startswith('❌'):
+            failures += 1
+            return
+        first_edits.append((content_edits[0] if content_edits else end) - start)
+        totals.append(end - start)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(args.requests)))
+    elapsed = time.perf_counter() - started
+
+    from ai import http_session
+    from ai_requests import ai_requests
+    await http_session.close()
+
+    first_edits.sort()
+    totals.sort()
+    print(f'🎯 Cible: {base_url} | {args.requests} requêtes, concurrence {args.concurrency}, '
+          f'streaming {"oui" if args.stream else "non"}')
+    print(f'{"":<18}{"p50":>9}{"p90":>9}{"p99":>9}{"max":>9}')
+    for label, values in (('Premier contenu', first_edits), ('Réponse finale', totals)):
+        if values:
+            print(f'{label:<18}' + ''.join(f'{percentile(values, pct) * 1000:>7.0f}ms' for pct in (50, 90, 99))
+                  + f'{values[-1] * 1000:>7.0f}ms')
+    print(f'✅ {len(totals)} réussies, ❌ {failures} en erreur, {len(totals) / elapsed:.1f} req/s')
+    print(ai_requests.summary())
+
+
+async def main(args):
+    runner = None
+    base_url = args.base_url
+    if not base_url:
+        from mock_openai import MockOpenAI
+        mock = MockOpenAI(args.latency, args.token_delay, args.tokens, args.error_rate, seed=1)
+        runner, base_url = await mock.start(port=int(os.environ['MOCK_OPENAI_PORT']))
+    try:
+        await run_benchmark(args, base_url)
+    finally:
+        if runner is not None:
+            await runner.cleanup()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Latence de bout en bout de !ai')
+    parser.add_argument('--requests', type=int, default=30)
+    parser.add_argument('--concurrency', type=int, default=5, help='commandes !ai lancées en même temps')
+    parser.add_argument('--no-stream', dest='stream', action='store_false')
+    parser.add_argument('--same-prompt', action='store_true', help='même question partout (teste la fusion des requêtes)')
+    parser.add_argument('--backlog', type=int, default=60, help='messages déjà présents dans le salon')
+    parser.add_argument('--base-url', default=None, help='serveur compatible OpenAI existant au lieu du faux serveur')
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--token-delay', type=float, default=0.01)
+    parser.add_argument('--tokens', type=int, default=40)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    # La configuration est lue à l'import: tout régler avant d'importer les commandes
+    if not args.base_url:
+        os.environ['MOCK_OPENAI_PORT'] = str(free_port())
+    os.environ['OPENAI_BASE_URL'] = args.base_url or f'http://127.0.0.1:{os.environ["MOCK_OPENAI_PORT"]}/v1'
+    os.environ['OPENAI_API_KEY'] = os.environ.get('BENCH_OPENAI_API_KEY', '')
+    os.environ['AI_STREAM'] = '1' if args.stream else '0'
+    os.environ['AI_CACHE_ENABLED'] = '0'
+    os.environ.setdefault('AI_MAX_CONCURRENT', str(args.concurrency))
+    asyncio.run(main(args))
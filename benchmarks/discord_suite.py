@@ -0,0 +1,182 @@
+"""
+Mesures hors ligne des chemins Discord (restauration, export, purge, dispatch) contre le faux client (tools/fake_discord.py).
+
+Le vrai code tourne de bout en bout (planificateur de restauration, rate
+limit, pipeline de purge, registre de commandes); seuls le serveur et l'API
+REST sont simulés, avec latence et buckets de rate limit réglables.
+
+    python benchmarks/discord_suite.py
+    python benchmarks/discord_suite.py --sizes 10,100,500 --latency 0.05 --bucket-limit 5 --bucket-window 1
+    python benchmarks/discord_suite.py --only restore,export
+
+Une régression se voit aux compteurs: appels à l'API réels vs estimés, 429 reçus,
+restauration diff qui devrait tout trouver inchangé, débit de la purge.
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+
+SUITES = ('restore', 'export', 'purge', 'dispatch')
+
+
+def make_api(args, scheduler=None, **overrides):
+    from fake_discord import FakeDiscordAPI
+    options = {'latency': args.latency, 'jitter': args.jitter, 'bucket_limit': args.bucket_limit,
+               'bucket_window': args.bucket_window, 'rate_limit_rate': args.rate_limit_rate,
+               'error_rate': args.error_rate, 'seed': 1}
+    options.update(overrides)
+    return FakeDiscordAPI(observer=scheduler.on_response if scheduler is not None else None, **options)
+
+
+async def bench_restore(args):
+    from fake_discord import FakeDiscordAPI, FakeGuild, build_synthetic_guild
+    from backup import build_backup_payload
+    from rate_limit import RateLimitScheduler
+    from restore_planner import RestorePlan, RestoreExecutor
+    from restore_diff import apply_diff
+
+    print(f'🔨 Restauration (concurrence {args.concurrency})')
+    print(f'{"salons":>8}{"objets":>8}{"estimés":>9}{"appels":>8}{"429":>6}{"échecs":>8}{"durée":>9}{"diff":>7}')
+    for size in args.sizes:
+        payload, _ = build_backup_payload(build_synthetic_guild(FakeDiscordAPI(), size))
+        scheduler = RateLimitScheduler()
+        api = make_api(args, scheduler)
+        target = FakeGuild(api, f'Cible {size}')
+        plan = RestorePlan(payload)
+        started = time.perf_counter()
+        result = await RestoreExecutor(plan, target, scheduler=scheduler, concurrency=args.concurrency).run()
+        elapsed = time.perf_counter() - started
+
+        # Relancer en mode diff sur le serveur restauré ne doit rien envoyer
+        calls = api.stats['calls']
+        diff_plan = RestorePlan(payload)
+        apply_diff(diff_plan, target)
+        await RestoreExecutor(diff_plan, target, scheduler=scheduler, concurrency=args.concurrency).run()
+        diff_calls = api.stats['calls'] - calls
+        print(f'{size:>8}{len(plan.nodes):>8}{plan.api_calls:>9}{calls:>8}{api.stats["rate_limited"]:>6}'
+              f'{result["failed"]:>8}{elapsed:>8.2f}s{diff_calls:>7}')
+    print()
+
+
+async def bench_export(args):
+    from fake_discord import FakeDiscordAPI, build_synthetic_guild
+    from backup import build_backup_payload, write_backup_file, run_io
+    from config import BACKUP_FORMAT
+
+    print(f'📤 Export (format {BACKUP_FORMAT})')
+    print(f'{"salons":>8}{"lecture":>10}{"écriture":>10}{"pic mém.":>11}{"fichier":>10}')
+    with tempfile.TemporaryDirectory() as directory:
+        for size in args.sizes:
+            guild = build_synthetic_guild(FakeDiscordAPI(), size)
+            filepath = os.path.join(directory, f'backup_{size}')
+            tracemalloc.start()
+            started = time.perf_counter()
+            payload, _ = build_backup_payload(guild)
+            built = time.perf_counter()
+            await run_io(write_backup_file, filepath, payload, BACKUP_FORMAT)
+            written = time.perf_counter()
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f'{size:>8}{(built - started) * 1000:>8.1f}ms{(written - built) * 1000:>8.1f}ms'
+                  f'{peak / 1024:>8.0f} Ko{os.path.getsize(filepath) / 1024:>7.0f} Ko')
+    print()
+
+
+async def bench_purge(args):
+    from fake_discord import FakeGuild, FakeUser, fill_history
+    from own_messages import OwnMessageIndex
+    from purge import PurgePipeline
+    from rate_limit import RateLimitScheduler
+
+    me = FakeUser(1, 'Moi')
+    others = [FakeUser(2, 'Alice'), FakeUser(3, 'Bob')]
+    scheduler = RateLimitScheduler()
+    api = make_api(args, scheduler)
+    guild = FakeGuild(api, 'Purge')
+    channels = [guild.add_text_channel(f'salon-{index}') for index in range(args.purge_channels)]
+    own = sum(fill_history(channel, args.purge_messages, me, others, seed=index) for index, channel in enumerate(channels))
+
+    print(f'🗑️ Purge ({args.purge_channels} salons × {args.purge_messages} messages, {own} à vous, '
+          f'{args.purge_workers} workers)')
+    with tempfile.TemporaryDirectory() as directory:
+        index = OwnMessageIndex(os.path.join(directory, 'own_messages.sqlite'))
+        index.mark_live()
+        pipeline = PurgePipeline(index, channels, me, workers=args.purge_workers, scheduler=scheduler)
+        stats = await pipeline.run()
+        index._db.close()
+    print(pipeline.describe())
+    print(f'⏱️ {stats["elapsed"]:.2f}s, {stats["found"]} trouvés, {stats["retried"]} réessais | API: {api.describe(3)}')
+    remaining = sum(1 for channel in channels for message_id in channel._message_ids
+                    if channel._messages[message_id].author is me)
+    if remaining:
+        print(f'⚠️  {remaining} messages à vous encore présents')
+    print()
+
+
+async def bench_dispatch(args):
+    from fake_discord import FakeDiscordAPI, FakeGuild, FakeUser, FakeClient
+    from command_registry import registry
+    import core_commands  # noqa: F401 - enregistre les commandes
+    import selfbot_commands  # noqa: F401
+
+    me = FakeUser(1, 'Moi')
+    guild = FakeGuild(FakeDiscordAPI(), 'Dispatch', owner_id=me.id)
+    guild.add_member(me)
+    channel = guild.add_text_channel('général')
+    bot = FakeClient(me, [guild])
+    registry.cooldown = 0  # Mesure du dispatch seul, sans le cooldown entre deux commandes
+
+    print(f'📨 Dispatch ({args.dispatch} messages par cas, API sans latence)')
+    for label, content in (('message ordinaire', 'bonjour tout le monde'), ('commande inconnue', '!inconnue a b c'),
+                           ('!ping', '!ping'), ('!help', '!help'), ('!serverinfo', '!serverinfo')):
+        messages = [channel.add_message(content, me) for _ in range(args.dispatch)]
+        started = time.perf_counter()
+        for message in messages:
+            await registry.dispatch(bot, message, '!')
+        elapsed = time.perf_counter() - started
+        print(f'{label:<20}{elapsed / args.dispatch * 1e6:>8.1f} µs/message')
+    print()
+
+
+async def main(args):
+    benches = {'restore': bench_restore, 'export': bench_export, 'purge': bench_purge, 'dispatch': bench_dispatch}
+    print(f'🌐 Fausse API: latence {args.latency * 1000:.0f} ms, {args.bucket_limit or "∞"} requêtes / '
+          f'{args.bucket_window:g}s par route, 429 aléatoires {args.rate_limit_rate:.0%}, 5xx {args.error_rate:.0%}\n')
+    for name in args.only:
+        await benches[name](args)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mesures hors ligne des chemins Discord')
+    parser.add_argument('--only', default=','.join(SUITES), help=f'mesures à lancer parmi {",".join(SUITES)}')
+    parser.add_argument('--sizes', default='10,100,500', help='nombres de salons des serveurs synthétiques')
+    parser.add_argument('--latency', type=float, default=0.02, help='latence de chaque requête (secondes)')
+    parser.add_argument('--jitter', type=float, default=0.01)
+    parser.add_argument('--bucket-limit', type=int, default=50, help='requêtes par fenêtre et par route (0 = illimité)')
+    parser.add_argument('--bucket-window', type=float, default=1.0)
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='proportion de 429 injectés au hasard')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='proportion de 502 injectés au hasard')
+    parser.add_argument('--concurrency', type=int, default=4, help='créations en parallèle pendant la restauration')
+    parser.add_argument('--purge-channels', type=int, default=3)
+    parser.add_argument('--purge-messages', type=int, default=400, help='messages par salon (la moitié à vous)')
+    parser.add_argument('--purge-workers', type=int, default=3)
+    parser.add_argument('--dispatch', type=int, default=2000, help='messages envoyés au registre par cas')
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(',') if size]
+    args.only = [name for name in args.only.split(',') if name]
+    unknown = set(args.only) - set(SUITES)
+    if unknown:
+        parser.error(f'mesure inconnue: {", ".join(sorted(unknown))}')
+
+    # Aucune requête réelle: pas de clé OpenAI transmise aux modules importés
+    os.environ['OPENAI_API_KEY'] = ''
+    asyncio.run(main(args))
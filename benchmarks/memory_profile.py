@@ -0,0 +1,214 @@
+"""
+Empreinte mémoire du client discord selon son profil (défaut de discord.py vs LOW_MEMORY), sans connexion.
+
+Chaque profil tourne dans un process séparé: un vrai ConnectionState de
+discord.py, créé avec les options du profil, reçoit des événements
+synthétiques de la gateway (GUILD_CREATE, membres chunkés, présences des
+serveurs suivis, messages), puis on lit le RSS du process. La bande
+passante de la gateway est estimée sur ces mêmes événements: taille JSON
+brute et taille compressée en zlib-stream, comme la gateway les envoie.
+
+    python benchmarks/memory_profile.py
+    python benchmarks/memory_profile.py --guilds 20 --members 5000 --messages 20000 --presences 20000
+
+Les messages sont envoyés dans les deux profils: sans abonnement, la gateway
+n'en envoie en réalité qu'une partie pour les très gros serveurs, les gains
+mesurés ici sont donc un minimum.
+"""
+
+import os
+import sys
+import gc
+import json
+import zlib
+import random
+import argparse
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PROFILES = ('défaut', 'réduit')
+CHUNK_SIZE = 1000  # Membres par GUILD_MEMBERS_CHUNK
+TIMESTAMP = '2024-01-01T00:00:00+00:00'
+
+
+def rss_bytes() -> int:
+    """RSS actuel du process (/proc), sinon pic (getrusage)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class GatewayMeter:
+    """Taille des événements tels que la gateway les enverrait (JSON, puis zlib-stream)."""
+
+    def __init__(self):
+        self.compressor = zlib.compressobj()
+        self.sequence = 0
+        self.events = 0
+        self.raw = 0
+        self.compressed = 0
+
+    def send(self, name: str, data: dict) -> dict:
+        self.sequence += 1
+        raw = json.dumps({'op': 0, 't': name, 's': self.sequence, 'd': data}, separators=(',', ':')).encode()
+        self.events += 1
+        self.raw += len(raw)
+        self.compressed += len(self.compressor.compress(raw) + self.compressor.flush(zlib.Z_SYNC_FLUSH))
+        return data
+
+
+def user_payload(user_id: int) -> dict:
+    return {'id': str(user_id), 'username': f'membre{user_id % 100000}', 'discriminator': '0', 'avatar': None,
+            'global_name': f'Membre {user_id % 100000}'}
+
+
+def member_payload(user_id: int, role_ids: list) -> dict:
+    return {'user': user_payload(user_id), 'roles': role_ids, 'joined_at': TIMESTAMP, 'nick': None,
+            'deaf': False, 'mute': False, 'flags': 0}
+
+
+def guild_payload(guild_id: int, me: dict, args, rng: random.Random) -> dict:
+    roles = [{'id': str(guild_id), 'name': '@everyone', 'permissions': '1071698660929', 'position': 0, 'color': 0,
+              'hoist': False, 'managed': False, 'mentionable': False, 'flags': 0}]
+    roles += [{'id': str(guild_id + 1 + index), 'name': f'rôle-{index}', 'permissions': str(rng.getrandbits(40)),
+               'position': index + 1, 'color': rng.getrandbits(24), 'hoist': False, 'managed': False,
+               'mentionable': False, 'flags': 0} for index in range(args.roles)]
+    first_channel = guild_id + 1 + args.roles
+    channels = [{'id': str(first_channel + index), 'type': 2 if index % 5 == 4 else 0, 'name': f'salon-{index}',
+                 'position': index, 'permission_overwrites': [], 'topic': None, 'nsfw': False, 'parent_id': None,
+                 'bitrate': 64000, 'user_limit': 0, 'rtc_region': None}
+                for index in range(args.channels)]
+    # Quelques membres en vocal: présents dans GUILD_CREATE, gardés par le cache 'voice'
+    voice_channels = [channel['id'] for channel in channels if channel['type'] == 2]
+    voice_members = [guild_id * 10 + index for index in range(min(args.members, args.voice))]
+    voice_states = [{'user_id': str(user_id), 'channel_id': rng.choice(voice_channels), 'session_id': 'x', 'deaf': False,
+                     'mute': False, 'self_deaf': False, 'self_mute': False, 'self_video': False, 'suppress': False}
+                    for user_id in voice_members] if voice_channels else []
+    members = [{'user': me, 'roles': [], 'joined_at': TIMESTAMP, 'deaf': False, 'mute': False, 'flags': 0}]
+    members += [member_payload(user_id, []) for user_id in voice_members] if voice_states else []
+    return {'id': str(guild_id), 'name': f'Serveur {guild_id}', 'icon': None, 'owner_id': me['id'], 'roles': roles,
+            'channels': channels, 'emojis': [], 'stickers': [], 'features': [], 'member_count': args.members + 1,
+            'large': args.members > 250, 'members': members, 'voice_states': voice_states, 'threads': [], 'presences': []}
+
+
+def run_profile(name: str, args) -> dict:
+    """Process enfant: alimente un ConnectionState avec les options du profil et mesure."""
+    import discord
+    from discord.member import Member
+    from discord.user import ClientUser
+    from low_memory import client_options, describe
+
+    options = client_options() if name == 'réduit' else {}  # 'défaut': discord.Client() sans option
+    client = discord.Client(**options)
+    state = client._connection
+    me = user_payload(1)
+    state.user = ClientUser(state=state, data=dict(me, email=None, verified=True, mfa_enabled=False, flags=0, premium_type=0, bio=''))
+    flags = state.member_cache_flags
+    rng = random.Random(1)
+    meter = GatewayMeter()
+    gc.collect()
+    baseline = rss_bytes()
+
+    guild_ids = [(index + 1) * 10 ** 8 for index in range(args.guilds)]
+    for guild_id in guild_ids:
+        state._add_guild_from_data(meter.send('GUILD_CREATE', guild_payload(guild_id, me, args, rng)))
+
+    if state._chunk_guilds:
+        # Chunking au démarrage: tous les membres de chaque serveur, gardés selon le cache des membres
+        for guild_id in guild_ids:
+            guild = state._get_guild(guild_id)
+            user_ids = [guild_id * 10 + index for index in range(args.members)]
+            chunks = [user_ids[start:start + CHUNK_SIZE] for start in range(0, len(user_ids), CHUNK_SIZE)]
+            for index, chunk in enumerate(chunks):
+                data = meter.send('GUILD_MEMBERS_CHUNK', {
+                    'guild_id': str(guild_id), 'chunk_index': index, 'chunk_count': len(chunks),
+                    'members': [member_payload(user_id, [str(guild_id + 1 + rng.randrange(args.roles))] if args.roles else [])
+                                for user_id in chunk]})
+                for member_data in data['members']:
+                    member = Member(data=member_data, guild=guild, state=state)
+                    if flags.joined:
+                        guild._add_member(member)
+
+    if state._subscribe_guilds:
+        # Serveurs suivis: mises à jour de présence (et de la liste des membres) en continu
+        for _ in range(args.presences):
+            guild_id = rng.choice(guild_ids)
+            state.parse_presence_update(meter.send('PRESENCE_UPDATE', {
+                'guild_id': str(guild_id), 'user': {'id': str(guild_id * 10 + rng.randrange(args.members))},
+                'status': rng.choice(('online', 'idle', 'dnd')), 'client_status': {'desktop': 'online'},
+                'activities': [{'name': 'Un jeu', 'type': 0, 'created_at': 0}] if rng.random() < 0.3 else []}))
+
+    for index in range(args.messages):
+        guild_id = rng.choice(guild_ids)
+        author_id = guild_id * 10 + rng.randrange(args.members)
+        state.parse_message_create(meter.send('MESSAGE_CREATE', {
+            'id': str(10 ** 17 + index), 'channel_id': str(guild_id + 1 + args.roles + rng.randrange(args.channels) // 5 * 5),
+            'guild_id': str(guild_id), 'author': user_payload(author_id), 'content': f'message {index} ' + 'x' * rng.randrange(200),
+            'timestamp': TIMESTAMP, 'edited_timestamp': None, 'tts': False, 'mention_everyone': False, 'mentions': [],
+            'mention_roles': [], 'attachments': [], 'embeds': [], 'pinned': False, 'type': 0, 'flags': 0,
+            'member': {'roles': [], 'joined_at': TIMESTAMP, 'deaf': False, 'mute': False, 'flags': 0}}))
+
+    gc.collect()
+    return {
+        'profile': describe(options) if options else 'discord.Client() sans option',
+        'rss': rss_bytes(),
+        'baseline': baseline,
+        'messages': len(state._messages) if state._messages is not None else 0,
+        'members': sum(len(guild._members) for guild in state._guilds.values()),
+        'events': meter.events,
+        'raw': meter.raw,
+        'compressed': meter.compressed,
+    }
+
+
+def main(args):
+    print(f'🧪 {args.guilds} serveurs × {args.members} membres, {args.channels} salons, {args.messages} messages, '
+          f'{args.presences} présences (serveurs suivis)\n')
+    results = {}
+    for name in PROFILES:
+        env = dict(os.environ, LOW_MEMORY='1' if name == 'réduit' else '0', OPENAI_API_KEY='')
+        child = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', name] + sys.argv[1:],
+                               env=env, capture_output=True, text=True)
+        if child.returncode != 0:
+            print(f'❌ Profil {name}: {child.stderr.strip()}')
+            return 1
+        results[name] = json.loads(child.stdout.strip().splitlines()[-1])
+        print(f'• {name}: {results[name]["profile"]}')
+
+    print(f'\n{"profil":<10}{"RSS":>10}{"Δ RSS":>10}{"messages":>10}{"membres":>10}{"événements":>12}{"brut":>10}{"zlib":>10}')
+    for name, result in results.items():
+        print(f'{name:<10}{result["rss"] / 2 ** 20:>7.1f} Mo{(result["rss"] - result["baseline"]) / 2 ** 20:>7.1f} Mo'
+              f'{result["messages"]:>10}{result["members"]:>10}{result["events"]:>12}'
+              f'{result["raw"] / 2 ** 20:>7.1f} Mo{result["compressed"] / 2 ** 20:>7.1f} Mo')
+
+    default, low = results['défaut'], results['réduit']
+    grown = default['rss'] - default['baseline']
+    if grown > 0:
+        saved = grown - (low['rss'] - low['baseline'])
+        print(f'\n🪶 Mémoire économisée: {saved / 2 ** 20:.1f} Mo ({saved / grown:.0%} de la croissance du cache), '
+              f'gateway: {1 - low["compressed"] / default["compressed"]:.0%} d\'octets en moins')
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Empreinte mémoire du client discord selon le profil')
+    parser.add_argument('--guilds', type=int, default=10)
+    parser.add_argument('--members', type=int, default=2000, help='membres par serveur')
+    parser.add_argument('--channels', type=int, default=50, help='salons par serveur (1 vocal sur 5)')
+    parser.add_argument('--roles', type=int, default=20, help='rôles par serveur')
+    parser.add_argument('--voice', type=int, default=5, help='membres en vocal par serveur')
+    parser.add_argument('--messages', type=int, default=10000, help='messages reçus pendant la mesure')
+    parser.add_argument('--presences', type=int, default=10000, help='mises à jour de présence (serveurs suivis)')
+    parser.add_argument('--child', choices=PROFILES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_profile(args.child, args)))
+    else:
+        sys.exit(main(args))
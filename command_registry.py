@@ -0,0 +1,161 @@
+"""
+Registre des commandes du selfbot.
+
+Les commandes sont enregistrées avec le décorateur `registry.command(...)` et
+sont retrouvées par une simple recherche dans un dictionnaire (nom ou alias),
+au lieu de parcourir une longue chaîne de if/elif à chaque message.
+"""
+
+import time
+
+from config import COOLDOWN_TIME
+from metrics import metrics
+from profiling import profiler
+
+
+class CommandUsageError(Exception):
+    """Levée par un parseur d'arguments quand la commande est mal utilisée."""
+
+
+class Command:
+    """Une commande enregistrée: son handler, ses alias et son parseur d'arguments."""
+
+    def __init__(self, name: str, handler, aliases=(), usage: str = '', description: str = '',
+                 guild_only: bool = False, parser=None, hidden: bool = False):
+        self.name = name
+        self.handler = handler
+        self.aliases = tuple(aliases)
+        self.usage = usage
+        self.description = description
+        self.guild_only = guild_only
+        self.parser = parser
+        self.hidden = hidden
+
+
+class CommandContext:
+    """Contexte passé aux handlers: message, arguments et client."""
+
+    def __init__(self, bot, message, command: Command, args: list, prefix: str):
+        self.bot = bot
+        self.message = message
+        self.command = command
+        self.args = args
+        self.prefix = prefix
+        self.text = ' '.join(args)
+        self.parsed = None
+
+    async def reply(self, content=None, **kwargs):
+        """Remplace le contenu du message de commande (selfbot: on édite son propre message)."""
+        return await self.message.edit(content=content, **kwargs)
+
+
+def parse_command(content: str, prefix: str):
+    """Découpe un message en (nom de commande, arguments). Renvoie None si ce n'est pas une commande."""
+    if not content.startswith(prefix):
+        return None
+    parts = content[len(prefix):].strip().split()
+    if not parts:
+        return None
+    return parts[0].lower(), parts[1:]
+
+
+class CommandRegistry:
+    """Table des commandes avec dispatch en O(1) et cooldown par commande."""
+
+    def __init__(self, cooldown: float = COOLDOWN_TIME):
+        self.commands = {}  # Nom canonique -> Command (ordre d'enregistrement conservé)
+        self.lookup = {}  # Nom ou alias -> Command
+        self.cooldown = cooldown
+        self.cooldowns = {}
+
+    def command(self, name: str, aliases=(), usage: str = '', description: str = '',
+                guild_only: bool = False, parser=None, hidden: bool = False):
+        """Décorateur qui enregistre un handler `async def handler(ctx)`."""
+        def decorator(handler):
+            self.add(Command(name, handler, aliases=aliases, usage=usage, description=description,
+                             guild_only=guild_only, parser=parser, hidden=hidden))
+            return handler
+        return decorator
+
+    def add(self, command: Command):
+        """Ajoute une commande, en refusant les noms ou alias déjà pris."""
+        for key in (command.name, *command.aliases):
+            if key in self.lookup:
+                raise ValueError(f'Commande déjà enregistrée: {key}')
+        self.commands[command.name] = command
+        for key in (command.name, *command.aliases):
+            self.lookup[key] = command
+
+    def get(self, name: str):
+        """Renvoie la commande correspondant à un nom ou alias, ou None."""
+        return self.lookup.get(name.lower())
+
+    def help_lines(self, prefix: str) -> list:
+        """Lignes du message d'aide, dans l'ordre d'enregistrement."""
+        lines = []
+        for command in self.commands.values():
+            if command.hidden:
+                continue
+            usage = f' {command.usage}' if command.usage else ''
+            lines.append(f'`{prefix}{command.name}{usage}` - {command.description}')
+        return lines
+
+    def check_cooldown(self, name: str) -> bool:
+        """Renvoie True si la commande peut être exécutée, et enregistre l'utilisation."""
+        now = time.time()
+        last_used = self.cooldowns.get(name, 0)
+        if now - last_used < self.cooldown:
+            return False
+        self.cooldowns[name] = now
+        return True
+
+    def build_context(self, bot, message, prefix: str):
+        """Parse le message une seule fois et renvoie le contexte, ou None si aucune commande ne correspond."""
+        parsed = parse_command(message.content, prefix)
+        if not parsed:
+            return None
+        name, args = parsed
+        command = self.lookup.get(name)
+        if not command:
+            return None
+        return CommandContext(bot, message, command, args, prefix)
+
+    async def invoke(self, ctx: CommandContext):
+        """Exécute une commande déjà résolue (vérifications, parseur, handler)."""
+        command = ctx.command
+        started = time.perf_counter()
+        outcome = 'usage'
+        try:
+            if command.guild_only and not ctx.message.guild:
+                await ctx.reply('❌ Cette commande ne peut être utilisée que dans un serveur.')
+                return
+            if command.parser:
+                try:
+                    ctx.parsed = command.parser(ctx)
+                except CommandUsageError as usage_error:
+                    await ctx.reply(f'❌ {usage_error}')
+                    return
+            await command.handler(ctx)
+            outcome = 'ok'
+        except Exception as error:
+            outcome = 'error'
+            # Log seulement les erreurs importantes
+            if 'Unknown Message' not in str(error):
+                print(f'❌ Erreur commande {command.name}: {error}')
+        finally:
+            metrics.observe_command(command.name, time.perf_counter() - started, outcome)
+            profiler.command_finished(command.name)
+
+    async def dispatch(self, bot, message, prefix: str) -> bool:
+        """Point d'entrée depuis on_message. Renvoie True si une commande a été exécutée."""
+        ctx = self.build_context(bot, message, prefix)
+        if not ctx:
+            return False
+        if not self.check_cooldown(ctx.command.name):
+            return False
+        await self.invoke(ctx)
+        return True
+
+
+# Registre partagé par selfbot.py et selfbot-alt.py
+registry = CommandRegistry()
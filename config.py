@@ -0,0 +1,92 @@
+"""
+Configuration partagée par les deux points d'entrée du selfbot.
+Les valeurs sont lues depuis le fichier .env.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement
+load_dotenv()
+
+# Configuration
+TOKEN = os.getenv('TOKEN')
+PREFIX = os.getenv('PREFIX', '!')
+OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
+OPENAI_MODEL = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo')
+# Serveur compatible OpenAI (LM Studio, Ollama, vLLM, tools/mock_openai.py...) et en-tête d'authentification
+OPENAI_BASE_URL = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1')
+OPENAI_AUTH_HEADER = os.getenv('OPENAI_AUTH_HEADER', 'Authorization')
+OPENAI_AUTH_SCHEME = os.getenv('OPENAI_AUTH_SCHEME', 'Bearer')  # Vide pour envoyer la clé seule (ex: api-key d'Azure)
+AI_MAX_TOKENS = int(os.getenv('AI_MAX_TOKENS', '400'))  # Longueur maximale d'une réponse de !ai
+AI_HISTORY_LIMIT = int(os.getenv('AI_HISTORY_LIMIT', '8'))
+
+# Tampon des derniers messages par salon (alimenté par la gateway, évite un channel.history() à chaque !ai)
+AI_BUFFER_PER_CHANNEL = int(os.getenv('AI_BUFFER_PER_CHANNEL', str(max(50, AI_HISTORY_LIMIT))))
+AI_BUFFER_MAX_BYTES = int(os.getenv('AI_BUFFER_MAX_BYTES', str(4 * 1024 * 1024)))
+
+# Budget de tokens du contexte !ai (0 = ancien comportement: les AI_HISTORY_LIMIT derniers messages)
+# et résumé glissant des messages plus anciens, rafraîchi tous les AI_SUMMARY_EVERY messages sortis de la fenêtre
+AI_CONTEXT_TOKENS = int(os.getenv('AI_CONTEXT_TOKENS', '1200'))
+AI_SUMMARY_TOKENS = int(os.getenv('AI_SUMMARY_TOKENS', '200'))
+AI_SUMMARY_EVERY = int(os.getenv('AI_SUMMARY_EVERY', '20'))
+
+# Archive locale des messages vus (exports/messages.sqlite) et recherche TF-IDF des messages anciens pertinents pour !ai
+AI_ARCHIVE_ENABLED = os.getenv('AI_ARCHIVE_ENABLED', '0') == '1'
+AI_ARCHIVE_TOP_K = int(os.getenv('AI_ARCHIVE_TOP_K', '3'))
+AI_ARCHIVE_TOKENS = int(os.getenv('AI_ARCHIVE_TOKENS', '300'))  # Part du budget AI_CONTEXT_TOKENS
+AI_ARCHIVE_SCOPE = os.getenv('AI_ARCHIVE_SCOPE', 'channel')  # 'channel' ou 'guild'
+
+# Session HTTP partagée pour l'IA (connexions keep-alive réutilisées entre les appels)
+AI_HTTP_POOL_LIMIT = int(os.getenv('AI_HTTP_POOL_LIMIT', '10'))
+AI_HTTP_TIMEOUT = float(os.getenv('AI_HTTP_TIMEOUT', '60'))
+AI_HTTP_CONNECT_TIMEOUT = float(os.getenv('AI_HTTP_CONNECT_TIMEOUT', '10'))
+AI_HTTP_KEEPALIVE = float(os.getenv('AI_HTTP_KEEPALIVE', '75'))
+
+# Réponses IA en streaming: le message est édité au fil de la génération (au plus une édition par intervalle)
+AI_STREAM = os.getenv('AI_STREAM', '1') == '1'
+AI_STREAM_EDIT_INTERVAL = float(os.getenv('AI_STREAM_EDIT_INTERVAL', '1.2'))
+
+# Requêtes IA simultanées (les suivantes attendent) et délai maximum par commande, attente comprise
+AI_MAX_CONCURRENT = int(os.getenv('AI_MAX_CONCURRENT', '2'))
+AI_REQUEST_DEADLINE = float(os.getenv('AI_REQUEST_DEADLINE', '90'))
+
+# Cache des réponses IA (mémoire + SQLite dans exports/), désactivable ponctuellement avec --nocache
+AI_CACHE_ENABLED = os.getenv('AI_CACHE_ENABLED', '1') == '1'
+AI_CACHE_TTL = float(os.getenv('AI_CACHE_TTL', '86400'))
+AI_CACHE_MEMORY_ENTRIES = int(os.getenv('AI_CACHE_MEMORY_ENTRIES', '256'))
+AI_CACHE_MAX_BYTES = int(os.getenv('AI_CACHE_MAX_BYTES', str(20 * 1024 * 1024)))
+
+# Système de cooldown pour éviter les requêtes excessives
+COOLDOWN_TIME = 1.0  # 1 seconde entre les commandes
+
+EXPORT_DIR = 'exports'
+
+# Nombre maximum de créations en vol pendant une restauration (toujours sous les rate limits)
+RESTORE_CONCURRENCY = int(os.getenv('RESTORE_CONCURRENCY', '4'))
+
+# Purge: suppressions en parallèle (toujours sous les rate limits) et réessais des erreurs passagères
+PURGE_WORKERS = int(os.getenv('PURGE_WORKERS', '3'))
+PURGE_RETRIES = int(os.getenv('PURGE_RETRIES', '3'))
+
+# Format des backups: 'json' (historique, lisible) ou compact: json+gzip, json+zstd, msgpack, msgpack+gzip, msgpack+zstd
+BACKUP_FORMAT = os.getenv('BACKUP_FORMAT', 'json')
+
+# Historique dédupliqué des sauvegardes (exports/snapshots/), alimenté par save_backup
+SNAPSHOTS_ENABLED = os.getenv('SNAPSHOTS_ENABLED', '1') == '1'
+
+# Mesures du process (!stats) et endpoint Prometheus local: http://METRICS_HOST:METRICS_PORT/metrics (0 = désactivé)
+METRICS_HOST = os.getenv('METRICS_HOST', '127.0.0.1')
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+LOOP_LAG_INTERVAL = float(os.getenv('LOOP_LAG_INTERVAL', '1.0'))  # Secondes entre deux mesures du retard de la boucle
+
+# Surveillance des blocages de la boucle (!stallwatch): seuil par défaut en secondes
+STALL_THRESHOLD = float(os.getenv('STALL_THRESHOLD', '0.25'))
+
+# Profil mémoire réduit du client (LOW_MEMORY=1): cache de messages borné, membres non mis en cache ni chunkés,
+# pas d'abonnement aux serveurs. Chaque réglage reste modifiable seul; les membres manquants sont lus à l'API à la demande.
+LOW_MEMORY = os.getenv('LOW_MEMORY', '0') == '1'
+MAX_MESSAGES = int(os.getenv('MAX_MESSAGES', '100' if LOW_MEMORY else '1000'))  # 0 = pas de cache de messages
+MEMBER_CACHE = os.getenv('MEMBER_CACHE', 'voice' if LOW_MEMORY else 'all')  # all, voice (membres en vocal) ou none
+CHUNK_GUILDS = os.getenv('CHUNK_GUILDS', '0' if LOW_MEMORY else '1') == '1'
+GUILD_SUBSCRIPTIONS = os.getenv('GUILD_SUBSCRIPTIONS', '0' if LOW_MEMORY else '1') == '1'
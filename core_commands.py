@@ -0,0 +1,341 @@
+"""
+Commandes communes aux deux points d'entrée (selfbot.py et selfbot-alt.py).
+L'import de ce module enregistre les commandes dans le registre partagé.
+"""
+
+import re
+import time
+import discord
+from datetime import datetime, timedelta, timezone
+from discord.utils import time_snowflake
+
+from command_registry import registry, CommandUsageError
+from own_messages import own_index
+from purge import PurgePipeline
+from ai import ThrottledEditor
+from metrics import metrics
+from profiling import profiler, memory_tracker, stall_watchdog
+from low_memory import resolve_member
+
+
+TIME_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'j': 86400}
+
+
+def parse_time_bound(text: str) -> datetime:
+    """Durée relative ('30m', '2h', '7d': il y a...) ou date 'AAAA-MM-JJ' (UTC)."""
+    match = re.fullmatch(r'(\d+)([smhdj])', text.lower())
+    if match:
+        return discord.utils.utcnow() - timedelta(seconds=int(match.group(1)) * TIME_UNITS[match.group(2)])
+    try:
+        return datetime.strptime(text, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+    except ValueError:
+        raise CommandUsageError(f'Durée ou date invalide: {text} (ex: 30m, 2h, 7d, 2024-01-31)')
+
+
+def parse_purge_args(ctx) -> dict:
+    """Nombre de messages (ou `all`), intervalle de temps (--since / --until) et --all-channels."""
+    options = {'amount': None, 'since': None, 'until': None, 'all_channels': False}
+    has_amount = False
+    args = list(ctx.args)
+    while args:
+        arg = args.pop(0)
+        lower = arg.lower()
+        if lower in ('--since', '--depuis', '--until', '--avant'):
+            if not args:
+                raise CommandUsageError(f'Valeur manquante après {arg}')
+            options['since' if lower in ('--since', '--depuis') else 'until'] = parse_time_bound(args.pop(0))
+        elif lower in ('--all-channels', '--partout'):
+            options['all_channels'] = True
+        elif lower in ('all', 'tout'):
+            has_amount = True
+        else:
+            try:
+                amount = int(arg)
+            except ValueError:
+                raise CommandUsageError('Veuillez spécifier un nombre valide.')
+            if amount < 1:
+                raise CommandUsageError('Veuillez spécifier un nombre supérieur à 0.')
+            options['amount'] = amount
+            has_amount = True
+    if not has_amount and options['since'] is None:
+        raise CommandUsageError('Veuillez spécifier un nombre de messages, `all` ou `--since <durée>`.')
+    return options
+
+
+@registry.command('ping', description='Affiche la latence du bot')
+async def ping_command(ctx):
+    start = time.time() * 1000
+    await ctx.reply(f'🏓 Pong! Latence: {int((time.time() * 1000) - start)}ms')
+
+
+@registry.command('help', description='Affiche ce message d\'aide')
+async def help_command(ctx):
+    help_text = '**📋 Commandes disponibles:**\n\n' + '\n'.join(registry.help_lines(ctx.prefix))
+    await ctx.reply(help_text)
+
+
+@registry.command('info', description='Affiche les informations du compte')
+async def info_command(ctx):
+    bot = ctx.bot
+    info = f"""
+**📊 Informations du compte:**
+
+**Tag:** {bot.user.name}#{bot.user.discriminator}
+**ID:** {bot.user.id}
+**Créé le:** {bot.user.created_at.strftime('%d/%m/%Y')}
+**Bot:** {'Oui' if bot.user.bot else 'Non'}
+**Serveurs:** {len(bot.guilds)}
+**Utilisateurs:** {len(bot.users)}
+    """.strip()
+    await ctx.reply(info)
+
+
+@registry.command('avatar', usage='[@user]', description='Affiche l\'avatar d\'un utilisateur')
+async def avatar_command(ctx):
+    message = ctx.message
+    user = message.mentions[0] if message.mentions else ctx.bot.user
+    avatar_url = str(user.display_avatar.url)
+    await ctx.reply(f'**Avatar de {user.name}#{user.discriminator}:**\n{avatar_url}')
+
+
+@registry.command('serverinfo', description='Affiche les informations du serveur', guild_only=True)
+async def serverinfo_command(ctx):
+    guild = ctx.message.guild
+    owner = await resolve_member(guild, guild.owner_id) if guild.owner_id else None
+    info = f"""
+**📊 Informations du serveur:**
+
+**Nom:** {guild.name}
+**ID:** {guild.id}
+**Propriétaire:** {owner.name if owner else 'Inconnu'}
+**Membres:** {guild.member_count}
+**Salons:** {len(guild.channels)}
+**Rôles:** {len(guild.roles)}
+**Créé le:** {guild.created_at.strftime('%d/%m/%Y')}
+**Boost:** Niveau {guild.premium_tier} ({guild.premium_subscription_count} boosts)
+    """.strip()
+    await ctx.reply(info)
+
+
+@registry.command('userinfo', usage='[@user]', description='Affiche les informations d\'un utilisateur')
+async def userinfo_command(ctx):
+    message = ctx.message
+    user = message.mentions[0] if message.mentions else ctx.bot.user
+    # Sans cache des membres (LOW_MEMORY), le membre est lu à l'API seulement ici
+    member = await resolve_member(message.guild, user) if message.guild else None
+
+    info = f"""
+**👤 Informations de {user.name}#{user.discriminator}:**
+
+**ID:** {user.id}
+**Tag:** {user.name}#{user.discriminator}
+**Bot:** {'Oui' if user.bot else 'Non'}
+**Créé le:** {user.created_at.strftime('%d/%m/%Y')}
+    """
+
+    if member:
+        info += f"""
+**Rejoint le:** {member.joined_at.strftime('%d/%m/%Y') if member.joined_at else 'Inconnu'}
+**Rôles:** {len(member.roles) - 1}
+**Permissions:** {len([p for p in member.guild_permissions if p[1]])}
+        """
+
+    await ctx.reply(info.strip())
+
+
+@registry.command('say', usage='<message>', description='Répète un message')
+async def say_command(ctx):
+    if not ctx.text:
+        await ctx.reply(f'❌ Usage: `{ctx.prefix}say <message>`')
+        return
+    await ctx.reply(ctx.text)
+
+
+@registry.command('embed', usage='<titre> | <description>', description='Crée un embed')
+async def embed_command(ctx):
+    if '|' not in ctx.text:
+        await ctx.reply(f'❌ Usage: `{ctx.prefix}embed <titre> | <description>`')
+        return
+
+    title, description = ctx.text.split('|', 1)
+    embed = discord.Embed(
+        title=title.strip(),
+        description=description.strip(),
+        color=0x5865F2,
+        timestamp=datetime.utcnow()
+    )
+    await ctx.reply(None, embed=embed)
+
+
+def can_read_history(channel) -> bool:
+    me = channel.guild.me if getattr(channel, 'guild', None) else None
+    return me is None or channel.permissions_for(me).read_message_history
+
+
+@registry.command('purge', usage='<nombre|all> [--since 2h] [--until 2024-01-31] [--all-channels]',
+                  description='Supprime vos propres messages', parser=parse_purge_args)
+async def purge_command(ctx):
+    options = ctx.parsed
+    message = ctx.message
+    amount = options['amount']
+    after = time_snowflake(options['since']) if options['since'] else None
+    before = time_snowflake(options['until']) if options['until'] else None
+
+    if not message.channel:
+        await ctx.reply('❌ Cette commande ne peut être utilisée que dans un salon.')
+        return
+
+    if not options['all_channels']:
+        channels = [message.channel]
+    elif message.guild:
+        channels = [channel for channel in message.guild.text_channels if can_read_history(channel)]
+    else:
+        channels = list(ctx.bot.private_channels)
+
+    await ctx.reply('🧹 Recherche de vos messages...')
+    # L'index local donne les IDs directement; l'historique n'est parcouru que là où il ne l'a jamais été,
+    # et les suppressions commencent pendant ce parcours
+    pipeline = PurgePipeline(own_index, channels, ctx.bot.user, after=after, before=before, amount=amount,
+                             exclude_ids=(message.id,))
+    editor = ThrottledEditor(message)
+    await pipeline.run(progress=lambda p: editor.update(f'🧹 {p.describe()}'))
+    await editor.finish(f'✅ Purge terminée: {pipeline.describe()}')
+
+
+STATUS_MAP = {
+    'online': discord.Status.online,
+    'idle': discord.Status.idle,
+    'dnd': discord.Status.dnd,
+    'invisible': discord.Status.invisible
+}
+
+ACTIVITY_MAP = {
+    'PLAYING': discord.ActivityType.playing,
+    'STREAMING': discord.ActivityType.streaming,
+    'LISTENING': discord.ActivityType.listening,
+    'WATCHING': discord.ActivityType.watching,
+    'COMPETING': discord.ActivityType.competing
+}
+
+
+@registry.command('status', usage='<type>', description='Change le statut (online, idle, dnd, invisible)')
+async def status_command(ctx):
+    if not ctx.args:
+        await ctx.reply(f'❌ Usage: `{ctx.prefix}status <online|idle|dnd|invisible>`')
+        return
+
+    status = ctx.args[0].lower()
+    if status not in STATUS_MAP:
+        await ctx.reply(f'❌ Statut invalide. Statuts disponibles: {", ".join(STATUS_MAP.keys())}')
+        return
+
+    try:
+        await ctx.bot.change_presence(status=STATUS_MAP[status])
+    except Exception:
+        await ctx.reply('❌ Erreur lors du changement de statut.')
+
+
+@registry.command('activity', usage='<type> <nom>', description='Change l\'activité (playing, streaming, listening, watching)')
+async def activity_command(ctx):
+    if len(ctx.args) < 2:
+        await ctx.reply(f'❌ Usage: `{ctx.prefix}activity <type> <nom>`\nTypes: {", ".join(ACTIVITY_MAP.keys())}')
+        return
+
+    activity_type = ctx.args[0].upper()
+    activity_name = ' '.join(ctx.args[1:])
+
+    if activity_type not in ACTIVITY_MAP:
+        await ctx.reply(f'❌ Usage: `{ctx.prefix}activity <type> <nom>`\nTypes: {", ".join(ACTIVITY_MAP.keys())}')
+        return
+
+    try:
+        activity = discord.Activity(type=ACTIVITY_MAP[activity_type], name=activity_name)
+        await ctx.bot.change_presence(activity=activity)
+    except Exception:
+        await ctx.reply('❌ Erreur lors du changement d\'activité.')
+
+
+@registry.command('stats', usage='[reset]', description='Affiche la durée des commandes, les appels à l\'API, les tokens IA et le retard de la boucle')
+async def stats_command(ctx):
+    if ctx.args and ctx.args[0].lower() == 'reset':
+        metrics.reset()
+        await ctx.reply('🧹 Statistiques remises à zéro.')
+        return
+    text = metrics.summary()
+    await ctx.reply(text if len(text) <= 1990 else text[:1989] + '…')
+
+
+def parse_profile_args(ctx) -> dict:
+    """`5` (les 5 prochaines commandes), `30s` / `2m` (fenêtre de temps), `stop` ou rien (état)."""
+    if not ctx.args:
+        return {'action': 'status'}
+    arg = ctx.args[0].lower()
+    if arg in ('stop', 'status'):
+        return {'action': arg}
+    if arg.isdigit() and int(arg) > 0:
+        return {'action': 'start', 'commands': min(int(arg), 1000), 'seconds': None}
+    match = re.fullmatch(r'(\d+)([sm])', arg)
+    if match and int(match.group(1)) > 0:
+        return {'action': 'start', 'commands': None, 'seconds': min(int(match.group(1)) * TIME_UNITS[match.group(2)], 3600)}
+    raise CommandUsageError('Usage: `profile <nombre de commandes | 30s | 5m | stop>`')
+
+
+@registry.command('profile', usage='[N | 30s | stop]', parser=parse_profile_args,
+                  description='Profile (cProfile) les N prochaines commandes ou une durée, rapport dans exports/profiles/')
+async def profile_command(ctx):
+    options = ctx.parsed
+    try:
+        if options['action'] == 'status':
+            await ctx.reply(f'📊 {profiler.status()}')
+        elif options['action'] == 'stop':
+            await ctx.reply(f'📊 {await profiler.stop()}')
+        else:
+            profiler.start(options['commands'], options['seconds'], notify=lambda summary: ctx.reply(f'📊 {summary}'))
+            window = f'{options["commands"]} prochaine(s) commande(s)' if options['commands'] else f'{options["seconds"]}s'
+            await ctx.reply(f'📊 Profilage démarré pour {window}.')
+    except RuntimeError as e:
+        await ctx.reply(f'❌ Profilage: {e}')
+
+
+@registry.command('memsnap', usage='[start | take | diff | stop]',
+                  description='Instantanés mémoire (tracemalloc) et différence entre les deux derniers, rapport dans exports/profiles/')
+async def memsnap_command(ctx):
+    action = ctx.args[0].lower() if ctx.args else 'take'
+    try:
+        if action == 'start':
+            memory_tracker.start()
+            await ctx.reply(f'🧠 tracemalloc démarré. {await memory_tracker.take()}')
+        elif action == 'take':
+            await ctx.reply(f'🧠 {await memory_tracker.take()}')
+        elif action == 'diff':
+            await ctx.reply(f'🧠 {await memory_tracker.diff()}')
+        elif action == 'stop':
+            memory_tracker.stop()
+            await ctx.reply('🧠 tracemalloc arrêté.')
+        else:
+            await ctx.reply(f'❌ Usage: `{ctx.prefix}memsnap [start | take | diff | stop]`')
+    except RuntimeError as e:
+        await ctx.reply(f'❌ Mémoire: {e} (`{ctx.prefix}memsnap start` d\'abord)')
+
+
+@registry.command('stallwatch', usage='[on [ms] | off]',
+                  description='Écrit la pile du code qui bloque la boucle d\'événements plus longtemps que le seuil')
+async def stallwatch_command(ctx):
+    action = ctx.args[0].lower() if ctx.args else ''
+    if action == 'on':
+        threshold = None
+        if len(ctx.args) > 1:
+            if not ctx.args[1].isdigit() or int(ctx.args[1]) < 10:
+                await ctx.reply('❌ Seuil invalide (en millisecondes, 10 au minimum).')
+                return
+            threshold = int(ctx.args[1]) / 1000
+        stall_watchdog.start(threshold)
+        await ctx.reply(f'🐢 Surveillance active: blocages de plus de {stall_watchdog.threshold * 1000:.0f} ms '
+                        f'écrits dans `{stall_watchdog.log_path}`')
+    elif action == 'off':
+        stall_watchdog.stop()
+        await ctx.reply(f'🐢 Surveillance arrêtée ({stall_watchdog.stalls} blocage(s) détecté(s)).')
+    else:
+        state = 'active' if stall_watchdog.active else 'inactive'
+        await ctx.reply(f'🐢 Surveillance {state}, seuil {stall_watchdog.threshold * 1000:.0f} ms, '
+                        f'{stall_watchdog.stalls} blocage(s) détecté(s). Usage: `{ctx.prefix}stallwatch [on [ms] | off]`')
@@ -0,0 +1,80 @@
+"""
+Profil mémoire du client discord et résolution paresseuse des membres.
+
+Par défaut, discord.py garde 1000 messages, tous les membres des serveurs
+(chunkés au démarrage) et s'abonne à chaque serveur (présences, liste des
+membres). Avec LOW_MEMORY=1 (config.py), le cache de messages est borné,
+seuls les membres en vocal sont gardés et aucun serveur n'est chunké ni
+suivi: `get_member()` ne trouve alors plus la plupart des membres, et les
+commandes qui en ont besoin passent par `resolve_member()` (une requête
+à l'API, sous le planificateur de rate limit, seulement si le cache échoue).
+"""
+
+import discord
+
+from config import LOW_MEMORY, MAX_MESSAGES, MEMBER_CACHE, CHUNK_GUILDS, GUILD_SUBSCRIPTIONS
+from rate_limit import scheduler as default_scheduler, route_key
+
+MEMBER_CACHE_FLAGS = {
+    'all': discord.MemberCacheFlags.all,
+    'voice': lambda: discord.MemberCacheFlags(voice=True, joined=False),
+    'none': discord.MemberCacheFlags.none,
+}
+
+
+def member_cache_flags(name: str = MEMBER_CACHE) -> discord.MemberCacheFlags:
+    """Drapeaux de cache des membres pour `MEMBER_CACHE` (all, voice ou none)."""
+    factory = MEMBER_CACHE_FLAGS.get(name.lower())
+    if factory is None:
+        print(f'⚠️  MEMBER_CACHE inconnu: {name!r} (all, voice ou none), cache complet utilisé')
+        factory = MEMBER_CACHE_FLAGS['all']
+    return factory()
+
+
+def client_options(max_messages: int = MAX_MESSAGES, member_cache: str = MEMBER_CACHE, chunk_guilds: bool = CHUNK_GUILDS,
+                   guild_subscriptions: bool = GUILD_SUBSCRIPTIONS) -> dict:
+    """Options de cache passées à discord.Client / commands.Bot (valeurs de .env par défaut)."""
+    flags = member_cache_flags(member_cache)
+    return {
+        'max_messages': max_messages if max_messages > 0 else None,
+        'member_cache_flags': flags,
+        # discord.py refuse de chunker sans cache des membres ou sans abonnement aux serveurs
+        'chunk_guilds_at_startup': chunk_guilds and flags.joined and guild_subscriptions,
+        'guild_subscriptions': guild_subscriptions,
+    }
+
+
+def describe(options: dict = None) -> str:
+    """Résumé du profil, affiché au démarrage quand LOW_MEMORY est activé."""
+    options = options or client_options()
+    max_messages = options['max_messages']
+    flags = options['member_cache_flags']
+    messages = f'{max_messages} messages en cache' if max_messages else 'sans cache de messages'
+    members = 'tous les membres' if flags.joined else ('membres en vocal' if flags.voice else 'aucun membre')
+    chunking = 'chunking' if options['chunk_guilds_at_startup'] else 'sans chunking'
+    subscriptions = 'abonnements aux serveurs' if options['guild_subscriptions'] else 'sans abonnements aux serveurs'
+    return f'{"Profil mémoire réduit" if LOW_MEMORY else "Profil mémoire"}: {messages}, {members} en cache, {chunking}, {subscriptions}'
+
+
+async def resolve_member(guild, user, scheduler=None):
+    """Membre `user` (utilisateur, membre ou ID) du serveur: objet déjà membre, cache, puis API.
+
+    Renvoie None si l'utilisateur ne fait pas partie du serveur. Le membre lu à
+    l'API n'est pas ajouté au cache; son état vocal (`member.voice`) vient du
+    cache des états vocaux du serveur, tenu à jour même sans cache des membres.
+    """
+    if isinstance(user, discord.Member) and user.guild.id == guild.id:
+        # Les mentions d'un message de serveur sont déjà des membres
+        return user
+    user_id = user if isinstance(user, int) else user.id
+    member = guild.get_member(user_id)
+    if member is not None:
+        return member
+    route = route_key('GET', f'/guilds/{guild.id}/members/{user_id}')
+    try:
+        return await (scheduler or default_scheduler).call(route, guild.fetch_member, user_id)
+    except discord.NotFound:
+        return None
+    except discord.HTTPException as e:
+        print(f'⚠️  Lecture du membre {user_id} impossible: {e}')
+        return None
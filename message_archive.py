@@ -0,0 +1,240 @@
+"""
+Archive locale des messages vus par le client (exports/messages.sqlite), avec index TF-IDF.
+
+Optionnelle (`AI_ARCHIVE_ENABLED=1`). Chaque message reçu est enregistré avec
+ses termes (table `postings`, mise à jour message par message: ajout,
+modification, suppression). `!ai` y cherche les messages plus anciens les plus
+proches de la question, au lieu de remonter l'historique du salon par l'API.
+
+Score d'un message: somme sur les termes communs de (1 + log tf) * idf², divisée
+par la norme du message. NumPy accélère le calcul s'il est installé, sinon le
+calcul se fait en Python pur.
+"""
+
+import os
+import re
+import math
+import time
+import heapq
+import asyncio
+import sqlite3
+
+from config import EXPORT_DIR, AI_ARCHIVE_TOP_K
+
+ARCHIVE_PATH = os.path.join(EXPORT_DIR, 'messages.sqlite')
+MAX_POSTINGS = 3000  # Entrées d'index lues au plus par recherche (les termes trop fréquents sont ignorés)
+COMMIT_EVERY = 100  # Écritures entre deux commits (la connexion voit ses propres écritures non validées)
+COMMIT_INTERVAL = 5.0  # Secondes au plus avant de valider les écritures en attente
+
+TOKEN_RE = re.compile(r'\w{2,}', re.UNICODE)
+STOP_WORDS = frozenset(
+    'le la les un une des du de et ou en au aux ce ces cet cette il elle ils elles on nous vous je tu me te se '
+    'ne pas plus que qui quoi est sont été être avoir ai as a avons avez ont pour par sur dans avec sans mais '
+    'donc car si oui non mon ma mes ton ta tes son sa ses leur leurs y ça ca the and or of to in is are was '
+    'were be it this that for on with as at by an'.split()
+)
+
+
+def tokenize(text: str) -> list:
+    """Termes indexés d'un texte (minuscules, sans mots vides ni nombres seuls)."""
+    return [word for word in TOKEN_RE.findall(text.lower()) if word not in STOP_WORDS and not word.isdigit()]
+
+
+def _term_counts(text: str) -> dict:
+    counts = {}
+    for term in tokenize(text):
+        counts[term] = counts.get(term, 0) + 1
+    return counts
+
+
+def _doc_norm(counts: dict) -> float:
+    return math.sqrt(sum((1 + math.log(tf)) ** 2 for tf in counts.values())) or 1.0
+
+
+def _numpy():
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class MessageArchive:
+    """Messages en SQLite + index inversé incrémental pour la recherche TF-IDF."""
+
+    def __init__(self, path: str = ARCHIVE_PATH):
+        self.path = path
+        self.stats = {'added': 0, 'searches': 0, 'search_ms': 0.0}
+        self._db = None
+        self._pending = 0
+        self._flush_task = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('PRAGMA synchronous=NORMAL')
+            self._db.executescript(
+                'CREATE TABLE IF NOT EXISTS messages ('
+                'id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL, guild_id INTEGER, author_id INTEGER, '
+                'author_name TEXT, content TEXT NOT NULL, created_at REAL, norm REAL NOT NULL);'
+                'CREATE INDEX IF NOT EXISTS messages_channel ON messages (channel_id);'
+                'CREATE INDEX IF NOT EXISTS messages_guild ON messages (guild_id);'
+                'CREATE TABLE IF NOT EXISTS postings ('
+                'term TEXT NOT NULL, message_id INTEGER NOT NULL, tf INTEGER NOT NULL, PRIMARY KEY (term, message_id)) '
+                'WITHOUT ROWID;'
+                'CREATE INDEX IF NOT EXISTS postings_message ON postings (message_id);'
+            )
+        return self._db
+
+    def _commit(self):
+        self._pending += 1
+        if self._pending >= COMMIT_EVERY:
+            self.flush()
+
+    def flush(self):
+        """Valide les écritures en attente."""
+        if self._db is not None and self._pending:
+            self._db.commit()
+            self._pending = 0
+
+    async def _flush_periodically(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            self.flush()
+
+    def start_flush_timer(self, interval: float = COMMIT_INTERVAL):
+        """Valide les écritures en attente toutes les `interval` secondes (une seule tâche, même après une reconnexion)."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.ensure_future(self._flush_periodically(interval))
+
+    def _index(self, db: sqlite3.Connection, message_id: int, counts: dict):
+        db.executemany('INSERT OR REPLACE INTO postings (term, message_id, tf) VALUES (?, ?, ?)',
+                       [(term, message_id, tf) for term, tf in counts.items()])
+
+    def add(self, message):
+        """Archive un message reçu par la gateway (ignoré s'il n'a pas de texte)."""
+        content = message.content
+        if not content:
+            return
+        counts = _term_counts(content)
+        db = self._conn()
+        guild = getattr(message, 'guild', None)
+        created_at = message.created_at.timestamp() if getattr(message, 'created_at', None) else None
+        db.execute('INSERT OR REPLACE INTO messages (id, channel_id, guild_id, author_id, author_name, content, created_at, norm) '
+                   'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                   (message.id, message.channel.id, guild.id if guild else None, message.author.id,
+                    message.author.display_name, content, created_at, _doc_norm(counts)))
+        self._index(db, message.id, counts)
+        self.stats['added'] += 1
+        self._commit()
+
+    def edit(self, message_id: int, content: str):
+        """Met à jour le texte et les termes d'un message déjà archivé."""
+        if content is None:
+            return
+        db = self._conn()
+        if db.execute('SELECT 1 FROM messages WHERE id = ?', (message_id,)).fetchone() is None:
+            return
+        counts = _term_counts(content)
+        db.execute('UPDATE messages SET content = ?, norm = ? WHERE id = ?', (content, _doc_norm(counts), message_id))
+        db.execute('DELETE FROM postings WHERE message_id = ?', (message_id,))
+        self._index(db, message_id, counts)
+        self._commit()
+
+    def delete(self, message_id: int):
+        """Retire un message supprimé de l'archive et de l'index."""
+        db = self._conn()
+        db.execute('DELETE FROM messages WHERE id = ?', (message_id,))
+        db.execute('DELETE FROM postings WHERE message_id = ?', (message_id,))
+        self._commit()
+
+    def _scores(self, rows: list, query_weights: dict) -> dict:
+        # rows: (term, message_id, tf) pour les termes de la requête
+        numpy = _numpy()
+        if numpy is not None and len(rows) > 256:
+            terms, message_ids, tfs = zip(*rows)
+            weights = numpy.array([query_weights[term] for term in terms]) * (1 + numpy.log(numpy.array(tfs, dtype=float)))
+            unique_ids, positions = numpy.unique(numpy.array(message_ids, dtype=numpy.int64), return_inverse=True)
+            totals = numpy.bincount(positions, weights=weights)
+            return dict(zip(unique_ids.tolist(), totals.tolist()))
+        scores = {}
+        for term, message_id, tf in rows:
+            scores[message_id] = scores.get(message_id, 0.0) + query_weights[term] * (1 + math.log(tf))
+        return scores
+
+    def search(self, query: str, channel_id: int = None, guild_id: int = None, k: int = AI_ARCHIVE_TOP_K,
+               exclude_ids=()) -> list:
+        """Les `k` messages les plus pertinents pour `query`, du plus ancien au plus récent.
+
+        Renvoie des tuples (id, author_name, content, created_at), filtrés par salon ou serveur.
+        """
+        started = time.perf_counter()
+        query_terms = set(tokenize(query))
+        if not query_terms or k <= 0:
+            return []
+        db = self._conn()
+        placeholders = ','.join('?' * len(query_terms))
+        total = db.execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+        frequencies = dict(db.execute(f'SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term',
+                                      list(query_terms)).fetchall())
+        if not frequencies:
+            return []
+        # Termes les plus rares d'abord: pour un terme présent partout, seules ses entrées les plus récentes sont lues
+        query_weights, limits, budget = {}, {}, MAX_POSTINGS
+        for term, df in sorted(frequencies.items(), key=lambda item: item[1]):
+            if budget <= 0:
+                break
+            # idf²: poids du terme dans la requête et dans le message
+            query_weights[term] = math.log((total + 1) / (df + 1)) ** 2 + 1e-9
+            limits[term] = budget
+            budget -= df
+
+        scope, scope_args = '', []
+        if channel_id is not None:
+            scope, scope_args = ' AND m.channel_id = ?', [channel_id]
+        elif guild_id is not None:
+            scope, scope_args = ' AND m.guild_id = ?', [guild_id]
+        rows, norms = [], {}
+        for term in query_weights:
+            # CROSS JOIN: SQLite parcourt l'index du terme puis vérifie le salon, pas l'inverse
+            for message_id, tf, norm in db.execute(
+                    f'SELECT p.message_id, p.tf, m.norm FROM postings p CROSS JOIN messages m ON m.id = p.message_id '
+                    f'WHERE p.term = ?{scope} ORDER BY p.message_id DESC LIMIT ?', [term] + scope_args + [limits[term]]):
+                rows.append((term, message_id, tf))
+                norms[message_id] = norm
+        scores = self._scores(rows, query_weights)
+        for message_id in exclude_ids:
+            scores.pop(message_id, None)
+        if not scores:
+            return []
+
+        best = heapq.nlargest(k, scores, key=lambda message_id: scores[message_id] / norms.get(message_id, 1.0))
+        results = db.execute(f'SELECT id, author_name, content, created_at FROM messages WHERE id IN ({",".join("?" * len(best))}) '
+                             f'ORDER BY id', best).fetchall()
+        self.stats['searches'] += 1
+        self.stats['search_ms'] += (time.perf_counter() - started) * 1000
+        return results
+
+    def summary(self) -> str:
+        """Compteurs lisibles pour la commande aicache."""
+        count = self._conn().execute('SELECT COUNT(*) FROM messages').fetchone()[0]
+        searches = self.stats['searches']
+        average = f'{self.stats["search_ms"] / searches:.1f} ms' if searches else '-'
+        return f'🗄️ Archive: {count} messages indexés, {searches} recherches (moyenne {average})'
+
+    def close(self):
+        """Valide les dernières écritures et ferme la base (à l'arrêt du client)."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._db is not None:
+            self._db.commit()
+            self._db.close()
+            self._db = None
+            self._pending = 0
+
+
+# Archive partagée, alimentée par les événements de selfbot.py quand AI_ARCHIVE_ENABLED=1
+archive = MessageArchive()
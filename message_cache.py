@@ -0,0 +1,113 @@
+"""
+Tampon circulaire des derniers messages de chaque salon, alimenté par la gateway.
+
+Les événements on_message / on_raw_message_edit / on_raw_message_delete
+tiennent le tampon à jour. Le contexte de `!ai` est lu ici au lieu d'appeler
+`channel.history()` à chaque commande; l'API REST n'est utilisée qu'une fois
+par salon (démarrage à froid ou après une déconnexion).
+"""
+
+from collections import OrderedDict, deque
+
+from config import AI_BUFFER_PER_CHANNEL, AI_BUFFER_MAX_BYTES
+
+RECORD_OVERHEAD = 120  # Estimation de la taille d'un enregistrement hors texte (tuple, entiers)
+
+
+def _record_size(record: tuple) -> int:
+    return RECORD_OVERHEAD + len(record[2]) + len(record[3])
+
+
+class MessageRingBuffer:
+    """Derniers messages par salon, bornés par salon et en mémoire totale."""
+
+    def __init__(self, per_channel: int = AI_BUFFER_PER_CHANNEL, max_bytes: int = AI_BUFFER_MAX_BYTES):
+        self.per_channel = per_channel
+        self.max_bytes = max_bytes
+        self.channels = OrderedDict()  # ID du salon -> deque de (id, author_id, author_name, content)
+        self.warm = set()  # Salons dont le tampon est complet depuis le dernier chargement REST
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'cold_fetches': 0}
+
+    @staticmethod
+    def to_record(message) -> tuple:
+        return (message.id, message.author.id, message.author.display_name, message.content or '')
+
+    def _buffer(self, channel_id: int) -> deque:
+        buffer = self.channels.get(channel_id)
+        if buffer is None:
+            buffer = self.channels[channel_id] = deque(maxlen=self.per_channel)
+        self.channels.move_to_end(channel_id)
+        return buffer
+
+    def _trim(self):
+        # Libérer les salons les moins récemment actifs quand la mémoire totale est dépassée
+        while self.total_bytes > self.max_bytes and len(self.channels) > 1:
+            channel_id, buffer = self.channels.popitem(last=False)
+            self.total_bytes -= sum(_record_size(record) for record in buffer)
+            self.warm.discard(channel_id)
+
+    def add(self, message):
+        """Nouveau message reçu par la gateway."""
+        buffer = self._buffer(message.channel.id)
+        if len(buffer) == buffer.maxlen:
+            self.total_bytes -= _record_size(buffer[0])
+        record = self.to_record(message)
+        buffer.append(record)
+        self.total_bytes += _record_size(record)
+        self._trim()
+
+    def edit(self, channel_id: int, message_id: int, content: str):
+        """Message modifié (payload brut: le message n'a pas besoin d'être dans le cache de discord.py)."""
+        buffer = self.channels.get(channel_id)
+        if not buffer or content is None:
+            return
+        for index, record in enumerate(buffer):
+            if record[0] == message_id:
+                updated = (record[0], record[1], record[2], content)
+                self.total_bytes += _record_size(updated) - _record_size(record)
+                buffer[index] = updated
+                return
+
+    def delete(self, channel_id: int, message_id: int):
+        """Message supprimé."""
+        buffer = self.channels.get(channel_id)
+        if not buffer:
+            return
+        for record in buffer:
+            if record[0] == message_id:
+                buffer.remove(record)
+                self.total_bytes -= _record_size(record)
+                return
+
+    def seed(self, channel_id: int, messages):
+        """Fusionne un chargement REST avec ce que la gateway a déjà apporté, puis marque le salon complet."""
+        buffer = self._buffer(channel_id)
+        merged = {record[0]: record for record in buffer}
+        for message in messages:
+            merged.setdefault(message.id, self.to_record(message))
+        self.total_bytes -= sum(_record_size(record) for record in buffer)
+        buffer.clear()
+        for message_id in sorted(merged)[-self.per_channel:]:
+            buffer.append(merged[message_id])
+            self.total_bytes += _record_size(merged[message_id])
+        self.warm.add(channel_id)
+        self._trim()
+
+    def recent(self, channel_id: int, limit: int):
+        """Les `limit` derniers messages d'un salon complet, du plus ancien au plus récent, ou None si froid."""
+        if channel_id not in self.warm or limit > self.per_channel:
+            return None
+        buffer = self.channels.get(channel_id)
+        if buffer is None:
+            return None
+        self.stats['hits'] += 1
+        return list(buffer)[-limit:] if limit else []
+
+    def invalidate(self):
+        """Après une déconnexion, des événements ont pu être manqués: tous les salons redeviennent froids."""
+        self.warm.clear()
+
+
+# Tampon partagé, alimenté par les événements de selfbot.py
+message_buffer = MessageRingBuffer()
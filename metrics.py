@@ -0,0 +1,291 @@
+"""
+Mesures du process: durée des commandes, appels à l'API Discord par route, tokens IA et retard de la boucle.
+
+Le registre de commandes, le planificateur de rate limit et les appels à l'IA
+alimentent l'instance partagée `metrics`. Les valeurs sont lisibles avec
+`!stats` et, si `METRICS_PORT` est défini, au format texte de Prometheus sur
+http://METRICS_HOST:METRICS_PORT/metrics.
+
+Deux sources pour l'API Discord:
+- `selfbot_http_*`: toutes les requêtes REST du client (réponses, éditions,
+  historique, créations...), vues par le hook `scheduler.instrument(client)`:
+  durée de chaque requête (429 réessayés par discord.py compris) et statut;
+- `selfbot_api_*`: seulement les appels passés par `scheduler.call` (restauration,
+  purge, lectures de membres, expulsions vocales), avec leur issue et l'attente
+  imposée par notre planificateur avant l'envoi.
+
+Pour une commande lente, comparer sa durée avec l'attente des rate limits
+(`selfbot_api_wait_seconds_total`) et le temps passé dans les requêtes HTTP
+(`selfbot_http_request_duration_seconds`): le reste est du temps CPU local ou
+de l'attente de l'IA.
+"""
+
+import re
+import time
+import asyncio
+
+from config import METRICS_HOST, METRICS_PORT, LOOP_LAG_INTERVAL
+
+# Bornes des histogrammes (secondes)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+_ID_RE = re.compile(r'/\d+')
+
+
+def metric_route(route: str) -> str:
+    """Route sans aucun ID (même les paramètres majeurs): une série par type de requête, pas par salon."""
+    return _ID_RE.sub('/{id}', route)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+
+class Histogram:
+    """Histogramme cumulatif à bornes fixes, comme ceux de Prometheus."""
+
+    def __init__(self, buckets=DURATION_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Dernière case: au-delà de la plus grande borne
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        index = 0
+        while index < len(self.buckets) and value > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Estimation par interpolation linéaire dans la case concernée (comme histogram_quantile)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                if index == len(self.buckets):
+                    return self.max
+                lower = self.buckets[index - 1] if index else 0.0
+                return min(self.max, lower + (self.buckets[index] - lower) * (rank - seen) / count)
+            seen += count
+        return self.max
+
+    def lines(self, name: str, labels: dict) -> list:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{_labels({**labels, "le": bound})} {cumulative}')
+        lines.append(f'{name}_bucket{_labels({**labels, "le": "+Inf"})} {self.count}')
+        lines.append(f'{name}_sum{_labels(labels)} {self.sum:.6f}')
+        lines.append(f'{name}_count{_labels(labels)} {self.count}')
+        return lines
+
+
+class Metrics:
+    """Compteurs et histogrammes en mémoire, exposés en texte Prometheus et résumés pour !stats."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.commands = {}  # Commande -> Histogram
+        self.command_outcomes = {}  # (commande, 'ok' | 'usage' | 'error') -> nombre
+        self.api_calls = {}  # (route, 'ok' | 'rate_limited' | 'error') -> nombre
+        self.api_wait = {}  # Route -> secondes d'attente imposées par les rate limits
+        self.http = {}  # Route -> Histogram (durée de toutes les requêtes HTTP du client, cf. scheduler.instrument)
+        self.http_status = {}  # (route, statut, 0 pour une erreur réseau) -> nombre
+        self.ai_tokens = {'prompt': 0, 'completion': 0}
+        self.ai_requests = {}  # ('ok' | 'error', 'usage' | 'estimate') -> nombre
+        self.loop_lag = Histogram(LAG_BUCKETS)
+        self._lag_task = None
+        self._runner = None
+        self._url = None
+
+    @staticmethod
+    def _increment(counters: dict, key, amount=1):
+        counters[key] = counters.get(key, 0) + amount
+
+    # Alimentation
+
+    def observe_command(self, name: str, seconds: float, outcome: str = 'ok'):
+        histogram = self.commands.get(name)
+        if histogram is None:
+            histogram = self.commands[name] = Histogram()
+        histogram.observe(seconds)
+        self._increment(self.command_outcomes, (name, outcome))
+
+    def api_call(self, route: str, outcome: str):
+        """Un appel passé par le planificateur: 'ok', 'rate_limited' (429, réessayé) ou 'error'."""
+        self._increment(self.api_calls, (metric_route(route), outcome))
+
+    def rate_limit_wait(self, route: str, seconds: float):
+        self._increment(self.api_wait, metric_route(route), seconds)
+
+    def http_response(self, route: str, status: int, seconds: float):
+        """Une requête REST du client, quelle qu'elle soit (appelée par le hook du planificateur)."""
+        route = metric_route(route)
+        histogram = self.http.get(route)
+        if histogram is None:
+            histogram = self.http[route] = Histogram()
+        histogram.observe(seconds)
+        self._increment(self.http_status, (route, status))
+
+    def ai_usage(self, prompt_tokens: int, completion_tokens: int, estimated: bool = False, outcome: str = 'ok'):
+        self.ai_tokens['prompt'] += prompt_tokens
+        self.ai_tokens['completion'] += completion_tokens
+        self._increment(self.ai_requests, (outcome, 'estimate' if estimated else 'usage'))
+
+    # Retard de la boucle d'événements
+
+    async def _watch_loop_lag(self, interval: float):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + interval
+            await asyncio.sleep(interval)
+            # Tout ce qui dépasse l'intervalle est du temps où la boucle était occupée ailleurs
+            self.loop_lag.observe(max(0.0, loop.time() - expected))
+
+    def start_loop_monitor(self, interval: float = LOOP_LAG_INTERVAL):
+        """Lance la mesure du retard de la boucle (une seule fois, même après une reconnexion)."""
+        if self._lag_task is None or self._lag_task.done():
+            self._lag_task = asyncio.ensure_future(self._watch_loop_lag(interval))
+
+    # Exposition
+
+    def render(self) -> str:
+        """Toutes les mesures au format texte de Prometheus."""
+        lines = []
+
+        def family(name: str, kind: str, help_text: str):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        family('selfbot_uptime_seconds', 'gauge', 'Secondes depuis le démarrage du process')
+        lines.append(f'selfbot_uptime_seconds {time.time() - self.started:.0f}')
+
+        family('selfbot_command_duration_seconds', 'histogram', 'Durée des commandes (vérifications, parseur et handler)')
+        for name, histogram in sorted(self.commands.items()):
+            lines += histogram.lines('selfbot_command_duration_seconds', {'command': name})
+        family('selfbot_commands_total', 'counter', 'Commandes exécutées par issue')
+        for (name, outcome), count in sorted(self.command_outcomes.items()):
+            lines.append(f'selfbot_commands_total{_labels({"command": name, "outcome": outcome})} {count}')
+
+        family('selfbot_api_calls_total', 'counter', 'Appels à l\'API Discord passés par le planificateur, par route et issue')
+        for (route, outcome), count in sorted(self.api_calls.items()):
+            lines.append(f'selfbot_api_calls_total{_labels({"route": route, "outcome": outcome})} {count}')
+        family('selfbot_api_wait_seconds_total', 'counter', 'Attente imposée par les rate limits, par route')
+        for route, seconds in sorted(self.api_wait.items()):
+            lines.append(f'selfbot_api_wait_seconds_total{_labels({"route": route})} {seconds:.6f}')
+
+        family('selfbot_http_request_duration_seconds', 'histogram', 'Durée de toutes les requêtes HTTP du client vers Discord, par route')
+        for route, histogram in sorted(self.http.items()):
+            lines += histogram.lines('selfbot_http_request_duration_seconds', {'route': route})
+        family('selfbot_http_responses_total', 'counter', 'Réponses HTTP de Discord par route et statut (0: erreur réseau)')
+        for (route, status), count in sorted(self.http_status.items()):
+            lines.append(f'selfbot_http_responses_total{_labels({"route": route, "status": status})} {count}')
+
+        family('selfbot_ai_tokens_total', 'counter', 'Tokens consommés par l\'IA (usage renvoyé, sinon estimé)')
+        for kind, count in self.ai_tokens.items():
+            lines.append(f'selfbot_ai_tokens_total{_labels({"kind": kind})} {count}')
+        family('selfbot_ai_requests_total', 'counter', 'Requêtes à l\'IA par issue et source du comptage des tokens')
+        for (outcome, source), count in sorted(self.ai_requests.items()):
+            lines.append(f'selfbot_ai_requests_total{_labels({"outcome": outcome, "tokens": source})} {count}')
+
+        family('selfbot_event_loop_lag_seconds', 'histogram', 'Retard de la boucle d\'événements')
+        lines += self.loop_lag.lines('selfbot_event_loop_lag_seconds', {})
+        return '\n'.join(lines) + '\n'
+
+    def summary(self, top: int = 8) -> str:
+        """Résumé lisible pour la commande stats."""
+        uptime = int(time.time() - self.started)
+        lines = [f'**📈 Statistiques** (depuis {uptime // 3600}h{uptime % 3600 // 60:02d})']
+
+        if self.commands:
+            lines.append('**⌨️ Commandes** (nombre, p50 / p95 / max):')
+            ranked = sorted(self.commands.items(), key=lambda item: item[1].sum, reverse=True)[:top]
+            for name, histogram in ranked:
+                errors = self.command_outcomes.get((name, 'error'), 0)
+                lines.append(f'`{name}` ×{histogram.count}: {histogram.quantile(0.5) * 1000:.0f} / '
+                             f'{histogram.quantile(0.95) * 1000:.0f} / {histogram.max * 1000:.0f} ms'
+                             + (f', ❌ {errors}' if errors else ''))
+
+        if self.http:
+            # Toutes les requêtes du client, y compris ctx.reply / edit qui ne passent pas par le planificateur
+            total = sum(histogram.sum for histogram in self.http.values())
+            wait = sum(self.api_wait.values())
+            lines.append(f'**🌐 HTTP Discord** ({sum(h.count for h in self.http.values())} requêtes, {total:.1f}s dans les requêtes, '
+                         f'{wait:.1f}s d\'attente des rate limits) — requêtes, p50 / p95, 429, erreurs:')
+            ranked = sorted(self.http.items(), key=lambda item: item[1].sum, reverse=True)[:top]
+            for route, histogram in ranked:
+                limited = self.http_status.get((route, 429), 0)
+                errors = sum(count for (other, status), count in self.http_status.items()
+                             if other == route and (status >= 400 or status == 0) and status != 429)
+                lines.append(f'`{route}`: {histogram.count}, {histogram.quantile(0.5) * 1000:.0f} / '
+                             f'{histogram.quantile(0.95) * 1000:.0f} ms, {limited}, {errors}')
+
+        routes = {}
+        for (route, outcome), count in self.api_calls.items():
+            routes.setdefault(route, {'ok': 0, 'rate_limited': 0, 'error': 0})[outcome] = count
+        if routes:
+            lines.append('**📡 Appels planifiés** (restauration, purge... : appels, 429, erreurs, attente rate limit):')
+            ranked = sorted(routes.items(), key=lambda item: sum(item[1].values()), reverse=True)[:top]
+            for route, counts in ranked:
+                lines.append(f'`{route}`: {sum(counts.values())}, {counts["rate_limited"]}, {counts["error"]}, '
+                             f'{self.api_wait.get(route, 0.0):.1f}s')
+
+        requests = sum(self.ai_requests.values())
+        if requests:
+            estimated = sum(count for (_, source), count in self.ai_requests.items() if source == 'estimate')
+            lines.append(f'**🤖 IA:** {requests} requêtes, {self.ai_tokens["prompt"]} tokens envoyés, '
+                         f'{self.ai_tokens["completion"]} reçus' + (f' ({estimated} estimées)' if estimated else ''))
+        if self.loop_lag.count:
+            lines.append(f'**⏱️ Boucle:** retard p50 {self.loop_lag.quantile(0.5) * 1000:.1f} ms, '
+                         f'p99 {self.loop_lag.quantile(0.99) * 1000:.1f} ms, max {self.loop_lag.max * 1000:.1f} ms')
+        if self._runner is not None:
+            lines.append(f'🔗 {self._url}')
+        return '\n'.join(lines)
+
+    def reset(self):
+        """Remet les mesures à zéro (la tâche de mesure et le serveur continuent)."""
+        lag_task, runner, url = self._lag_task, self._runner, self._url
+        self.__init__()
+        self._lag_task, self._runner, self._url = lag_task, runner, url
+
+    async def start_server(self, host: str = METRICS_HOST, port: int = METRICS_PORT):
+        """Sert /metrics en local (une seule fois). Ne fait rien si `port` vaut 0."""
+        if not port or self._runner is not None:
+            return
+        from aiohttp import web
+
+        async def handle(request):
+            return web.Response(text=self.render(), content_type='text/plain', charset='utf-8',
+                                headers={'X-Content-Type-Options': 'nosniff'})
+
+        app = web.Application()
+        app.router.add_get('/metrics', handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        try:
+            await web.TCPSite(runner, host, port).start()
+        except OSError as e:
+            await runner.cleanup()
+            print(f'⚠️  Serveur de métriques indisponible sur {host}:{port}: {e}')
+            return
+        self._runner = runner
+        self._url = f'http://{host}:{port}/metrics'
+        print(f'📈 Métriques: {self._url}')
+
+
+# Mesures partagées par tout le process
+metrics = Metrics()
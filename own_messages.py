@@ -0,0 +1,172 @@
+"""
+Index local des messages envoyés par le compte, par salon (exports/own_messages.sqlite).
+
+`on_message` y ajoute chaque message du compte pendant que le client est
+connecté et `on_raw_message_delete` en retire les messages supprimés. Pour
+ce qui a été envoyé hors connexion ou avant la première utilisation, la
+purge (purge.py) appelle `refresh()`, qui parcourt le trou entre le dernier
+parcours et le début de la session, puis `backfill()`, qui remonte
+l'historique page par page tant qu'il manque des messages. La table `scans`
+retient l'intervalle déjà parcouru (du plus ancien au plus récent message
+vu): chaque page n'est lue qu'une fois, et les IDs connus sont supprimés
+directement, sans relire l'historique.
+"""
+
+import os
+import sqlite3
+
+import discord
+from discord.utils import time_snowflake, utcnow
+
+from config import EXPORT_DIR
+
+OWN_INDEX_PATH = os.path.join(EXPORT_DIR, 'own_messages.sqlite')
+
+
+class OwnMessageIndex:
+    """IDs des messages du compte par salon + intervalles d'historique déjà parcourus."""
+
+    def __init__(self, path: str = OWN_INDEX_PATH):
+        self.path = path
+        self.live_since = None  # Snowflake du début de la session gateway: tout ce qui suit arrive par on_message
+        self.stats = {'indexed': 0, 'scanned': 0}
+        self._db = None
+
+    def _conn(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.executescript(
+                'CREATE TABLE IF NOT EXISTS own_messages ('
+                'id INTEGER PRIMARY KEY, channel_id INTEGER NOT NULL, guild_id INTEGER);'
+                'CREATE INDEX IF NOT EXISTS own_messages_channel ON own_messages (channel_id, id);'
+                'CREATE TABLE IF NOT EXISTS scans ('
+                'channel_id INTEGER PRIMARY KEY, oldest INTEGER, newest INTEGER, complete INTEGER NOT NULL DEFAULT 0);'
+            )
+        return self._db
+
+    def mark_live(self):
+        """À appeler dans on_ready: les messages à partir de maintenant sont indexés par on_message."""
+        self.live_since = time_snowflake(utcnow())
+
+    def _insert(self, db: sqlite3.Connection, message):
+        guild = getattr(message, 'guild', None)
+        db.execute('INSERT OR IGNORE INTO own_messages (id, channel_id, guild_id) VALUES (?, ?, ?)',
+                   (message.id, message.channel.id, guild.id if guild else None))
+
+    def add(self, message):
+        """Nouveau message du compte (on_message)."""
+        db = self._conn()
+        self._insert(db, message)
+        db.commit()
+        self.stats['indexed'] += 1
+
+    def remove(self, message_id: int):
+        """Message supprimé (purge ou on_raw_message_delete)."""
+        db = self._conn()
+        if db.execute('DELETE FROM own_messages WHERE id = ?', (message_id,)).rowcount:
+            db.commit()
+
+    def known(self, channel_id: int, after: int = None, before: int = None) -> list:
+        """IDs connus d'un salon, du plus récent au plus ancien, dans l'intervalle ]after, before[."""
+        query = 'SELECT id FROM own_messages WHERE channel_id = ?'
+        args = [channel_id]
+        if after is not None:
+            query += ' AND id > ?'
+            args.append(after)
+        if before is not None:
+            query += ' AND id < ?'
+            args.append(before)
+        return [row[0] for row in self._conn().execute(query + ' ORDER BY id DESC', args)]
+
+    def _scan_state(self, channel_id: int):
+        row = self._conn().execute('SELECT oldest, newest, complete FROM scans WHERE channel_id = ?', (channel_id,)).fetchone()
+        return (row[0], row[1], bool(row[2])) if row else (None, None, False)
+
+    def _save_scan_state(self, channel_id: int, oldest: int, newest: int, complete: bool):
+        db = self._conn()
+        db.execute('INSERT OR REPLACE INTO scans (channel_id, oldest, newest, complete) VALUES (?, ?, ?, ?)',
+                   (channel_id, oldest, newest, int(complete)))
+        db.commit()
+
+    async def _scan(self, channel, me, on_found=None, **history_kwargs):
+        """Parcourt l'historique et indexe les messages du compte. Produit l'ID de chaque message vu."""
+        db = self._conn()
+        seen = 0
+        try:
+            async for message in channel.history(limit=None, **history_kwargs):
+                seen += 1
+                if message.author.id == me.id:
+                    self._insert(db, message)
+                    self.stats['indexed'] += 1
+                    if on_found is not None:
+                        await on_found(message.id, channel)
+                yield message.id
+                if seen % 100 == 0:
+                    db.commit()  # Une page de l'API
+        finally:
+            db.commit()
+            self.stats['scanned'] += seen
+
+    async def refresh(self, channel, me) -> int:
+        """Parcourt le trou entre le dernier parcours et le début de la session (messages envoyés hors connexion).
+
+        Renvoie le nombre de messages parcourus.
+        """
+        scanned_before = self.stats['scanned']
+        oldest, newest, complete = self._scan_state(channel.id)
+        upper = self.live_since or time_snowflake(utcnow())
+        if newest is None:
+            # Jamais parcouru: backfill() partira du début de la session
+            self._save_scan_state(channel.id, upper, upper, False)
+        elif newest < upper:
+            async for _ in self._scan(channel, me, after=discord.Object(id=newest), before=discord.Object(id=upper),
+                                      oldest_first=True):
+                pass
+            self._save_scan_state(channel.id, oldest, upper, complete)
+        return self.stats['scanned'] - scanned_before
+
+    def needs_backfill(self, channel_id: int, after: int = None) -> bool:
+        """True si l'historique de ce salon n'a pas encore été parcouru jusqu'à `after` (ou jusqu'au début)."""
+        oldest, newest, complete = self._scan_state(channel_id)
+        return oldest is None or (not complete and (after is None or oldest > after))
+
+    async def backfill(self, channel, me, after: int = None, needed=None, on_found=None) -> int:
+        """Parcourt l'historique plus ancien que ce qui est connu, page par page, jusqu'au snowflake `after`.
+
+        `needed()` est consultée à chaque page: le parcours s'arrête quand elle renvoie True.
+        `on_found(message_id, salon)` est appelée pour chaque message du compte découvert.
+        Renvoie le nombre de messages parcourus.
+        """
+        scanned_before = self.stats['scanned']
+        if not self.needs_backfill(channel.id, after):
+            return 0
+        oldest, newest, complete = self._scan_state(channel.id)
+        if oldest is None:
+            oldest = newest = self.live_since or time_snowflake(utcnow())
+        history_kwargs = {'before': discord.Object(id=oldest), 'oldest_first': False}
+        if after is not None:
+            history_kwargs['after'] = discord.Object(id=after)
+        scan = self._scan(channel, me, on_found=on_found, **history_kwargs)
+        try:
+            count = 0
+            async for message_id in scan:
+                oldest = min(oldest, message_id)
+                count += 1
+                if count % 100 == 0 and needed is not None and needed():
+                    break
+            else:
+                # Tout l'intervalle demandé a été parcouru
+                if after is None:
+                    complete = True
+                else:
+                    oldest = min(oldest, after)
+        finally:
+            # Même interrompu (erreur, permissions), le parcours déjà fait n'est pas à refaire
+            await scan.aclose()
+            self._save_scan_state(channel.id, oldest, newest, complete)
+        return self.stats['scanned'] - scanned_before
+
+
+# Index partagé, tenu à jour par on_message et on_raw_message_delete dans selfbot.py et selfbot-alt.py
+own_index = OwnMessageIndex()
@@ -0,0 +1,279 @@
+"""
+Profilage à la demande du process en cours d'exécution (rapports dans exports/profiles/).
+
+- `CommandProfiler`: cProfile pendant les N prochaines commandes ou une durée fixe.
+  Le profileur couvre tout le thread de la boucle pendant la fenêtre (commandes,
+  événements de la gateway, tâches de fond), pas seulement les handlers.
+- `MemoryTracker`: instantanés tracemalloc et différence entre les deux derniers.
+- `StallWatchdog`: un thread surveille un battement de la boucle d'événements; si
+  la boucle ne répond plus pendant plus de `threshold` secondes, la pile du code
+  qui la bloque est écrite dans stalls.log, pendant le blocage.
+
+Les commandes qui les pilotent (profile, memsnap, stallwatch) sont dans
+core_commands.py: comme toutes les commandes, seul le compte lui-même peut les lancer.
+"""
+
+import io
+import os
+import sys
+import time
+import asyncio
+import cProfile
+import pstats
+import threading
+import traceback
+import tracemalloc
+from datetime import datetime
+
+from config import EXPORT_DIR, STALL_THRESHOLD
+
+PROFILE_DIR = os.path.join(EXPORT_DIR, 'profiles')
+REPORT_LINES = 40  # Fonctions listées dans un rapport cProfile
+MEMORY_LINES = 25  # Lignes listées dans une différence tracemalloc
+IDLE_FUNCTIONS = ("method 'select'", "method 'poll'", "method 'control'", 'select.select')  # Attente d'E/S de la boucle
+
+
+def _report_path(prefix: str, extension: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    return os.path.join(PROFILE_DIR, f'{prefix}-{datetime.now().strftime("%Y%m%d-%H%M%S")}.{extension}')
+
+
+async def _in_thread(func, *args):
+    # Écriture des rapports hors de la boucle (un profil complet peut peser plusieurs Mo)
+    return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+
+class CommandProfiler:
+    """cProfile sur une fenêtre: les `commands` prochaines commandes, ou `seconds` secondes."""
+
+    def __init__(self):
+        self.profile = None
+        self.remaining = None  # Commandes restantes avant l'arrêt (mode N commandes)
+        self.started = 0.0
+        self.last_report = None
+        self._timer = None
+        self._notify = None
+
+    @property
+    def active(self) -> bool:
+        return self.profile is not None
+
+    def start(self, commands: int = None, seconds: float = None, notify=None):
+        """Démarre le profilage. `notify(texte)` (coroutine) reçoit le bilan à l'arrêt automatique."""
+        if self.active:
+            raise RuntimeError('un profilage est déjà en cours')
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError as e:
+            # Un autre profileur (débogueur, sys.monitoring) occupe déjà l'interpréteur
+            raise RuntimeError(str(e))
+        self.profile = profile
+        self.remaining = commands
+        self.started = time.perf_counter()
+        self._notify = notify
+        if seconds:
+            self._timer = asyncio.get_running_loop().call_later(seconds, lambda: asyncio.ensure_future(self._auto_stop()))
+
+    def command_finished(self, name: str):
+        """Appelée par le registre après chaque commande (hors commandes de profilage)."""
+        if not self.active or self.remaining is None or name in PROFILING_COMMANDS:
+            return
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.remaining = None
+            asyncio.ensure_future(self._auto_stop())
+
+    async def _auto_stop(self):
+        if not self.active:
+            return
+        summary = await self.stop()
+        print(f'📊 {summary}')
+        if self._notify is not None:
+            try:
+                await self._notify(summary)
+            except Exception as e:
+                print(f'⚠️  Bilan du profilage non envoyé: {e}')
+
+    def _write(self, profile: cProfile.Profile, elapsed: float) -> tuple:
+        raw_path = _report_path('profile', 'prof')
+        profile.dump_stats(raw_path)  # Pour snakeviz / pstats
+        output = io.StringIO()
+        stats = pstats.Stats(profile, stream=output)
+        stats.sort_stats('cumulative').print_stats(REPORT_LINES)
+        output.write('\n')
+        stats.sort_stats('tottime').print_stats(REPORT_LINES)
+        text_path = raw_path[:-len('.prof')] + '.txt'
+        with open(text_path, 'w', encoding='utf-8') as f:
+            f.write(f'Fenêtre de {elapsed:.1f}s\n\n{output.getvalue()}')
+
+        # Fonctions les plus coûteuses en temps propre, hors attente de la boucle (select/epoll)
+        top = []
+        for (filename, line, name), (_, calls, tottime, _, _) in sorted(stats.stats.items(), key=lambda item: -item[1][2]):
+            if any(idle in name for idle in IDLE_FUNCTIONS):
+                continue
+            top.append(f'{os.path.basename(filename)}:{line} {name} ({tottime * 1000:.0f} ms, {calls} appels)')
+            if len(top) == 5:
+                break
+        return text_path, top
+
+    async def stop(self) -> str:
+        """Arrête le profilage, écrit le rapport et renvoie un résumé."""
+        if not self.active:
+            raise RuntimeError('aucun profilage en cours')
+        profile, self.profile = self.profile, None
+        profile.disable()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self.remaining = None
+        elapsed = time.perf_counter() - self.started
+        path, top = await _in_thread(self._write, profile, elapsed)
+        self.last_report = path
+        return f'Profil de {elapsed:.1f}s écrit dans `{path}`\n' + '\n'.join(f'• {line}' for line in top)
+
+    def status(self) -> str:
+        if not self.active:
+            return f'Aucun profilage en cours. Dernier rapport: `{self.last_report}`' if self.last_report else 'Aucun profilage en cours.'
+        left = f', arrêt après {self.remaining} commande(s)' if self.remaining is not None else ''
+        return f'Profilage en cours depuis {time.perf_counter() - self.started:.1f}s{left}.'
+
+
+class MemoryTracker:
+    """Instantanés tracemalloc successifs; `diff()` compare les deux derniers."""
+
+    def __init__(self, frames: int = 10):
+        self.frames = frames
+        self.snapshots = []  # Deux au plus: précédent et dernier
+
+    @property
+    def active(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self.snapshots = []
+
+    def stop(self):
+        tracemalloc.stop()
+        self.snapshots = []
+
+    def _snapshot(self):
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+            tracemalloc.Filter(False, '<unknown>'),
+        ))
+
+    async def take(self) -> str:
+        """Prend un instantané (gardé en mémoire, sans les frames internes de tracemalloc et d'importlib)."""
+        if not tracemalloc.is_tracing():
+            raise RuntimeError('tracemalloc n\'est pas démarré')
+        snapshot = await _in_thread(self._snapshot)
+        self.snapshots = (self.snapshots + [snapshot])[-2:]
+        current, peak = tracemalloc.get_traced_memory()
+        return f'Instantané {len(self.snapshots)}/2: {current / 1024 / 1024:.1f} Mo suivis (pic {peak / 1024 / 1024:.1f} Mo)'
+
+    def _write_diff(self, previous, latest) -> tuple:
+        stats = latest.compare_to(previous, 'lineno')
+        by_traceback = latest.compare_to(previous, 'traceback')
+        path = _report_path('memory', 'txt')
+        total = sum(stat.size_diff for stat in stats)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'Différence totale: {total / 1024:+.1f} Ko\n\nPar ligne:\n')
+            for stat in stats[:MEMORY_LINES]:
+                f.write(f'{stat}\n')
+            f.write('\nPiles des plus fortes croissances:\n')
+            for stat in by_traceback[:5]:
+                f.write(f'\n{stat.size_diff / 1024:+.1f} Ko, {stat.count_diff:+d} blocs\n')
+                f.write('\n'.join(stat.traceback.format()) + '\n')
+        top = [f'{stat.traceback[0].filename.rsplit(os.sep, 1)[-1]}:{stat.traceback[0].lineno} '
+               f'{stat.size_diff / 1024:+.1f} Ko ({stat.count_diff:+d} blocs)' for stat in stats[:5]]
+        return path, total, top
+
+    async def diff(self) -> str:
+        """Écrit la différence entre les deux derniers instantanés et renvoie un résumé."""
+        if len(self.snapshots) < 2:
+            raise RuntimeError('il faut deux instantanés (memsnap take, deux fois)')
+        path, total, top = await _in_thread(self._write_diff, *self.snapshots)
+        return f'Différence {total / 1024:+.1f} Ko écrite dans `{path}`\n' + '\n'.join(f'• {line}' for line in top)
+
+
+class StallWatchdog:
+    """Détecte les blocages de la boucle d'événements et écrit la pile du code fautif pendant le blocage."""
+
+    def __init__(self, threshold: float = STALL_THRESHOLD):
+        self.threshold = threshold
+        self.stalls = 0
+        self.log_path = os.path.join(PROFILE_DIR, 'stalls.log')
+        self._beat = 0.0
+        self._reported = False
+        self._loop_thread = None
+        self._task = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    @property
+    def active(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _log(self, text: str):
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(f'[{datetime.now().isoformat(timespec="milliseconds")}] {text}\n')
+        except OSError as e:
+            print(f'⚠️  Écriture de {self.log_path} impossible: {e}')
+
+    async def _heartbeat(self):
+        interval = self.threshold / 4
+        while True:
+            self._beat = time.monotonic()
+            self._reported = False
+            await asyncio.sleep(interval)
+            late = time.monotonic() - self._beat - interval
+            if late > self.threshold:
+                # Fin du blocage: sa durée totale (la pile a été écrite par le thread pendant le blocage)
+                self._log(f'Boucle débloquée après {late * 1000:.0f} ms\n')
+
+    def _watch(self):
+        interval = self.threshold / 4
+        while not self._stop.wait(interval):
+            blocked = time.monotonic() - self._beat - interval
+            if blocked > self.threshold and not self._reported:
+                self._reported = True
+                self.stalls += 1
+                frame = sys._current_frames().get(self._loop_thread)
+                stack = ''.join(traceback.format_stack(frame)) if frame is not None else '(pile indisponible)\n'
+                self._log(f'Boucle bloquée depuis {blocked * 1000:.0f} ms (seuil {self.threshold * 1000:.0f} ms):\n{stack}')
+                print(f'⚠️  Boucle d\'événements bloquée depuis {blocked * 1000:.0f} ms (pile dans {self.log_path})')
+
+    def start(self, threshold: float = None):
+        """Démarre la surveillance (à appeler depuis la boucle à surveiller)."""
+        if threshold:
+            self.threshold = threshold
+        if self.active:
+            return
+        self._loop_thread = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop.clear()
+        self._task = asyncio.ensure_future(self._heartbeat())
+        self._thread = threading.Thread(target=self._watch, name='stall-watchdog', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._thread = None
+
+
+# Commandes qui pilotent le profilage: exclues du décompte des N commandes profilées
+PROFILING_COMMANDS = ('profile', 'memsnap', 'stallwatch')
+
+# Outils partagés par les commandes de core_commands.py
+profiler = CommandProfiler()
+memory_tracker = MemoryTracker()
+stall_watchdog = StallWatchdog()
@@ -0,0 +1,170 @@
+"""
+Suppression en pipeline des messages du compte (commande purge).
+
+Un producteur alimente une file avec les IDs à supprimer: d'abord ceux déjà
+connus de l'index local (own_messages.py), puis ceux découverts en parcourant
+l'historique plus ancien. Pendant ce parcours, des workers suppriment déjà les
+messages trouvés. Chaque suppression passe par le planificateur de rate
+limits: on attend exactement ce que disent les en-têtes et les retry-after de
+Discord, jamais un délai fixe. Les erreurs passagères (5xx, réseau) sont
+réessayées avec un backoff exponentiel.
+"""
+
+import time
+import asyncio
+
+import aiohttp
+import discord
+
+from config import PURGE_WORKERS, PURGE_RETRIES
+from rate_limit import scheduler as default_scheduler, route_key
+
+QUEUE_SIZE = 500  # Au-delà, le parcours de l'historique attend les workers
+RETRY_BASE_DELAY = 0.5
+
+
+class PurgePipeline:
+    """Parcours de l'historique et suppressions en parallèle, sous les rate limits."""
+
+    def __init__(self, index, channels: list, me, after: int = None, before: int = None, amount: int = None,
+                 exclude_ids=(), workers: int = PURGE_WORKERS, retries: int = PURGE_RETRIES, scheduler=None):
+        self.index = index
+        self.channels = channels
+        self.me = me
+        self.after = after
+        self.before = before
+        self.amount = amount
+        self.exclude_ids = set(exclude_ids)
+        self.workers = workers
+        self.retries = retries
+        self.scheduler = scheduler or default_scheduler
+        self.stats = {'found': 0, 'deleted': 0, 'skipped': 0, 'failed': 0, 'retried': 0, 'scanned': 0,
+                      'channels': len(channels), 'elapsed': 0.0}
+        self._queue = None
+        self._queued = set()
+        self._started = 0.0
+
+    def _in_range(self, message_id: int) -> bool:
+        return ((self.after is None or message_id > self.after) and (self.before is None or message_id < self.before)
+                and message_id not in self.exclude_ids)
+
+    def _remaining(self):
+        return None if self.amount is None else self.amount - len(self._queued)
+
+    async def _enqueue(self, message_id: int, channel):
+        if message_id in self._queued or not self._in_range(message_id) or self._remaining() == 0:
+            return
+        self._queued.add(message_id)
+        self.stats['found'] += 1
+        await self._queue.put((message_id, channel))
+
+    async def _produce(self):
+        # 1. Messages envoyés hors connexion depuis le dernier parcours
+        readable = []
+        for channel in self.channels:
+            try:
+                self.stats['scanned'] += await self.index.refresh(channel, self.me)
+                readable.append(channel)
+            except discord.Forbidden:
+                continue
+            except discord.HTTPException as e:
+                print(f'⚠️  Historique de #{getattr(channel, "name", channel.id)} illisible: {e}')
+
+        # 2. IDs déjà connus, les plus récents d'abord (tous salons confondus)
+        known = []
+        for channel in readable:
+            known += [(message_id, channel) for message_id in self.index.known(channel.id, after=self.after, before=self.before)]
+        known.sort(key=lambda item: item[0], reverse=True)
+        for message_id, channel in known:
+            if self._remaining() == 0:
+                return
+            await self._enqueue(message_id, channel)
+
+        # 3. Historique jamais parcouru: les messages trouvés partent aux workers pendant la pagination
+        for channel in readable:
+            if self._remaining() == 0:
+                return
+            try:
+                self.stats['scanned'] += await self.index.backfill(
+                    channel, self.me, after=self.after, on_found=self._enqueue,
+                    needed=(lambda: self._remaining() == 0) if self.amount is not None else None)
+            except discord.Forbidden:
+                continue
+            except discord.HTTPException as e:
+                print(f'⚠️  Historique de #{getattr(channel, "name", channel.id)} illisible: {e}')
+
+    async def _delete(self, message_id: int, channel):
+        route = route_key('DELETE', f'/channels/{channel.id}/messages/{message_id}')
+        for attempt in range(self.retries + 1):
+            try:
+                await self.scheduler.call(route, channel.get_partial_message(message_id).delete)
+                self.stats['deleted'] += 1
+                self.index.remove(message_id)
+                return
+            except discord.NotFound:
+                self.stats['skipped'] += 1  # Déjà supprimé
+                self.index.remove(message_id)
+                return
+            except discord.Forbidden as e:
+                self.stats['failed'] += 1
+                print(f'⚠️  Suppression du message {message_id} refusée: {e}')
+                return
+            except discord.HTTPException as e:
+                # 429 après les réessais du planificateur, ou erreur serveur: passagères
+                if e.status != 429 and e.status < 500:
+                    self.stats['failed'] += 1
+                    print(f'⚠️  Suppression du message {message_id} impossible: {e}')
+                    return
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                error = e
+            if attempt < self.retries:
+                self.stats['retried'] += 1
+                await asyncio.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+        self.stats['failed'] += 1
+        print(f'⚠️  Suppression du message {message_id} abandonnée après {self.retries + 1} essais: {error}')
+
+    async def _work(self, progress):
+        while True:
+            item = await self._queue.get()
+            try:
+                if item is None:
+                    return
+                await self._delete(*item)
+                if progress is not None:
+                    progress(self)
+            finally:
+                self._queue.task_done()
+
+    def rate(self) -> float:
+        """Messages supprimés par seconde depuis le début."""
+        elapsed = self.stats['elapsed'] or (time.perf_counter() - self._started)
+        return self.stats['deleted'] / elapsed if elapsed > 0 else 0.0
+
+    async def run(self, progress=None) -> dict:
+        """Lance le parcours et les suppressions; `progress(pipeline)` est appelée après chaque suppression."""
+        self._started = time.perf_counter()
+        self._queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        workers = [asyncio.ensure_future(self._work(progress)) for _ in range(max(1, self.workers))]
+        try:
+            await self._produce()
+            for _ in workers:
+                await self._queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.stats['elapsed'] = time.perf_counter() - self._started
+        return self.stats
+
+    def describe(self) -> str:
+        """Résumé lisible (progression ou bilan)."""
+        stats = self.stats
+        text = f'🗑️ {stats["deleted"]} supprimé(s)'
+        if stats['skipped']:
+            text += f', ⏭️ {stats["skipped"]} déjà supprimé(s)'
+        if stats['failed']:
+            text += f', ❌ {stats["failed"]} en échec'
+        text += (f' | {self.rate():.1f} msg/s | {stats["channels"]} salon(s), '
+                 f'{stats["scanned"]} messages d\'historique parcourus')
+        return text
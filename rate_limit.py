@@ -0,0 +1,256 @@
+"""
+Planificateur de requêtes qui respecte les rate limits renvoyés par Discord.
+
+Au lieu d'attendre un délai fixe après chaque création, chaque appel passe par
+`scheduler.call(route, func, ...)`. Le planificateur suit l'état de chaque
+bucket (requêtes restantes, fin de la fenêtre) à partir des en-têtes
+`X-RateLimit-*` et des `retry_after` renvoyés par l'API, et n'attend que
+lorsque le serveur l'exige.
+"""
+
+import re
+import asyncio
+import time
+from urllib.parse import urlsplit
+
+import discord
+
+from metrics import metrics
+
+
+# Paramètres majeurs: leur valeur fait partie du bucket (cf. documentation Discord)
+MAJOR_PARAMETERS = ('channels', 'guilds', 'webhooks')
+
+# Réponses observées avant d'avertir si aucune ne porte d'en-tête de bucket
+HEADER_CHECK_AFTER = 20
+
+
+def route_key(method: str, path: str) -> str:
+    """Normalise une requête en clé de route: 'POST /guilds/123/channels', 'DELETE /channels/1/messages/{id}'."""
+    path = urlsplit(str(path)).path  # Chemin seul, ou URL complète vue par le client HTTP
+    path = re.sub(r'^.*?/api/v\d+', '', path)
+    parts = path.strip('/').split('/')
+    normalized = []
+    for index, part in enumerate(parts):
+        if part.isdigit() and not (index == 1 and parts[0] in MAJOR_PARAMETERS):
+            normalized.append('{id}')
+        else:
+            normalized.append(part)
+    return f'{method.upper()} /' + '/'.join(normalized)
+
+
+def _header_float(headers, name: str):
+    value = headers.get(name) if headers else None
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class BucketState:
+    """État connu d'un bucket de rate limit."""
+
+    def __init__(self):
+        self.limit = None
+        self.remaining = None  # None tant que le serveur ne nous a rien dit
+        self.reset_at = 0.0  # Fin de la fenêtre courante (time.monotonic)
+        self.blocked_until = 0.0  # Après un 429 sur ce bucket
+        self.in_flight = 0
+
+
+class RateLimitScheduler:
+    """Attend exactement ce que demande chaque bucket, jamais plus."""
+
+    def __init__(self, max_retries: int = 5):
+        self.max_retries = max_retries
+        self.buckets = {}  # Clé de bucket -> BucketState
+        self.route_buckets = {}  # Clé de route -> clé de bucket (X-RateLimit-Bucket)
+        self.global_blocked_until = 0.0
+        self.stats = {'calls': 0, 'rate_limited': 0, 'waited': 0.0, 'responses': 0, 'bucket_headers': 0}
+
+    def _bucket_key(self, route: str) -> str:
+        return self.route_buckets.get(route, route)
+
+    def bucket(self, route: str) -> BucketState:
+        """Renvoie l'état du bucket associé à une route (créé si besoin)."""
+        key = self._bucket_key(route)
+        state = self.buckets.get(key)
+        if state is None:
+            state = self.buckets[key] = BucketState()
+        return state
+
+    def _wait_time(self, state: BucketState, now: float) -> float:
+        wait = max(self.global_blocked_until, state.blocked_until) - now
+        if state.remaining is not None:
+            if now >= state.reset_at:
+                # Nouvelle fenêtre: le quota est de nouveau disponible
+                state.remaining = state.limit if state.limit is not None else None
+            elif state.remaining <= 0:
+                wait = max(wait, state.reset_at - now)
+        return wait
+
+    async def acquire(self, route: str):
+        """Attend qu'une requête puisse partir sur cette route, puis réserve une place."""
+        state = self.bucket(route)
+        while True:
+            wait = self._wait_time(state, time.monotonic())
+            if wait <= 0:
+                break
+            self.stats['waited'] += wait
+            metrics.rate_limit_wait(route, wait)
+            await asyncio.sleep(wait)
+        if state.remaining is not None:
+            state.remaining -= 1
+        state.in_flight += 1
+        self.stats['calls'] += 1
+
+    def release(self, route: str):
+        """Libère la place réservée par acquire()."""
+        state = self.bucket(route)
+        state.in_flight = max(0, state.in_flight - 1)
+
+    def observe(self, route: str, headers):
+        """Met à jour un bucket depuis les en-têtes X-RateLimit-* d'une réponse."""
+        if not headers:
+            return
+        bucket_hash = headers.get('X-RateLimit-Bucket')
+        if bucket_hash:
+            # Plusieurs routes peuvent partager le même bucket côté serveur
+            major = route.split(' ', 1)[-1].strip('/').split('/')[:2]
+            key = f'{bucket_hash}:{"/".join(major)}'
+            if self.route_buckets.get(route) != key:
+                previous = self.buckets.pop(self._bucket_key(route), None)
+                self.route_buckets[route] = key
+                if previous and key not in self.buckets:
+                    self.buckets[key] = previous
+        state = self.bucket(route)
+        now = time.monotonic()
+
+        limit = _header_float(headers, 'X-RateLimit-Limit')
+        remaining = _header_float(headers, 'X-RateLimit-Remaining')
+        reset_after = _header_float(headers, 'X-RateLimit-Reset-After')
+        if limit is not None:
+            state.limit = int(limit)
+        if remaining is not None:
+            # Les requêtes encore en vol vont consommer le quota restant
+            state.remaining = max(0, int(remaining) - max(0, state.in_flight - 1))
+        if reset_after is not None:
+            state.reset_at = now + reset_after
+
+    def retry_after(self, route: str, error: Exception):
+        """Renvoie le délai imposé par une erreur 429, ou None si l'erreur n'est pas un rate limit."""
+        headers = None
+        retry_after = None
+        is_global = False
+
+        if isinstance(error, getattr(discord, 'RateLimited', ())):
+            retry_after = error.retry_after
+        elif isinstance(error, discord.HTTPException) and error.status == 429:
+            response = getattr(error, 'response', None)
+            headers = getattr(response, 'headers', None)
+            retry_after = _header_float(headers, 'Retry-After')
+            if retry_after is None:
+                retry_after = _header_float(headers, 'X-RateLimit-Reset-After')
+            if retry_after is None:
+                retry_after = 1.0
+            is_global = bool(headers and (headers.get('X-RateLimit-Global') or headers.get('X-RateLimit-Scope') == 'global'))
+        else:
+            return None
+
+        self.stats['rate_limited'] += 1
+        self.block(route, retry_after, is_global=is_global)
+        if headers:
+            self.observe(route, headers)
+        return retry_after
+
+    def block(self, route: str, delay: float, is_global: bool = False):
+        """Bloque une route (ou toutes les routes si global) pendant `delay` secondes."""
+        until = time.monotonic() + delay
+        if is_global:
+            self.global_blocked_until = max(self.global_blocked_until, until)
+        else:
+            state = self.bucket(route)
+            state.blocked_until = max(state.blocked_until, until)
+
+    async def call(self, route: str, func, *args, **kwargs):
+        """Exécute `await func(*args, **kwargs)` en respectant le bucket de `route`.
+
+        Les erreurs 429 sont réessayées après exactement le délai demandé par le serveur.
+        Les autres erreurs sont propagées.
+        """
+        attempt = 0
+        while True:
+            await self.acquire(route)
+            try:
+                result = await func(*args, **kwargs)
+                metrics.api_call(route, 'ok')
+                return result
+            except Exception as error:
+                if attempt >= self.max_retries or self.retry_after(route, error) is None:
+                    metrics.api_call(route, 'error')
+                    raise
+                metrics.api_call(route, 'rate_limited')
+                attempt += 1
+            finally:
+                self.release(route)
+
+    def on_response(self, method: str, url: str, status: int, headers, seconds: float):
+        """Réponse HTTP de Discord (toutes les requêtes du client): métriques, état du bucket et 429."""
+        route = route_key(method, url)
+        metrics.http_response(route, status, seconds)
+        self.observe(route, headers)
+        if status == 429:
+            retry_after = _header_float(headers, 'Retry-After')
+            if retry_after is not None:
+                is_global = bool(headers.get('X-RateLimit-Global') or headers.get('X-RateLimit-Scope') == 'global')
+                self.block(route, retry_after, is_global=is_global)
+        self._check_headers(headers)
+
+    def _check_headers(self, headers):
+        # Sans en-têtes de bucket, le planificateur ne fait que réagir aux 429: le signaler une fois
+        self.stats['responses'] += 1
+        if headers and (headers.get('X-RateLimit-Bucket') or headers.get('X-RateLimit-Remaining') is not None):
+            self.stats['bucket_headers'] += 1
+        elif self.stats['responses'] == HEADER_CHECK_AFTER and not self.stats['bucket_headers']:
+            print(f'⚠️  Aucun en-tête X-RateLimit-* dans les {HEADER_CHECK_AFTER} premières réponses: '
+                  'le planificateur ne peut suivre les buckets et ne réagira qu\'aux 429')
+
+    def instrument(self, client):
+        """Branche `on_response` sur le client HTTP de discord.py-self (>= 2.1, requêtes via curl_cffi).
+
+        La session curl_cffi est recréée à chaque `startup()` du HTTPClient: sa méthode
+        `request` est enveloppée à chaque fois pour chronométrer la réponse et lire ses en-têtes.
+        """
+        http = client.http
+        startup = http.startup
+
+        async def instrumented_startup():
+            await startup()
+            session = getattr(http, '_HTTPClient__session', None)
+            if not session or not hasattr(session, 'request'):
+                print('⚠️  Session HTTP de discord.py introuvable: en-têtes de rate limit et métriques HTTP indisponibles')
+                return
+            if getattr(session.request, 'instrumented', False):
+                return
+            request = session.request
+
+            async def instrumented_request(method, url, *args, **kwargs):
+                started = time.monotonic()
+                try:
+                    response = await request(method, url, *args, **kwargs)
+                except Exception:
+                    metrics.http_response(route_key(method, url), 0, time.monotonic() - started)  # Erreur réseau
+                    raise
+                self.on_response(method, url, response.status_code, response.headers, time.monotonic() - started)
+                return response
+
+            instrumented_request.instrumented = True
+            session.request = instrumented_request
+
+        http.startup = instrumented_startup
+
+
+# Planificateur partagé par tout le process (les buckets sont liés au compte)
+scheduler = RateLimitScheduler()
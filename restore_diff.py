@@ -0,0 +1,154 @@
+"""
+Restauration incrémentale: compare un backup avec l'état actuel du serveur cible.
+
+Chaque nœud du plan (restore_planner.py) est associé à l'objet existant qui
+lui correspond (même nom, même type, même catégorie, position la plus proche).
+Le nœud devient alors:
+
+    create   l'objet n'existe pas sur le serveur
+    edit     l'objet existe mais certains champs ou overwrites diffèrent
+    reorder  seule la position diffère
+    skip     l'objet est identique, aucun appel à l'API
+
+Les objets présents sur le serveur mais absents du backup ne sont jamais supprimés.
+"""
+
+import discord
+
+from backup import resolve_channel_type
+
+
+def _backup_overwrites(permissions_data: dict, role_names: dict) -> dict:
+    """Overwrites du backup indexés par cible comparable: ('role', nom) ou ('member', id)."""
+    result = {}
+    for key, perm_data in (permissions_data or {}).items():
+        allow_value = perm_data.get('allow', 0)
+        deny_value = perm_data.get('deny', 0)
+        if allow_value == 0 and deny_value == 0:
+            continue
+        kind, _, raw_id = key.partition('_')
+        try:
+            target_id = int(raw_id)
+        except ValueError:
+            continue
+        if kind == 'role':
+            # Un rôle absent des rôles sauvegardés est @everyone (cf. build_permission_overwrites)
+            result[('role', role_names.get(target_id, '@everyone'))] = (allow_value, deny_value)
+        elif kind == 'member':
+            result[('member', target_id)] = (allow_value, deny_value)
+    return result
+
+
+def _guild_overwrites(channel) -> dict:
+    """Overwrites actuels d'un salon, au même format que _backup_overwrites."""
+    result = {}
+    for target, overwrite in channel.overwrites.items():
+        allow, deny = overwrite.pair()
+        pair = (allow.value if allow else 0, deny.value if deny else 0)
+        if pair == (0, 0):
+            continue
+        if isinstance(target, discord.Role):
+            name = '@everyone' if target.is_default() else target.name
+            result[('role', name)] = pair
+        else:
+            result[('member', target.id)] = pair
+    return result
+
+
+def _take_closest(candidates: list, position: int):
+    """Retire et renvoie le candidat dont la position est la plus proche."""
+    if not candidates:
+        return None
+    best = min(candidates, key=lambda obj: abs(obj.position - position))
+    candidates.remove(best)
+    return best
+
+
+def _role_changes(role_data: dict, role) -> dict:
+    changes = {}
+    if role.permissions.value != role_data.get('permissions', 0):
+        changes['permissions'] = discord.Permissions(permissions=role_data.get('permissions', 0))
+    if role.color.value != role_data.get('color', 0):
+        changes['colour'] = discord.Colour(role_data.get('color', 0))
+    if role.hoist != role_data.get('hoist', False):
+        changes['hoist'] = role_data.get('hoist', False)
+    if role.mentionable != role_data.get('mentionable', False):
+        changes['mentionable'] = role_data.get('mentionable', False)
+    return changes
+
+
+def _channel_changes(ch_data: dict, channel, role_names: dict) -> dict:
+    changes = {}
+    if not isinstance(channel, discord.CategoryChannel):
+        # La catégorie fait partie de la clé de correspondance, elle est donc déjà identique
+        if hasattr(channel, 'topic') and (channel.topic or None) != (ch_data.get('topic') or None):
+            changes['topic'] = ch_data.get('topic')
+        if hasattr(channel, 'nsfw') and channel.nsfw != ch_data.get('nsfw', False):
+            changes['nsfw'] = ch_data.get('nsfw', False)
+        for field in ('bitrate', 'user_limit'):
+            if field in ch_data and getattr(channel, field, ch_data[field]) != ch_data[field]:
+                changes[field] = ch_data[field]
+    if _guild_overwrites(channel) != _backup_overwrites(ch_data.get('permissions'), role_names):
+        # Les overwrites sont reconstruits à l'exécution, une fois les rôles manquants créés
+        changes['overwrites'] = True
+    return changes
+
+
+def apply_diff(plan, guild) -> dict:
+    """Associe les nœuds du plan aux objets existants et calcule le jeu de changements minimal.
+
+    Modifie les nœuds en place (`action`, `target`, `changes`, `api_calls`) et renvoie les compteurs.
+    """
+    data = plan.data
+    roles_data = data.get('roles', []) if isinstance(data, dict) else []
+    role_names = {role_data.get('id'): role_data.get('name') for role_data in roles_data}
+
+    # Index des objets existants: clé de correspondance -> liste de candidats
+    guild_roles = {}
+    for role in guild.roles:
+        if role.is_default() or role.managed:
+            continue
+        guild_roles.setdefault(role.name, []).append(role)
+    guild_channels = {}
+    for channel in guild.channels:
+        if isinstance(channel, discord.CategoryChannel):
+            key = ('category', channel.name)
+        else:
+            key = (channel.category.name if channel.category else None, channel.name, channel.type)
+        guild_channels.setdefault(key, []).append(channel)
+
+    counts = {'create': 0, 'edit': 0, 'reorder': 0, 'skip': 0}
+    for node in plan.nodes.values():
+        node_data = node.data
+        if node.kind == 'rôle':
+            target = _take_closest(guild_roles.get(node_data.get('name'), []), node_data.get('position', 0))
+            changes = _role_changes(node_data, target) if target else {}
+        else:
+            if node.kind == 'catégorie':
+                key = ('category', node_data['name'])
+            else:
+                key = (node_data.get('category'), node_data['name'], resolve_channel_type(node_data))
+            target = _take_closest(guild_channels.get(key, []), node_data.get('position', 0))
+            changes = _channel_changes(node_data, target, role_names) if target else {}
+            if target and target.position != node_data.get('position', target.position):
+                changes['position'] = node_data['position']
+
+        if target is None:
+            node.action = 'create'
+        elif not changes:
+            node.action = 'skip'
+        elif list(changes) == ['position']:
+            node.action = 'reorder'
+        else:
+            node.action = 'edit'
+        node.target = target
+        node.changes = changes
+        node.api_calls = 0 if node.action == 'skip' else 1
+        counts[node.action] += 1
+    return counts
+
+
+def describe_diff(counts: dict) -> str:
+    """Résumé du jeu de changements pour les messages de la commande."""
+    return (f'🆕 {counts["create"]} à créer, ✏️ {counts["edit"]} à modifier, '
+            f'↕️ {counts["reorder"]} à déplacer, ⏭️ {counts["skip"]} inchangés')
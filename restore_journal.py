@@ -0,0 +1,99 @@
+"""
+Journal de restauration sur disque (JSONL dans exports/journals/).
+
+Chaque création réussie ajoute une ligne `{"key": ..., "id": ...}` qui relie
+l'objet du backup à l'objet créé sur le serveur. Si la restauration plante ou
+est interrompue, la relancer reprend là où elle s'était arrêtée au lieu de
+recréer (et dupliquer) ce qui existe déjà.
+"""
+
+import os
+import re
+import json
+import asyncio
+
+from config import EXPORT_DIR
+from backup import run_io
+
+JOURNAL_DIR = os.path.join(EXPORT_DIR, 'journals')
+
+
+def node_key(key: tuple) -> str:
+    """Clé texte d'un nœud du plan: ('channel', 123) -> 'channel:123', ('category', 456) -> 'category:456'."""
+    return f'{key[0]}:{key[1]}'
+
+
+class RestoreJournal:
+    """Correspondance ID du backup -> ID créé, persistée après chaque étape."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries = {}
+        self._unwritten = []  # Lignes en attente de la prochaine écriture groupée
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    async def for_restore(cls, guild_id: int, source: str):
+        """Journal d'une restauration donnée (serveur cible + source résolue), relu depuis le disque.
+
+        `source` doit être le chemin renvoyé par `find_backup_file` ou la référence complète
+        d'un snapshot, pas le nom tapé par l'utilisateur: `backup_X` et `backup_X.json`
+        partagent ainsi le même journal.
+        """
+        safe_source = re.sub(r'[^\w.-]', '_', source if source.startswith('@') else os.path.basename(source))
+        journal = cls(os.path.join(JOURNAL_DIR, f'restore_{guild_id}_{safe_source}.jsonl'))
+        await run_io(journal._load)
+        return journal
+
+    def _load(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Dernière ligne tronquée par un arrêt brutal: on l'ignore
+                    continue
+                self.entries[entry['key']] = entry['id']
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key: tuple):
+        """ID créé pour ce nœud lors d'une exécution précédente, ou None."""
+        return self.entries.get(node_key(key))
+
+    def _append(self, text: str):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+
+    async def record(self, key: tuple, created_id: int, name: str = None):
+        """Ajoute une étape réussie et attend qu'elle soit sur le disque.
+
+        L'écriture et le fsync se font dans le pool d'E/S (la boucle n'est pas bloquée).
+        Les étapes terminées pendant une écriture partent ensemble dans la suivante: un
+        seul fsync pour plusieurs créations en parallèle.
+        """
+        text_key = node_key(key)
+        self.entries[text_key] = created_id
+        self._unwritten.append(json.dumps({'key': text_key, 'id': created_id, 'name': name}, ensure_ascii=False) + '\n')
+        async with self._lock:
+            if not self._unwritten:
+                return  # Déjà écrite par l'écriture groupée précédente
+            lines, self._unwritten = self._unwritten, []
+            await run_io(self._append, ''.join(lines))
+
+    def _remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    async def clear(self):
+        """Supprime le journal (restauration terminée ou redémarrage à zéro)."""
+        async with self._lock:
+            self.entries = {}
+            self._unwritten = []
+            await run_io(self._remove)
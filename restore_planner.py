@@ -0,0 +1,297 @@
+"""
+Planificateur de restauration: transforme un backup en graphe de dépendances.
+
+    rôles  ->  catégories qui les référencent  ->  salons de chaque catégorie
+
+Les nœuds indépendants sont créés en parallèle (jusqu'à `concurrency` requêtes
+en vol), toujours à travers le planificateur de rate limit. Le mode dry-run
+affiche le plan et le nombre d'appels à l'API estimé sans rien envoyer.
+Avec un journal (restore_journal.py), une restauration interrompue reprend
+au dernier objet créé.
+"""
+
+import asyncio
+
+from backup import (
+    PermissionIndex,
+    build_permission_overwrites,
+    is_category_data,
+    sort_roles_for_creation,
+    create_role_from_backup,
+    create_category_from_backup,
+    create_channel_from_backup,
+)
+from config import RESTORE_CONCURRENCY
+from rate_limit import scheduler as default_scheduler, route_key
+from low_memory import resolve_member
+
+
+class RestoreNode:
+    """Un objet à créer (rôle, catégorie ou salon) et les nœuds dont il dépend."""
+
+    def __init__(self, key: tuple, kind: str, data: dict, deps=()):
+        self.key = key
+        self.kind = kind
+        self.data = data
+        self.deps = list(deps)
+        self.dependents = []
+        self.api_calls = 1  # Une seule requête de création par objet
+        self.result = None
+        # Mode diff (restore_diff.py): objet existant correspondant et champs à modifier
+        self.action = 'create'
+        self.target = None
+        self.changes = {}
+
+    @property
+    def label(self) -> str:
+        return f'{self.kind} {self.data.get("name", "inconnu")}'
+
+
+def _referenced_ids(permissions_data: dict, kind: str) -> list:
+    """IDs (du backup) des rôles ('role') ou membres ('member') cités dans les overwrites d'un salon."""
+    ids = []
+    for key in (permissions_data or {}):
+        if key.startswith(f'{kind}_'):
+            try:
+                ids.append(int(key.split('_')[1]))
+            except ValueError:
+                continue
+    return ids
+
+
+class RestorePlan:
+    """Graphe de restauration construit depuis les données d'un backup."""
+
+    def __init__(self, data: dict):
+        self.data = data
+        self.nodes = {}  # Clé -> RestoreNode (ordre d'insertion = ordre topologique)
+        self.category_keys = {}  # Nom de catégorie -> clé du nœud parent des salons de ce nom
+        self._build()
+
+    def _add(self, node: RestoreNode):
+        self.nodes[node.key] = node
+        for dep in node.deps:
+            self.nodes[dep].dependents.append(node)
+
+    def _build(self):
+        data = self.data
+        channels_data = data.get('channels', data) if isinstance(data, dict) else data
+        roles_data = data.get('roles', []) if isinstance(data, dict) else []
+
+        # Rôles: l'ordre de création définit la hiérarchie, on les enchaîne donc du plus haut au plus bas
+        previous = None
+        for role_data in sort_roles_for_creation(roles_data):
+            key = ('role', role_data.get('id'))
+            if key in self.nodes:
+                continue
+            self._add(RestoreNode(key, 'rôle', role_data, deps=[previous] if previous else []))
+            previous = key
+
+        def role_deps(ch_data):
+            deps = []
+            for role_id in _referenced_ids(ch_data.get('permissions'), 'role'):
+                key = ('role', role_id)
+                if key in self.nodes and key not in deps:
+                    deps.append(key)
+            return deps
+
+        sorted_channels = sorted(channels_data, key=lambda x: x.get('position', 0))
+
+        # Catégories: dépendent uniquement des rôles cités dans leurs overwrites. Elles sont toutes
+        # créées, même homonymes; les salons vont dans la dernière de ce nom (les backups ne gardent
+        # que le nom de la catégorie d'un salon)
+        for index, cat_data in enumerate(sorted_channels):
+            if is_category_data(cat_data):
+                key = ('category', cat_data.get('id', index))
+                self._add(RestoreNode(key, 'catégorie', cat_data, deps=role_deps(cat_data)))
+                self.category_keys[cat_data['name']] = key
+
+        # Salons: dépendent de leur catégorie et des rôles cités dans leurs overwrites
+        for index, ch_data in enumerate(sorted_channels):
+            if is_category_data(ch_data):
+                continue
+            deps = role_deps(ch_data)
+            category_key = self.category_keys.get(ch_data.get('category'))
+            if category_key is not None:
+                deps.append(category_key)
+            self._add(RestoreNode(('channel', ch_data.get('id', index)), 'salon', ch_data, deps=deps))
+
+    def count(self, kind: str) -> int:
+        return sum(1 for node in self.nodes.values() if node.kind == kind)
+
+    @property
+    def api_calls(self) -> int:
+        """Nombre de requêtes de création estimé."""
+        return sum(node.api_calls for node in self.nodes.values())
+
+    def levels(self) -> list:
+        """Regroupe les nœuds par profondeur: chaque niveau peut partir en parallèle une fois le précédent terminé."""
+        depth = {}
+        for key, node in self.nodes.items():
+            depth[key] = 1 + max((depth[dep] for dep in node.deps), default=-1)
+        levels = []
+        for key, level in depth.items():
+            while len(levels) <= level:
+                levels.append([])
+            levels[level].append(self.nodes[key])
+        return levels
+
+    def describe(self, max_lines: int = 15) -> str:
+        """Résumé lisible du plan (pour le mode dry-run)."""
+        levels = self.levels()
+        lines = [
+            f'🧭 **Plan de restauration:** {len(self.nodes)} objets '
+            f'({self.count("rôle")} rôles, {self.count("catégorie")} catégories, {self.count("salon")} salons)',
+            f'📡 Appels à l\'API estimés: {self.api_calls}',
+            f'🪜 Étapes dépendantes (chemin critique): {len(levels)}',
+        ]
+        for index, level in enumerate(levels[:max_lines]):
+            active = [node for node in level if node.action != 'skip']
+            names = ', '.join(f'{node.data.get("name", "?")}' + ('' if node.action == 'create' else f' ({node.action})') for node in active[:5])
+            more = f' +{len(active) - 5}' if len(active) > 5 else ''
+            skipped = f' ({len(level) - len(active)} inchangés)' if len(active) != len(level) else ''
+            lines.append(f'`{index + 1}.` {len(active)} en parallèle{skipped}: {names}{more}')
+        if len(levels) > max_lines:
+            lines.append(f'… {len(levels) - max_lines} étapes de plus')
+        return '\n'.join(lines)
+
+
+class RestoreExecutor:
+    """Exécute un plan: chaque nœud démarre dès que ses dépendances sont terminées."""
+
+    def __init__(self, plan: RestorePlan, guild, scheduler=None, concurrency: int = RESTORE_CONCURRENCY, journal=None):
+        self.plan = plan
+        self.guild = guild
+        self.scheduler = scheduler
+        self.journal = journal
+        # Index rôles par ID / nom construits une seule fois pour tout le plan
+        self.permission_index = PermissionIndex(guild, plan.data)
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.role_map = {}  # Ancien ID de rôle -> rôle créé
+        self.member_lookups = {}  # ID de membre -> lecture à l'API en cours ou terminée (une seule par membre)
+        self.created = {'rôle': 0, 'catégorie': 0, 'salon': 0}
+        self.failed = 0
+        self.resumed = 0
+        self.edited = 0
+        self.skipped = 0
+
+    async def _resolve_members(self, node: RestoreNode):
+        """Membres cités dans les overwrites du nœud et absents du cache (LOW_MEMORY): lus à l'API, une fois chacun."""
+        members = self.permission_index.members
+        for member_id in _referenced_ids(node.data.get('permissions'), 'member'):
+            if member_id in members or self.guild.get_member(member_id) is not None:
+                continue
+            if member_id not in self.member_lookups:
+                self.member_lookups[member_id] = asyncio.ensure_future(resolve_member(self.guild, member_id, self.scheduler))
+            members[member_id] = await self.member_lookups[member_id]
+
+    async def _create(self, node: RestoreNode):
+        data = self.plan.data
+        if node.kind == 'rôle':
+            return await create_role_from_backup(self.guild, node.data, self.scheduler)
+        await self._resolve_members(node)
+        if node.kind == 'catégorie':
+            return await create_category_from_backup(self.guild, node.data, self.role_map, data, self.scheduler, self.permission_index)
+        category_key = self.plan.category_keys.get(node.data.get('category'))
+        category = self.plan.nodes[category_key].result if category_key is not None else None
+        return await create_channel_from_backup(self.guild, node.data, category, self.role_map, data, self.scheduler, self.permission_index)
+
+    async def _edit(self, node: RestoreNode) -> bool:
+        """Applique les changements d'un nœud diff sur l'objet existant (une seule requête)."""
+        kwargs = dict(node.changes)
+        if kwargs.pop('overwrites', False):
+            await self._resolve_members(node)
+            kwargs['overwrites'] = build_permission_overwrites(node.data.get('permissions'), self.guild, self.role_map, self.plan.data,
+                                                               self.permission_index)
+        if node.kind == 'rôle':
+            route = route_key('PATCH', f'/guilds/{self.guild.id}/roles/{node.target.id}')
+        else:
+            route = route_key('PATCH', f'/channels/{node.target.id}')
+        try:
+            await (self.scheduler or default_scheduler).call(route, node.target.edit, **kwargs)
+            return True
+        except Exception as e:
+            print(f'❌ Erreur modification {node.label}: {e}')
+            return False
+
+    def _record(self, node: RestoreNode, result, created: bool = True):
+        node.result = result
+        if result is None:
+            # Les dépendants sont quand même créés (sans catégorie / avec les rôles de repli)
+            self.failed += 1
+            return
+        if created:
+            self.created[node.kind] += 1
+        if node.kind == 'rôle':
+            self.role_map[node.data.get('id')] = result
+
+    def _from_journal(self, node: RestoreNode):
+        """Objet déjà créé lors d'une exécution précédente (lu dans le cache, sans appel à l'API)."""
+        if self.journal is None:
+            return None
+        created_id = self.journal.get(node.key)
+        if created_id is None:
+            return None
+        if node.kind == 'rôle':
+            return self.guild.get_role(created_id)
+        return self.guild.get_channel(created_id)
+
+    async def _run_node(self, node: RestoreNode):
+        existing = self._from_journal(node)
+        if existing is not None:
+            self.resumed += 1
+            self._record(node, existing)
+            return
+        if node.target is not None:
+            # Mode diff: l'objet existe déjà, on ne modifie que ce qui diffère
+            if node.action == 'skip':
+                self.skipped += 1
+            else:
+                async with self.semaphore:
+                    if await self._edit(node):
+                        self.edited += 1
+                    else:
+                        self.failed += 1
+            self._record(node, node.target, created=False)
+            return
+        async with self.semaphore:
+            result = await self._create(node)
+        if result is not None and self.journal is not None:
+            await self.journal.record(node.key, result.id, node.data.get('name'))
+        self._record(node, result)
+
+    async def run(self) -> dict:
+        """Lance la restauration et renvoie les compteurs et le role_map."""
+        pending = {key: len(node.deps) for key, node in self.plan.nodes.items()}
+        tasks = {}
+
+        def start(node):
+            tasks[asyncio.ensure_future(self._run_node(node))] = node
+
+        for key, count in pending.items():
+            if count == 0:
+                start(self.plan.nodes[key])
+
+        while tasks:
+            done, _ = await asyncio.wait(tasks.keys(), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                node = tasks.pop(task)
+                if task.exception():
+                    print(f'❌ Erreur restauration {node.label}: {task.exception()}')
+                    self._record(node, None)
+                for dependent in node.dependents:
+                    pending[dependent.key] -= 1
+                    if pending[dependent.key] == 0:
+                        start(dependent)
+
+        return {
+            'roles': self.created['rôle'],
+            'categories': self.created['catégorie'],
+            'channels': self.created['salon'],
+            'total': self.created['catégorie'] + self.created['salon'],
+            'failed': self.failed,
+            'resumed': self.resumed,
+            'edited': self.edited,
+            'skipped': self.skipped,
+            'role_map': self.role_map,
+        }
@@ -3,18 +3,7 @@ Discord Selfbot en Python
 Utilise discord.py-self pour les selfbots
 """
 
-import os
-import asyncio
-import time
-from datetime import datetime
-from dotenv import load_dotenv
-
-# Charger les variables d'environnement
-load_dotenv()
-
-# Configuration
-TOKEN = os.getenv('TOKEN')
-PREFIX = os.getenv('PREFIX', '!')
+from config import TOKEN, PREFIX, LOW_MEMORY
 
 # Vérification du token
 if not TOKEN:
@@ -31,6 +20,13 @@ except ImportError:
     print('   Installez-le avec: pip install discord.py-self')
     exit(1)
 
+from command_registry import registry
+from own_messages import own_index
+from metrics import metrics
+from rate_limit import scheduler
+from low_memory import client_options, describe as describe_memory_profile
+import core_commands  # noqa: F401 - enregistre les commandes communes
+
 # Création du client selfbot
 intents = discord.Intents.default()
 intents.message_content = True
@@ -40,23 +36,31 @@ bot = commands.Bot(
     command_prefix=PREFIX,
     self_bot=True,
     intents=intents,
-    help_command=None  # Désactiver la commande help par défaut
+    help_command=None,  # Désactiver la commande help par défaut
+    **client_options()  # Cache de messages / membres et abonnements aux serveurs selon le profil mémoire (.env)
 )
+# Les en-têtes de rate limit et la durée de chaque réponse alimentent le planificateur et les métriques
+scheduler.instrument(bot)
 
 # Variables globales
 is_ready = False
-command_cooldowns = {}
-COOLDOWN_TIME = 1.0  # 1 seconde entre les commandes
 
 @bot.event
 async def on_ready():
     """Événement: Bot connecté"""
     global is_ready
     is_ready = True
+    # À partir d'ici, nos messages sont indexés par on_message (purge sans relire l'historique)
+    own_index.mark_live()
+    # Retard de la boucle et endpoint /metrics (si METRICS_PORT est défini), démarrés une seule fois
+    metrics.start_loop_monitor()
+    await metrics.start_server()
     
     print(f'✅ Selfbot connecté en tant que {bot.user.name}#{bot.user.discriminator}')
     print(f'📝 Préfixe des commandes: {PREFIX}')
     print(f'🆔 ID: {bot.user.id}')
+    if LOW_MEMORY:
+        print(f'🪶 {describe_memory_profile()}')
     print('━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━')
     print('💡 Le bot est prêt! Tapez vos commandes dans Discord.\n')
 
@@ -73,206 +77,15 @@ async def on_message(message):
     if message.author.id != bot.user.id:
         return
     
-    # Ignorer les messages qui ne commencent pas par le préfixe
-    if not message.content.startswith(PREFIX):
-        return
-    
-    # Parser la commande
-    args = message.content[len(PREFIX):].strip().split()
-    if not args:
-        return
-    
-    command_name = args[0].lower()
-    args = args[1:] if len(args) > 1 else []
+    own_index.add(message)
     
-    # Vérifier le cooldown
-    now = time.time()
-    last_used = command_cooldowns.get(command_name, 0)
-    if now - last_used < COOLDOWN_TIME:
-        return
-    command_cooldowns[command_name] = now
-    
-    # Exécuter les commandes
-    try:
-        if command_name == 'ping':
-            start = time.time() * 1000
-            await message.edit(content=f'🏓 Pong! Latence: {int((time.time() * 1000) - start)}ms')
-        
-        elif command_name == 'help':
-            help_text = f"""**📋 Commandes disponibles:**
-
-`{PREFIX}ping` - Affiche la latence du bot
-`{PREFIX}help` - Affiche ce message d'aide
-`{PREFIX}info` - Affiche les informations du compte
-`{PREFIX}avatar [@user]` - Affiche l'avatar d'un utilisateur
-`{PREFIX}serverinfo` - Affiche les informations du serveur
-`{PREFIX}userinfo [@user]` - Affiche les informations d'un utilisateur
-`{PREFIX}say <message>` - Répète un message
-`{PREFIX}embed <titre> | <description>` - Crée un embed
-`{PREFIX}purge <nombre>` - Supprime vos propres messages
-`{PREFIX}status <type>` - Change le statut (online, idle, dnd, invisible)
-`{PREFIX}activity <type> <nom>` - Change l'activité (playing, streaming, listening, watching)"""
-            await message.edit(content=help_text)
-        
-        elif command_name == 'info':
-            info = f"""**📊 Informations du compte:**
-
-**Tag:** {bot.user.name}#{bot.user.discriminator}
-**ID:** {bot.user.id}
-**Créé le:** {bot.user.created_at.strftime('%d/%m/%Y')}
-**Bot:** {'Oui' if bot.user.bot else 'Non'}
-**Serveurs:** {len(bot.guilds)}
-**Utilisateurs:** {len(bot.users)}"""
-            await message.edit(content=info)
-        
-        elif command_name == 'avatar':
-            user = message.mentions[0] if message.mentions else bot.user
-            avatar_url = str(user.display_avatar.url)
-            await message.edit(content=f'**Avatar de {user.name}#{user.discriminator}:**\n{avatar_url}')
-        
-        elif command_name == 'serverinfo':
-            if not message.guild:
-                await message.edit(content='❌ Cette commande ne peut être utilisée que dans un serveur.')
-                return
-            
-            guild = message.guild
-            owner = guild.get_member(guild.owner_id) if guild.owner_id else None
-            info = f"""**📊 Informations du serveur:**
+    # Parser et exécuter la commande (recherche directe dans le registre)
+    await registry.dispatch(bot, message, PREFIX)
 
-**Nom:** {guild.name}
-**ID:** {guild.id}
-**Propriétaire:** {owner.name if owner else 'Inconnu'}
-**Membres:** {guild.member_count}
-**Salons:** {len(guild.channels)}
-**Rôles:** {len(guild.roles)}
-**Créé le:** {guild.created_at.strftime('%d/%m/%Y')}
-**Boost:** Niveau {guild.premium_tier} ({guild.premium_subscription_count} boosts)"""
-            await message.edit(content=info)
-        
-        elif command_name == 'userinfo':
-            user = message.mentions[0] if message.mentions else bot.user
-            member = message.guild.get_member(user.id) if message.guild else None
-            
-            info = f"""**👤 Informations de {user.name}#{user.discriminator}:**
-
-**ID:** {user.id}
-**Tag:** {user.name}#{user.discriminator}
-**Bot:** {'Oui' if user.bot else 'Non'}
-**Créé le:** {user.created_at.strftime('%d/%m/%Y')}"""
-            
-            if member and member.joined_at:
-                info += f"""
-**Rejoint le:** {member.joined_at.strftime('%d/%m/%Y')}
-**Rôles:** {len(member.roles) - 1}"""
-            
-            await message.edit(content=info)
-        
-        elif command_name == 'say':
-            text = ' '.join(args)
-            if not text:
-                await message.edit(content=f'❌ Usage: `{PREFIX}say <message>`')
-                return
-            await message.edit(content=text)
-        
-        elif command_name == 'embed':
-            text = ' '.join(args)
-            if '|' not in text:
-                await message.edit(content=f'❌ Usage: `{PREFIX}embed <titre> | <description>`')
-                return
-            
-            title, description = text.split('|', 1)
-            embed = discord.Embed(
-                title=title.strip(),
-                description=description.strip(),
-                color=0x5865F2,
-                timestamp=datetime.utcnow()
-            )
-            await message.edit(content=None, embed=embed)
-        
-        elif command_name == 'purge':
-            if not args:
-                await message.edit(content='❌ Veuillez spécifier un nombre entre 1 et 100.')
-                return
-            
-            try:
-                amount = int(args[0])
-                if amount < 1 or amount > 100:
-                    await message.edit(content='❌ Veuillez spécifier un nombre entre 1 et 100.')
-                    return
-            except ValueError:
-                await message.edit(content='❌ Veuillez spécifier un nombre valide.')
-                return
-            
-            if not message.channel:
-                await message.edit(content='❌ Cette commande ne peut être utilisée que dans un salon.')
-                return
-            
-            deleted = 0
-            fetch_limit = min(amount + 10, 100)
-            
-            try:
-                async for msg in message.channel.history(limit=fetch_limit):
-                    if msg.author.id == bot.user.id and deleted < amount:
-                        try:
-                            await msg.delete()
-                            deleted += 1
-                            await asyncio.sleep(0.1)  # Délai pour éviter le rate limit
-                        except:
-                            pass
-            except Exception:
-                await message.edit(content='❌ Erreur lors de la suppression.')
-        
-        elif command_name == 'status':
-            if not args:
-                await message.edit(content=f'❌ Usage: `{PREFIX}status <online|idle|dnd|invisible>`')
-                return
-            
-            status = args[0].lower()
-            status_map = {
-                'online': discord.Status.online,
-                'idle': discord.Status.idle,
-                'dnd': discord.Status.dnd,
-                'invisible': discord.Status.invisible
-            }
-            
-            if status not in status_map:
-                await message.edit(content=f'❌ Statut invalide. Statuts disponibles: {", ".join(status_map.keys())}')
-                return
-            
-            try:
-                await bot.change_presence(status=status_map[status])
-            except Exception:
-                await message.edit(content='❌ Erreur lors du changement de statut.')
-        
-        elif command_name == 'activity':
-            if len(args) < 2:
-                await message.edit(content=f'❌ Usage: `{PREFIX}activity <type> <nom>`\nTypes: PLAYING, STREAMING, LISTENING, WATCHING, COMPETING')
-                return
-            
-            activity_type = args[0].upper()
-            activity_name = ' '.join(args[1:])
-            
-            activity_map = {
-                'PLAYING': discord.ActivityType.playing,
-                'STREAMING': discord.ActivityType.streaming,
-                'LISTENING': discord.ActivityType.listening,
-                'WATCHING': discord.ActivityType.watching,
-                'COMPETING': discord.ActivityType.competing
-            }
-            
-            if activity_type not in activity_map:
-                await message.edit(content=f'❌ Usage: `{PREFIX}activity <type> <nom>`\nTypes: {", ".join(activity_map.keys())}')
-                return
-            
-            try:
-                activity = discord.Activity(type=activity_map[activity_type], name=activity_name)
-                await bot.change_presence(activity=activity)
-            except Exception:
-                await message.edit(content='❌ Erreur lors du changement d\'activité.')
-    
-    except Exception as error:
-        if 'Unknown Message' not in str(error):
-            print(f'❌ Erreur commande {command_name}: {error}')
+@bot.event
+async def on_raw_message_delete(payload):
+    """Événement: Message supprimé"""
+    own_index.remove(payload.message_id)
 
 @bot.event
 async def on_error(event, *args, **kwargs):
@@ -0,0 +1,313 @@
+"""
+Commandes propres à selfbot.py: IA, expulsion vocale et sauvegardes de serveur.
+L'import de ce module enregistre les commandes dans le registre partagé.
+"""
+
+import os
+import json
+import asyncio
+import discord
+
+from command_registry import registry
+from config import AI_HISTORY_LIMIT, AI_MAX_TOKENS, AI_CONTEXT_TOKENS, AI_ARCHIVE_ENABLED, AI_STREAM, AI_CACHE_ENABLED, OPENAI_MODEL, EXPORT_DIR, RESTORE_CONCURRENCY, SNAPSHOTS_ENABLED
+from ai import (
+    call_openai_chat,
+    stream_openai_chat,
+    build_ai_prompt,
+    build_conversation_context,
+    chat_completions_url,
+    truncate_reply,
+    ThrottledEditor,
+    SYSTEM_PROMPT,
+    AI_TEMPERATURE,
+)
+from ai_cache import response_cache, cache_key
+from message_cache import message_buffer
+from ai_context import context_builder
+from message_archive import archive as message_archive
+from ai_requests import ai_requests, AIRequestCancelled
+from backup import (
+    ensure_export_dir,
+    export_guild_channels,
+    find_backup_file,
+    read_backup,
+    run_io,
+)
+from backup_format import BackupFormatError, is_backup_file
+from snapshot_store import store as snapshot_store
+from restore_planner import RestorePlan, RestoreExecutor
+from restore_journal import RestoreJournal
+from restore_diff import apply_diff, describe_diff
+from low_memory import resolve_member
+
+
+def parse_kick_count(ctx) -> int:
+    """Récupère le nombre de fois (par défaut 1, limité à 20)."""
+    args = ctx.args
+    try:
+        if len(args) > 0 and args[0].isdigit():
+            # Si le premier argument après la mention est un nombre
+            kick_count = int(args[0])
+        elif len(args) > 1 and args[1].isdigit():
+            # Si le nombre est après la mention
+            kick_count = int(args[1])
+        else:
+            kick_count = 1
+
+        if kick_count < 1:
+            kick_count = 1
+        elif kick_count > 20:  # Limiter à 20 pour éviter les abus
+            kick_count = 20
+    except (ValueError, IndexError):
+        kick_count = 1
+    return kick_count
+
+
+@registry.command('kick_vocal', usage='@user <nombre>', description='Expulse un utilisateur d\'un canal vocal plusieurs fois',
+                  guild_only=True, parser=parse_kick_count)
+async def kick_vocal_command(ctx):
+    # Commande pour kicker quelqu'un d'un canal vocal plusieurs fois
+    message = ctx.message
+    if not message.mentions:
+        await ctx.reply(f'❌ Usage: `{ctx.prefix}kick_vocal @utilisateur <nombre>`\nVous devez mentionner un utilisateur et spécifier le nombre de fois.')
+        return
+
+    kick_count = ctx.parsed
+    target_user = message.mentions[0]
+    member = await resolve_member(message.guild, target_user)
+
+    if not member:
+        await ctx.reply('❌ Utilisateur introuvable dans ce serveur.')
+        return
+
+    # Vérifier si l'utilisateur est dans un canal vocal
+    if not member.voice or not member.voice.channel:
+        await ctx.reply(f'❌ {member.display_name} n\'est pas dans un canal vocal.')
+        return
+
+    try:
+        success_count = 0
+        # Boucle pour kicker plusieurs fois
+        for i in range(kick_count):
+            try:
+                # Déconnecter l'utilisateur du canal vocal
+                await member.edit(voice_channel=None)
+                success_count += 1
+                # Petit délai entre chaque kick pour éviter le rate limit
+                if i < kick_count - 1:  # Pas de délai après le dernier
+                    await asyncio.sleep(0.5)
+            except discord.Forbidden:
+                break  # Arrêter si on n'a plus les permissions
+            except Exception:
+                pass  # Continuer même en cas d'erreur
+
+        if success_count > 0:
+            await ctx.reply(f'✅ {member.display_name} a été expulsé {success_count} fois du canal vocal.')
+        else:
+            await ctx.reply('❌ Impossible d\'expulser cet utilisateur.')
+    except discord.Forbidden:
+        await ctx.reply('❌ Permissions insuffisantes pour expulser cet utilisateur.')
+    except Exception as e:
+        await ctx.reply(f'❌ Erreur lors de l\'expulsion: {str(e)}')
+
+
+def parse_ai_args(ctx) -> dict:
+    """Sépare l'option --nocache de la question."""
+    words = [arg for arg in ctx.args if arg.lower() != '--nocache']
+    return {'prompt': ' '.join(words).strip(), 'nocache': len(words) != len(ctx.args)}
+
+
+@registry.command('ai', usage='[question] [--nocache]', description='Génère une réponse IA en utilisant le contexte du salon',
+                  parser=parse_ai_args)
+async def ai_command(ctx):
+    message = ctx.message
+    command_text = message.content
+    user_prompt = ctx.parsed['prompt']
+    use_cache = AI_CACHE_ENABLED and not ctx.parsed['nocache']
+    await ctx.reply('🤖 Génération de la réponse IA en cours...')
+    editor = ThrottledEditor(message) if AI_STREAM else None
+    # En streaming, tout passe par l'éditeur pour qu'une édition en retard n'écrase pas le message final
+    reply = editor.finish if editor else ctx.reply
+    try:
+        if AI_CONTEXT_TOKENS > 0:
+            # Tout le tampon du salon est candidat: le budget de tokens et le résumé décident de ce qui est envoyé
+            context_text = await build_conversation_context(message.channel, message_buffer.per_channel, ctx.bot.user,
+                                                            ignore_id=message.id, buffer=message_buffer, builder=context_builder,
+                                                            archive=message_archive if AI_ARCHIVE_ENABLED else None,
+                                                            query=user_prompt)
+        else:
+            context_text = await build_conversation_context(message.channel, AI_HISTORY_LIMIT, ctx.bot.user, ignore_id=message.id,
+                                                            buffer=message_buffer)
+        prompt = build_ai_prompt(context_text, user_prompt)
+
+        # Même serveur, même modèle, même prompt, mêmes réglages: la réponse en cache évite l'appel réseau
+        key = cache_key(OPENAI_MODEL, SYSTEM_PROMPT, prompt, AI_TEMPERATURE, AI_MAX_TOKENS, chat_completions_url())
+        ai_reply = response_cache.get(key) if use_cache else None
+        if ai_reply is not None:
+            await reply(truncate_reply(ai_reply))
+            return
+
+        async def produce(progress):
+            # Exécuté une seule fois pour toutes les commandes identiques en cours
+            if AI_STREAM:
+                text = ''
+                async for delta in stream_openai_chat(prompt):
+                    text += delta
+                    progress(text)
+                text = text.strip()
+                if not text:
+                    raise RuntimeError('Réponse vide de la part de l’IA')
+            else:
+                text = await call_openai_chat(prompt)
+            if AI_CACHE_ENABLED:
+                response_cache.set(key, text)
+            return text
+
+        on_progress = (lambda text: editor.update(truncate_reply(text) + ' ▌')) if editor else None
+        ai_reply = await ai_requests.run(key, produce, message_id=message.id, command_text=command_text,
+                                         on_progress=on_progress)
+        await reply(truncate_reply(ai_reply))
+    except AIRequestCancelled as cancelled:
+        # Le message n'est plus le nôtre à éditer: on s'arrête sans répondre
+        if editor:
+            editor.stop()
+        print(f'⏹️  Commande ai abandonnée: message {cancelled}')
+    except RuntimeError as api_error:
+        await reply(f'❌ Impossible d’utiliser l’IA: {api_error}')
+    except Exception as e:
+        await reply('❌ Erreur inattendue lors de l’appel à l’IA.')
+        print(f'❌ Erreur commande ai: {e}')
+
+
+@registry.command('aicache', usage='[clear]', description='Affiche les statistiques du cache IA (ou le vide)')
+async def aicache_command(ctx):
+    if ctx.args and ctx.args[0].lower() == 'clear':
+        response_cache.clear()
+        await ctx.reply('🧹 Cache IA vidé.')
+        return
+    lines = [response_cache.summary(), ai_requests.summary()]
+    if AI_ARCHIVE_ENABLED:
+        lines.append(message_archive.summary())
+    await ctx.reply('\n'.join(lines))
+
+
+@registry.command('save_backup', description='Sauvegarde les salons, catégories et rôles du serveur dans un fichier JSON',
+                  guild_only=True)
+async def save_backup_command(ctx):
+    message = ctx.message
+    try:
+        await ctx.reply('💾 Sauvegarde des salons, catégories et rôles en cours...')
+        export_path, stats = await export_guild_channels(message.guild, snapshots=snapshot_store if SNAPSHOTS_ENABLED else None)
+        snapshot_msg = ''
+        if 'snapshot' in stats:
+            snapshot = stats['snapshot']
+            snapshot_msg = f'\n🗂️ Snapshot `{snapshot["id"]}` ({snapshot["written"]} nouveaux enregistrements, {snapshot["reused"]} réutilisés)'
+        await ctx.reply(f'✅ **Sauvegarde terminée!**\n📊 {stats["total"]} éléments sauvegardés ({stats["categories"]} catégories, {stats["channels"]} salons, {stats["roles"]} rôles)\n💾 Fichier: `{export_path}`{snapshot_msg}')
+    except Exception as e:
+        await ctx.reply('❌ Erreur lors de la sauvegarde.')
+        print(f'❌ Erreur sauvegarde: {e}')
+
+
+def parse_load_backup_args(ctx) -> dict:
+    """Sépare les options (--dry-run, --fresh, --diff) du nom de fichier."""
+    options = {'dry_run': False, 'fresh': False, 'diff': False}
+    words = []
+    for arg in ctx.args:
+        if arg.lower() in ('--dry-run', '--dry', '-n'):
+            options['dry_run'] = True
+        elif arg.lower() == '--fresh':
+            options['fresh'] = True
+        elif arg.lower() == '--diff':
+            options['diff'] = True
+        else:
+            words.append(arg)
+    options['filename'] = ' '.join(words)
+    return options
+
+
+@registry.command('snapshots', usage='[guild_id]', description='Liste l\'historique des sauvegardes de ce serveur (restaurer avec load_backup @<id>)',
+                  guild_only=True)
+async def snapshots_command(ctx):
+    if ctx.args and not ctx.args[0].isdigit():
+        await ctx.reply(f'❌ Usage: `{ctx.prefix}snapshots [guild_id]`\nL\'ID du serveur doit être un nombre.')
+        return
+    guild_id = ctx.args[0] if ctx.args else ctx.message.guild.id
+    snapshots = snapshot_store.list(guild_id)
+    if not snapshots:
+        await ctx.reply(f'❌ Aucun snapshot pour ce serveur. Utilisez `{ctx.prefix}save_backup` pour en créer un.')
+        return
+    snapshots_list = '\n'.join([f'• `{snapshot_id}`' for snapshot_id in snapshots[:15]])
+    more = f'\n… {len(snapshots) - 15} de plus' if len(snapshots) > 15 else ''
+    await ctx.reply(f'**🗂️ Snapshots ({len(snapshots)}):**\n{snapshots_list}{more}\n\n💡 Usage: `{ctx.prefix}load_backup @<id> [--diff] [--dry-run]`')
+
+
+@registry.command('load_backup', usage='[fichier|@snapshot] [--dry-run] [--fresh] [--diff]', description='Applique un backup complet (rôles, salons, catégories) sur ce serveur',
+                  guild_only=True, parser=parse_load_backup_args)
+async def load_backup_command(ctx):
+    message = ctx.message
+    options = ctx.parsed
+    if not options['filename']:
+        # Lister les fichiers disponibles
+        try:
+            ensure_export_dir()
+            # Chercher les fichiers backup_ et channels_ pour compatibilité
+            files = [f for f in os.listdir(EXPORT_DIR) if is_backup_file(f)]
+            if not files:
+                await ctx.reply('❌ Aucun fichier de sauvegarde trouvé dans le dossier `exports/`.')
+                return
+
+            files_list = '\n'.join([f'• `{f}`' for f in sorted(files, reverse=True)[:10]])
+            await ctx.reply(f'**📁 Fichiers disponibles:**\n{files_list}\n\n💡 Usage: `{ctx.prefix}load_backup <nom_fichier> [--dry-run]`')
+        except Exception as e:
+            await ctx.reply('❌ Erreur lors de la lecture des fichiers.')
+            print(f'❌ Erreur listage fichiers: {e}')
+        return
+
+    filename = options['filename']
+    try:
+        await ctx.reply('📥 Chargement du fichier...')
+        if filename.startswith('@'):
+            # Snapshot de l'historique: !load_backup @<id> ou @<guild_id>/<id>
+            source = '@' + await run_io(snapshot_store.resolve, filename[1:], message.guild.id)
+            data = await run_io(snapshot_store.load, source[1:])
+        else:
+            source = await run_io(find_backup_file, filename)
+            data = await read_backup(source)
+        guild_name = data.get('guild_name', 'Inconnu') if isinstance(data, dict) else 'Inconnu'
+
+        # Graphe rôles -> catégories -> salons, les branches indépendantes partent en parallèle
+        plan = RestorePlan(data)
+        diff_msg = ''
+        if options['diff']:
+            # Ne créer / modifier que ce qui diffère du serveur actuel
+            diff_msg = '\n' + describe_diff(apply_diff(plan, message.guild))
+        if options['dry_run']:
+            await ctx.reply(f'📥 Fichier chargé: **{guild_name}** (dry-run, rien n\'est créé){diff_msg}\n{plan.describe()}')
+            return
+
+        # Journal: une restauration interrompue reprend au lieu de dupliquer ce qui existe déjà
+        journal = await RestoreJournal.for_restore(message.guild.id, source)
+        if options['fresh']:
+            await journal.clear()
+        resume_msg = f'\n♻️ Reprise: {len(journal)} éléments déjà créés' if len(journal) else ''
+
+        await ctx.reply(f'📥 Fichier chargé: **{guild_name}**\n🔨 Création de {len(plan.nodes)} éléments ({plan.count("rôle")} rôles, {plan.count("catégorie")} catégories) en cours... (cela peut prendre du temps){diff_msg}{resume_msg}')
+        result = await RestoreExecutor(plan, message.guild, concurrency=RESTORE_CONCURRENCY, journal=journal).run()
+
+        roles_msg = f'\n👥 Rôles: {result["roles"]}' if plan.count('rôle') else ''
+        failed_msg = f'\n⚠️ Échecs: {result["failed"]} (relancez la commande pour reprendre)' if result['failed'] else ''
+        diff_msg = f'\n✏️ Modifiés: {result["edited"]}, ⏭️ inchangés: {result["skipped"]}' if options['diff'] else ''
+        if not result['failed']:
+            await journal.clear()
+        await ctx.reply(f'✅ **Backup restauré avec succès!**\n📊 Salons créés: {result["total"]} ({result["categories"]} catégories, {result["channels"]} salons){roles_msg}{diff_msg}{failed_msg}')
+    except FileNotFoundError:
+        await ctx.reply(f'❌ Fichier introuvable: `{filename}`\n💡 Utilisez `{ctx.prefix}load_backup` pour voir les fichiers disponibles.')
+    except json.JSONDecodeError:
+        await ctx.reply('❌ Fichier JSON invalide.')
+    except BackupFormatError as format_error:
+        await ctx.reply(f'❌ Backup illisible: {format_error}')
+    except discord.Forbidden:
+        await ctx.reply('❌ Permissions insuffisantes pour créer des salons.')
+    except Exception as e:
+        await ctx.reply(f'❌ Erreur lors de l\'application des salons: {str(e)}')
+        print(f'❌ Erreur application salons: {e}')
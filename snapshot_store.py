@@ -0,0 +1,127 @@
+"""
+Historique des sauvegardes dédupliqué par contenu (exports/snapshots/).
+
+Chaque salon et chaque rôle est stocké une seule fois sous le hash SHA-256 de
+son contenu (objects/ab/cdef...). Un snapshot n'est qu'un manifeste: les
+métadonnées du serveur et la liste des hashes. Des sauvegardes répétées d'un
+serveur qui change peu n'écrivent donc que les enregistrements modifiés.
+"""
+
+import os
+import re
+import json
+import hashlib
+from datetime import datetime
+
+from config import EXPORT_DIR
+from backup import write_atomic
+
+SNAPSHOT_DIR = os.path.join(EXPORT_DIR, 'snapshots')
+RECORD_FIELDS = ('channels', 'roles')
+
+
+def _canonical(record) -> bytes:
+    return json.dumps(record, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode('utf-8')
+
+
+class SnapshotStore:
+    """Magasin d'enregistrements adressés par contenu + manifestes de snapshots."""
+
+    def __init__(self, root: str = SNAPSHOT_DIR):
+        self.root = root
+        self.objects_dir = os.path.join(root, 'objects')
+        self.manifests_dir = os.path.join(root, 'manifests')
+
+    def _object_path(self, digest: str) -> str:
+        return os.path.join(self.objects_dir, digest[:2], digest[2:])
+
+    def put(self, record) -> tuple:
+        """Stocke un enregistrement s'il est nouveau. Renvoie (hash, écrit)."""
+        content = _canonical(record)
+        digest = hashlib.sha256(content).hexdigest()
+        path = self._object_path(digest)
+        if os.path.exists(path):
+            return digest, False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        write_atomic(path, content)
+        return digest, True
+
+    def get(self, digest: str):
+        with open(self._object_path(digest), 'rb') as f:
+            return json.loads(f.read().decode('utf-8'))
+
+    def save(self, payload: dict) -> dict:
+        """Enregistre un snapshot du backup `payload`. Renvoie son identifiant et les compteurs."""
+        manifest = {key: value for key, value in payload.items() if key not in RECORD_FIELDS}
+        written = reused = 0
+        for field in RECORD_FIELDS:
+            hashes = []
+            for record in payload.get(field, []):
+                digest, is_new = self.put(record)
+                hashes.append(digest)
+                if is_new:
+                    written += 1
+                else:
+                    reused += 1
+            manifest[field] = hashes
+
+        guild_dir = os.path.join(self.manifests_dir, str(payload.get('guild_id', 'inconnu')))
+        os.makedirs(guild_dir, exist_ok=True)
+        snapshot_id = base_id = datetime.utcnow().strftime('%Y%m%d-%H%M%S')
+        suffix = 1
+        while os.path.exists(os.path.join(guild_dir, f'{snapshot_id}.json')):
+            suffix += 1
+            snapshot_id = f'{base_id}-{suffix}'
+        write_atomic(os.path.join(guild_dir, f'{snapshot_id}.json'), _canonical(manifest))
+        return {'id': snapshot_id, 'written': written, 'reused': reused}
+
+    def list(self, guild_id) -> list:
+        """Identifiants des snapshots d'un serveur, du plus récent au plus ancien."""
+        if not str(guild_id).isdigit():
+            return []  # Jamais de chemin hors de manifests/ (../.., séparateurs)
+        guild_dir = os.path.join(self.manifests_dir, str(guild_id))
+        if not os.path.isdir(guild_dir):
+            return []
+        return sorted((name[:-len('.json')] for name in os.listdir(guild_dir) if name.endswith('.json')), reverse=True)
+
+    def _find_manifest(self, snapshot_ref: str, guild_id=None) -> str:
+        # Référence complète '<guild_id>/<snapshot_id>' ou simple '<snapshot_id>' (serveur courant d'abord)
+        if not re.fullmatch(r'(\w+/)?[\w-]+', snapshot_ref):
+            raise FileNotFoundError(f'Snapshot introuvable: {snapshot_ref}')
+        if '/' in snapshot_ref:
+            guild_part, snapshot_id = snapshot_ref.split('/', 1)
+            candidates = [os.path.join(self.manifests_dir, guild_part, f'{snapshot_id}.json')]
+        else:
+            guild_dirs = os.listdir(self.manifests_dir) if os.path.isdir(self.manifests_dir) else []
+            if guild_id is not None and str(guild_id) in guild_dirs:
+                guild_dirs.remove(str(guild_id))
+                guild_dirs.insert(0, str(guild_id))
+            candidates = [os.path.join(self.manifests_dir, name, f'{snapshot_ref}.json') for name in guild_dirs]
+        for path in candidates:
+            if os.path.exists(path):
+                return path
+        raise FileNotFoundError(f'Snapshot introuvable: {snapshot_ref}')
+
+    def resolve(self, snapshot_ref: str, guild_id=None) -> str:
+        """Référence complète '<guild_id>/<snapshot_id>' d'un snapshot (FileNotFoundError s'il n'existe pas)."""
+        path = self._find_manifest(snapshot_ref, guild_id)
+        return f'{os.path.basename(os.path.dirname(path))}/{os.path.basename(path)[:-len(".json")]}'
+
+    def load(self, snapshot_ref: str, guild_id=None) -> dict:
+        """Reconstruit le backup complet d'un snapshot (même format que load_channels_from_file)."""
+        with open(self._find_manifest(snapshot_ref, guild_id), 'rb') as f:
+            manifest = json.loads(f.read().decode('utf-8'))
+        payload = dict(manifest)
+        cache = {}
+        for field in RECORD_FIELDS:
+            records = []
+            for digest in manifest.get(field, []):
+                if digest not in cache:
+                    cache[digest] = self.get(digest)
+                records.append(cache[digest])
+            payload[field] = records
+        return payload
+
+
+# Magasin partagé (exports/snapshots/)
+store = SnapshotStore()
@@ -0,0 +1,577 @@
+"""
+Faux client et fausse API REST Discord, en mémoire, pour exercer le bot sans token.
+
+Les modèles (serveur, rôles, catégories, salons, messages) sont de vraies
+sous-classes des classes discord.py: les `isinstance` du code (backup.py,
+restore_diff.py) se comportent comme avec des objets reçus de la gateway.
+Chaque action qui passerait par l'API (création, modification, lecture de
+l'historique, suppression) passe par `FakeDiscordAPI.request`, qui:
+
+- ajoute une latence réglable (avec gigue);
+- applique une limite par bucket (`bucket_limit` requêtes par `bucket_window`
+  secondes), avec les en-têtes X-RateLimit-* et des 429 + Retry-After;
+- peut injecter des 429 et des 5xx aléatoires;
+- compte les appels par route (mêmes clés que rate_limit.route_key).
+
+    api = FakeDiscordAPI(latency=0.02, bucket_limit=5, bucket_window=1.0, observer=scheduler.on_response)
+    guild = build_synthetic_guild(api, channels=100)
+
+`observer` joue le rôle de `scheduler.instrument(client)`: il reçoit la méthode,
+le chemin, le statut, les en-têtes et la durée de chaque réponse (429 et erreurs compris).
+"""
+
+import time
+import bisect
+import random
+import asyncio
+import itertools
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+import discord
+from discord.utils import time_snowflake, snowflake_time
+
+from rate_limit import route_key
+
+PAGE_SIZE = 100  # Messages par requête d'historique, comme l'API
+LIBRARY_RETRIES = 5  # 429 réessayés par discord.py avant de lever l'exception
+
+
+class FakeResponse:
+    """Réponse minimale attendue par discord.HTTPException (status, reason, headers)."""
+
+    REASONS = {403: 'Forbidden', 404: 'Not Found', 429: 'Too Many Requests', 500: 'Internal Server Error',
+               502: 'Bad Gateway'}
+
+    def __init__(self, status: int, headers: dict = None):
+        self.status = status
+        self.reason = self.REASONS.get(status, 'Error')
+        self.headers = headers or {}
+
+
+def http_error(status: int, message: str, code: int = 0, headers: dict = None) -> discord.HTTPException:
+    """Même exception que discord.py pour ce statut (Forbidden, NotFound, DiscordServerError...)."""
+    exception = {403: discord.Forbidden, 404: discord.NotFound}.get(status)
+    if exception is None:
+        exception = discord.DiscordServerError if status >= 500 else discord.HTTPException
+    return exception(FakeResponse(status, headers), {'message': message, 'code': code})
+
+
+class FakeDiscordAPI:
+    """Couche REST simulée: latence, buckets de rate limit, erreurs injectées et compteurs par route."""
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, bucket_limit: int = 0, bucket_window: float = 1.0,
+                 rate_limit_rate: float = 0.0, error_rate: float = 0.0, observer=None, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.bucket_limit = bucket_limit
+        self.bucket_window = bucket_window
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.observer = observer
+        self.random = random.Random(seed)
+        self.routes = Counter()  # Route -> nombre d'appels
+        self.stats = {'calls': 0, 'rate_limited': 0, 'errors': 0}
+        self._windows = {}  # Route -> [début de la fenêtre, requêtes acceptées]
+        self._ids = itertools.count(1)
+
+    def next_id(self, when: datetime = None) -> int:
+        """Snowflake unique (au moment `when`, maintenant par défaut)."""
+        return time_snowflake(when or datetime.now(timezone.utc)) + next(self._ids) % 4096
+
+    def reset_stats(self):
+        self.routes.clear()
+        self.stats = {'calls': 0, 'rate_limited': 0, 'errors': 0}
+
+    def _rate_limited(self, retry_after: float) -> discord.HTTPException:
+        self.stats['rate_limited'] += 1
+        return http_error(429, 'You are being rate limited.', headers={
+            'Retry-After': f'{retry_after:.3f}', 'X-RateLimit-Reset-After': f'{retry_after:.3f}',
+            'X-RateLimit-Scope': 'user'})
+
+    def _check_bucket(self, route: str):
+        """Compte la requête dans la fenêtre de sa route. Renvoie les en-têtes, ou lève un 429."""
+        if not self.bucket_limit:
+            return None
+        now = time.monotonic()
+        window = self._windows.get(route)
+        if window is None or now >= window[0] + self.bucket_window:
+            window = self._windows[route] = [now, 0]
+        reset_after = window[0] + self.bucket_window - now
+        if window[1] >= self.bucket_limit:
+            raise self._rate_limited(reset_after)
+        window[1] += 1
+        return {
+            'X-RateLimit-Limit': str(self.bucket_limit),
+            'X-RateLimit-Remaining': str(self.bucket_limit - window[1]),
+            'X-RateLimit-Reset-After': f'{reset_after:.3f}',
+        }
+
+    async def request(self, method: str, path: str, action=None, retry_rate_limits: bool = False):
+        """Simule une requête: attend la latence, applique les limites, puis exécute `action()`.
+
+        `retry_rate_limits`: attend et réessaie les 429 comme le HTTPClient de discord.py (pour les
+        appels que le code ne fait pas passer par le planificateur, comme channel.history()).
+        """
+        for attempt in range(LIBRARY_RETRIES if retry_rate_limits else 0):
+            try:
+                return await self._request(method, path, action)
+            except discord.HTTPException as e:
+                if e.status != 429:
+                    raise
+                await asyncio.sleep(float(e.response.headers['Retry-After']))
+        return await self._request(method, path, action)
+
+    async def _request(self, method: str, path: str, action):
+        route = route_key(method, path)
+        self.stats['calls'] += 1
+        self.routes[route] += 1
+        started = time.monotonic()
+        delay = self.latency + (self.random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        try:
+            headers = self._check_bucket(route)
+            if self.rate_limit_rate and self.random.random() < self.rate_limit_rate:
+                raise self._rate_limited(self.bucket_window / 4 or 0.1)
+            if self.error_rate and self.random.random() < self.error_rate:
+                self.stats['errors'] += 1
+                raise http_error(502, 'Bad Gateway (simulé)')
+            result = action() if action is not None else None
+        except discord.HTTPException as e:
+            self._observe(method, path, e.status, e.response.headers, started)
+            raise
+        self._observe(method, path, 200, headers or {}, started)
+        return result
+
+    def _observe(self, method: str, path: str, status: int, headers: dict, started: float):
+        if self.observer is not None:
+            self.observer(method, path, status, headers, time.monotonic() - started)
+
+    def describe(self, top: int = 5) -> str:
+        """Appels par route, les plus fréquentes d'abord."""
+        routes = ', '.join(f'{route}: {count}' for route, count in self.routes.most_common(top))
+        return (f'{self.stats["calls"]} appels ({self.stats["rate_limited"]} × 429, {self.stats["errors"]} × 5xx)'
+                + (f' | {routes}' if routes else ''))
+
+
+class FakeUser:
+    """Utilisateur minimal (auteur de messages, compte connecté)."""
+
+    def __init__(self, user_id: int, name: str, bot: bool = False):
+        self.id = user_id
+        self.name = name
+        self.display_name = name
+        self.global_name = name
+        self.discriminator = '0'
+        self.bot = bot
+        self.created_at = snowflake_time(user_id)
+        self.mention = f'<@{user_id}>'
+
+    def __eq__(self, other):
+        return getattr(other, 'id', None) == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class FakeRole(discord.Role):
+    """discord.Role construit sans gateway."""
+
+    def __init__(self, guild, role_id: int, name: str, permissions: int = 0, colour: int = 0, position: int = 0,
+                 hoist: bool = False, mentionable: bool = False, managed: bool = False):
+        self.guild = guild
+        self.id = role_id
+        self.name = name
+        self._permissions = permissions
+        self._colour = colour
+        self._secondary_colour = None
+        self._tertiary_colour = None
+        self.position = position
+        self.hoist = hoist
+        self.mentionable = mentionable
+        self.managed = managed
+        self.unicode_emoji = None
+        self._icon = None
+        self.tags = None
+        self._flags = 0
+        self._state = None
+
+    def _apply(self, fields: dict):
+        for key, value in fields.items():
+            if key in ('colour', 'color'):
+                self._colour = value.value if isinstance(value, discord.Colour) else int(value)
+            elif key == 'permissions':
+                self._permissions = value.value
+            else:
+                setattr(self, key, value)
+        return self
+
+    async def edit(self, **fields):
+        return await self.guild.api.request('PATCH', f'/guilds/{self.guild.id}/roles/{self.id}', lambda: self._apply(fields))
+
+
+class FakeMessage:
+    """Message d'un salon (modifiable et supprimable via la fausse API)."""
+
+    def __init__(self, message_id: int, content: str, author, channel):
+        self.id = message_id
+        self.content = content
+        self.author = author
+        self.channel = channel
+        self.guild = getattr(channel, 'guild', None)
+        self.created_at = snowflake_time(message_id)
+        self.mentions = []
+        self.edits = 0
+
+    def _apply(self, content):
+        self.content = content
+        self.edits += 1
+        return self
+
+    async def edit(self, content=None, **kwargs):
+        return await self.channel.guild.api.request(
+            'PATCH', f'/channels/{self.channel.id}/messages/{self.id}', lambda: self._apply(content))
+
+    async def delete(self):
+        await self.channel.delete_message(self.id)
+
+
+class FakePartialMessage:
+    """Équivalent de channel.get_partial_message(id): seule la suppression est utilisée."""
+
+    def __init__(self, channel, message_id: int):
+        self.channel = channel
+        self.id = message_id
+
+    async def delete(self):
+        await self.channel.delete_message(self.id)
+
+
+class _FakeChannel:
+    """Partie commune des faux salons (placée avant la classe discord.py dans le MRO)."""
+
+    def _setup(self, guild, channel_id: int, name: str, channel_type, position: int = 0, category=None,
+               overwrites: dict = None, nsfw: bool = False):
+        self.guild = guild
+        self.id = channel_id
+        self.name = name
+        self._fake_type = channel_type
+        self.position = position
+        self.category_id = category.id if category is not None else None
+        self.nsfw = nsfw
+        self._fake_overwrites = dict(overwrites or {})
+
+    @property
+    def type(self):
+        return self._fake_type
+
+    @property
+    def overwrites(self) -> dict:
+        return dict(self._fake_overwrites)
+
+    @property
+    def category(self):
+        return self.guild.get_channel(self.category_id) if self.category_id else None
+
+    def _apply(self, fields: dict):
+        for key, value in fields.items():
+            if key == 'overwrites':
+                self._fake_overwrites = dict(value)
+            elif key == 'category':
+                self.category_id = value.id if value is not None else None
+            else:
+                setattr(self, key, value)
+        return self
+
+    async def edit(self, **fields):
+        return await self.guild.api.request('PATCH', f'/channels/{self.id}', lambda: self._apply(fields))
+
+
+class FakeCategoryChannel(_FakeChannel, discord.CategoryChannel):
+    def __init__(self, guild, channel_id: int, name: str, position: int = 0, overwrites: dict = None):
+        self._setup(guild, channel_id, name, discord.ChannelType.category, position, None, overwrites)
+
+
+class FakeVoiceChannel(_FakeChannel, discord.VoiceChannel):
+    def __init__(self, guild, channel_id: int, name: str, position: int = 0, category=None, overwrites: dict = None,
+                 bitrate: int = 64000, user_limit: int = 0, nsfw: bool = False, channel_type=discord.ChannelType.voice):
+        self._setup(guild, channel_id, name, channel_type, position, category, overwrites, nsfw)
+        self.bitrate = bitrate
+        self.user_limit = user_limit
+
+
+class FakeTextChannel(_FakeChannel, discord.TextChannel):
+    """Salon textuel avec historique paginé comme l'API (100 messages par requête)."""
+
+    def __init__(self, guild, channel_id: int, name: str, position: int = 0, category=None, overwrites: dict = None,
+                 topic: str = None, nsfw: bool = False, channel_type=discord.ChannelType.text):
+        self._setup(guild, channel_id, name, channel_type, position, category, overwrites, nsfw)
+        self.topic = topic
+        self._message_ids = []  # Triés
+        self._messages = {}
+
+    def add_message(self, content: str, author, when: datetime = None) -> FakeMessage:
+        """Ajoute un message à l'historique sans appel à l'API (construction du jeu de données)."""
+        message = FakeMessage(self.guild.api.next_id(when), content, author, self)
+        bisect.insort(self._message_ids, message.id)
+        self._messages[message.id] = message
+        return message
+
+    @property
+    def message_count(self) -> int:
+        return len(self._message_ids)
+
+    def _page(self, cursor: int, bound: int, oldest_first: bool, size: int) -> list:
+        ids = self._message_ids
+        if oldest_first:
+            start = bisect.bisect_right(ids, cursor)
+            end = bisect.bisect_left(ids, bound) if bound is not None else len(ids)
+            page_ids = ids[start:min(end, start + size)]
+        else:
+            end = bisect.bisect_left(ids, cursor) if cursor is not None else len(ids)
+            start = bisect.bisect_right(ids, bound) if bound is not None else 0
+            page_ids = ids[max(start, end - size):end][::-1]
+        return [self._messages[message_id] for message_id in page_ids]
+
+    async def history(self, limit: int = 100, before=None, after=None, oldest_first: bool = None):
+        """Même sémantique que discord.py: du plus récent au plus ancien, sauf avec `after` ou oldest_first."""
+        if oldest_first is None:
+            oldest_first = after is not None
+        before_id = before.id if before is not None else None
+        after_id = after.id if after is not None else None
+        cursor = (after_id or 0) if oldest_first else before_id
+        bound = before_id if oldest_first else after_id
+        yielded = 0
+        while limit is None or yielded < limit:
+            size = PAGE_SIZE if limit is None else min(PAGE_SIZE, limit - yielded)
+            page = await self.guild.api.request('GET', f'/channels/{self.id}/messages',
+                                                lambda: self._page(cursor, bound, oldest_first, size),
+                                                retry_rate_limits=True)
+            for message in page:
+                yield message
+            yielded += len(page)
+            if len(page) < size:
+                return
+            cursor = page[-1].id
+
+    def get_partial_message(self, message_id: int) -> FakePartialMessage:
+        return FakePartialMessage(self, message_id)
+
+    def _delete(self, message_id: int):
+        if self._messages.pop(message_id, None) is None:
+            raise http_error(404, 'Unknown Message', code=10008)
+        del self._message_ids[bisect.bisect_left(self._message_ids, message_id)]
+
+    async def delete_message(self, message_id: int):
+        await self.guild.api.request('DELETE', f'/channels/{self.id}/messages/{message_id}',
+                                     lambda: self._delete(message_id))
+
+
+class FakeGuild:
+    """Serveur en mémoire: rôles, salons et méthodes de création qui passent par la fausse API."""
+
+    def __init__(self, api: FakeDiscordAPI, name: str = 'Serveur de test', guild_id: int = None, owner_id: int = None):
+        self.api = api
+        self.id = guild_id or api.next_id()
+        self.name = name
+        self.owner_id = owner_id
+        self.created_at = snowflake_time(self.id)
+        self.premium_tier = 0
+        self.premium_subscription_count = 0
+        self.me = None
+        self._roles = {}
+        self._channels = {}
+        self._members = {}
+        self._uncached_members = {}  # Membres connus de l'API mais absents du cache (profil LOW_MEMORY)
+        self._roles[self.id] = FakeRole(self, self.id, '@everyone', permissions=discord.Permissions.general().value)
+
+    @property
+    def roles(self) -> list:
+        return sorted(self._roles.values(), key=lambda role: (role.position, role.id))
+
+    @property
+    def channels(self) -> list:
+        return sorted(self._channels.values(), key=lambda channel: (channel.position, channel.id))
+
+    @property
+    def text_channels(self) -> list:
+        return [channel for channel in self.channels if isinstance(channel, discord.TextChannel)]
+
+    @property
+    def categories(self) -> list:
+        return [channel for channel in self.channels if isinstance(channel, discord.CategoryChannel)]
+
+    @property
+    def default_role(self):
+        return self._roles[self.id]
+
+    @property
+    def member_count(self) -> int:
+        return len(self._members) + len(self._uncached_members)
+
+    def get_role(self, role_id: int):
+        return self._roles.get(role_id)
+
+    def get_channel(self, channel_id: int):
+        return self._channels.get(channel_id)
+
+    def get_member(self, user_id: int):
+        return self._members.get(user_id)
+
+    def add_member(self, user, cached: bool = True):
+        (self._members if cached else self._uncached_members)[user.id] = user
+        return user
+
+    def _member(self, user_id: int):
+        member = self._members.get(user_id) or self._uncached_members.get(user_id)
+        if member is None:
+            raise http_error(404, 'Unknown Member', code=10007)
+        return member
+
+    async def fetch_member(self, user_id: int):
+        return await self.api.request('GET', f'/guilds/{self.id}/members/{user_id}', lambda: self._member(user_id))
+
+    # Construction directe (jeu de données, aucun appel à l'API)
+
+    def add_role(self, name: str, permissions: int = 0, colour: int = 0, position: int = None, hoist: bool = False,
+                 mentionable: bool = False, managed: bool = False) -> FakeRole:
+        if position is None:
+            position = len(self._roles)
+        role = FakeRole(self, self.api.next_id(), name, permissions, colour, position, hoist, mentionable, managed)
+        self._roles[role.id] = role
+        return role
+
+    def _add_channel(self, channel):
+        self._channels[channel.id] = channel
+        return channel
+
+    def add_category(self, name: str, position: int = None, overwrites: dict = None) -> FakeCategoryChannel:
+        position = len(self._channels) if position is None else position
+        return self._add_channel(FakeCategoryChannel(self, self.api.next_id(), name, position, overwrites))
+
+    def add_text_channel(self, name: str, category=None, position: int = None, overwrites: dict = None,
+                         topic: str = None, nsfw: bool = False, channel_type=discord.ChannelType.text) -> FakeTextChannel:
+        position = len(self._channels) if position is None else position
+        return self._add_channel(FakeTextChannel(self, self.api.next_id(), name, position, category, overwrites,
+                                                 topic, nsfw, channel_type))
+
+    def add_voice_channel(self, name: str, category=None, position: int = None, overwrites: dict = None,
+                          bitrate: int = 64000, user_limit: int = 0, nsfw: bool = False,
+                          channel_type=discord.ChannelType.voice) -> FakeVoiceChannel:
+        position = len(self._channels) if position is None else position
+        return self._add_channel(FakeVoiceChannel(self, self.api.next_id(), name, position, category, overwrites,
+                                                  bitrate, user_limit, nsfw, channel_type))
+
+    # Même signature que discord.Guild: une requête par appel
+
+    async def create_role(self, name: str = 'new role', permissions=None, colour=None, color=None, hoist: bool = False,
+                          mentionable: bool = False, **kwargs):
+        colour = colour if colour is not None else color
+
+        def create():
+            # Discord place un nouveau rôle juste au-dessus de @everyone
+            for role in self._roles.values():
+                if not role.is_default():
+                    role.position += 1
+            return self.add_role(name, permissions.value if permissions is not None else 0,
+                                 colour.value if colour is not None else 0, 1, hoist, mentionable)
+
+        return await self.api.request('POST', f'/guilds/{self.id}/roles', create)
+
+    async def create_category(self, name: str, overwrites: dict = None, position: int = None, **kwargs):
+        return await self.api.request('POST', f'/guilds/{self.id}/channels',
+                                      lambda: self.add_category(name, position, overwrites))
+
+    async def create_text_channel(self, name: str, category=None, news: bool = False, position: int = None,
+                                  overwrites: dict = None, topic: str = None, nsfw: bool = False, **kwargs):
+        channel_type = discord.ChannelType.news if news else discord.ChannelType.text
+        return await self.api.request('POST', f'/guilds/{self.id}/channels', lambda: self.add_text_channel(
+            name, category, position, overwrites, topic, nsfw, channel_type))
+
+    async def create_forum_channel(self, name: str, category=None, position: int = None, overwrites: dict = None,
+                                   topic: str = None, nsfw: bool = False, **kwargs):
+        return await self.api.request('POST', f'/guilds/{self.id}/channels', lambda: self.add_text_channel(
+            name, category, position, overwrites, topic, nsfw, discord.ChannelType.forum))
+
+    async def create_voice_channel(self, name: str, category=None, position: int = None, overwrites: dict = None,
+                                   bitrate: int = 64000, user_limit: int = 0, nsfw: bool = False, **kwargs):
+        return await self.api.request('POST', f'/guilds/{self.id}/channels', lambda: self.add_voice_channel(
+            name, category, position, overwrites, bitrate, user_limit, nsfw))
+
+    async def create_stage_channel(self, name: str, category=None, position: int = None, overwrites: dict = None,
+                                   bitrate: int = 64000, user_limit: int = 0, nsfw: bool = False, **kwargs):
+        return await self.api.request('POST', f'/guilds/{self.id}/channels', lambda: self.add_voice_channel(
+            name, category, position, overwrites, bitrate, user_limit, nsfw, discord.ChannelType.stage_voice))
+
+
+class FakeClient:
+    """Ce que les commandes lisent du client connecté (compte, serveurs, latence)."""
+
+    def __init__(self, user, guilds=(), latency: float = 0.05):
+        self.user = user
+        self.guilds = list(guilds)
+        self.latency = latency
+
+    @property
+    def users(self) -> list:
+        users = {self.user.id: self.user}
+        for guild in self.guilds:
+            for member in guild._members.values():
+                users[member.id] = member
+        return list(users.values())
+
+    def get_guild(self, guild_id: int):
+        return next((guild for guild in self.guilds if guild.id == guild_id), None)
+
+    def get_channel(self, channel_id: int):
+        for guild in self.guilds:
+            channel = guild.get_channel(channel_id)
+            if channel is not None:
+                return channel
+        return None
+
+
+def build_synthetic_guild(api: FakeDiscordAPI, channels: int, roles: int = None, categories: int = None,
+                          name: str = None, seed: int = 0) -> FakeGuild:
+    """Serveur réaliste: `channels` salons (1 vocal sur 5) répartis en catégories, rôles cités dans les overwrites."""
+    rng = random.Random(seed)
+    guild = FakeGuild(api, name or f'Synthétique {channels}')
+    roles = roles if roles is not None else max(3, channels // 10)
+    categories = categories if categories is not None else max(1, channels // 10)
+
+    role_list = [guild.add_role(f'rôle-{index}', permissions=rng.getrandbits(40), colour=rng.getrandbits(24),
+                                hoist=index % 4 == 0, mentionable=index % 3 == 0) for index in range(roles)]
+    everyone = guild.default_role
+    hidden = discord.PermissionOverwrite(view_channel=False)
+
+    def overwrites():
+        chosen = rng.sample(role_list, k=min(len(role_list), rng.randint(0, 3)))
+        result = {role: discord.PermissionOverwrite(view_channel=True, send_messages=rng.random() < 0.5) for role in chosen}
+        if chosen and rng.random() < 0.5:
+            result[everyone] = hidden
+        return result
+
+    category_list = [guild.add_category(f'catégorie-{index}', overwrites=overwrites()) for index in range(categories)]
+    for index in range(channels):
+        category = category_list[index % len(category_list)]
+        if index % 5 == 4:
+            guild.add_voice_channel(f'vocal-{index}', category, overwrites=overwrites(), user_limit=index % 10)
+        else:
+            guild.add_text_channel(f'salon-{index}', category, overwrites=overwrites(),
+                                   topic=f'Sujet du salon {index}' if index % 2 else None, nsfw=index % 17 == 0)
+    return guild
+
+
+def fill_history(channel: FakeTextChannel, count: int, me, others, own_ratio: float = 0.5, span: timedelta = timedelta(days=7),
+                 seed: int = 0) -> int:
+    """Ajoute `count` messages répartis sur `span` (jusqu'à maintenant). Renvoie le nombre de messages de `me`."""
+    rng = random.Random(seed)
+    end = datetime.now(timezone.utc) - timedelta(seconds=1)
+    own = 0
+    for index in range(count):
+        when = end - span * (1 - index / max(1, count))
+        author = me if rng.random() < own_ratio else rng.choice(others)
+        own += author is me
+        channel.add_message(f'message {index} de {author.name}', author, when)
+    return own
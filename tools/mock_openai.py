@@ -0,0 +1,111 @@
+"""
+Faux serveur compatible OpenAI (POST /v1/chat/completions) pour tester et mesurer `!ai` hors ligne.
+
+Latence, débit du streaming et erreurs sont réglables:
+
+    python tools/mock_openai.py --port 8089 --latency 0.3 --token-delay 0.02 --tokens 60 --error-rate 0.05
+
+Puis dans .env: OPENAI_BASE_URL=http://127.0.0.1:8089/v1 (OPENAI_API_KEY peut rester vide).
+"""
+
+import json
+import time
+import random
+import asyncio
+import argparse
+
+from aiohttp import web
+
+WORDS = ('le', 'salon', 'est', 'calme', 'aujourd\'hui', 'et', 'la', 'réponse', 'arrive', 'vite', 'pour', 'tester')
+
+
+class MockOpenAI:
+    """Réponses synthétiques avec latence, streaming et erreurs injectées."""
+
+    def __init__(self, latency: float = 0.2, token_delay: float = 0.01, tokens: int = 40,
+                 error_rate: float = 0.0, error_status: int = 500, seed: int = None):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.tokens = tokens
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.stats = {'requests': 0, 'streams': 0, 'errors': 0}
+
+    def _text_tokens(self) -> list:
+        return [self.random.choice(WORDS) + ' ' for _ in range(self.tokens)]
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        payload = await request.json()
+        self.stats['requests'] += 1
+        await asyncio.sleep(self.latency)
+
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.stats['errors'] += 1
+            if self.error_status == 429:
+                return web.json_response({'error': {'message': 'Rate limit simulé'}}, status=429,
+                                         headers={'Retry-After': '1'})
+            return web.json_response({'error': {'message': f'Erreur simulée ({self.error_status})'}},
+                                     status=self.error_status)
+
+        model = payload.get('model', 'mock')
+        tokens = self._text_tokens()
+        if not payload.get('stream'):
+            await asyncio.sleep(self.token_delay * len(tokens))
+            return web.json_response({
+                'id': f'mock-{self.stats["requests"]}',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': ''.join(tokens)},
+                             'finish_reason': 'stop'}],
+                'usage': {'prompt_tokens': 0, 'completion_tokens': len(tokens), 'total_tokens': len(tokens)},
+            })
+
+        self.stats['streams'] += 1
+        response = web.StreamResponse(headers={'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache'})
+        await response.prepare(request)
+        for token in tokens:
+            chunk = {'object': 'chat.completion.chunk', 'model': model,
+                     'choices': [{'index': 0, 'delta': {'content': token}, 'finish_reason': None}]}
+            await response.write(f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'.encode('utf-8'))
+            if self.token_delay:
+                await asyncio.sleep(self.token_delay)
+        await response.write(b'data: [DONE]\n\n')
+        await response.write_eof()
+        return response
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post('/v1/chat/completions', self.chat_completions)
+        app.router.add_post('/chat/completions', self.chat_completions)
+        return app
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> tuple:
+        """Démarre le serveur dans la boucle courante. Renvoie (runner, URL de base à mettre dans OPENAI_BASE_URL)."""
+        runner = web.AppRunner(self.app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        bound_port = runner.addresses[0][1]
+        return runner, f'http://{host}:{bound_port}/v1'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Faux serveur compatible OpenAI')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.2, help='secondes avant le premier token')
+    parser.add_argument('--token-delay', type=float, default=0.01, help='secondes entre deux tokens')
+    parser.add_argument('--tokens', type=int, default=40, help='tokens par réponse')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='proportion de requêtes en erreur (0-1)')
+    parser.add_argument('--error-status', type=int, default=500, help='code HTTP des erreurs injectées')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    mock = MockOpenAI(args.latency, args.token_delay, args.tokens, args.error_rate, args.error_status, args.seed)
+    print(f'🧪 Faux serveur OpenAI sur http://{args.host}:{args.port}/v1')
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == '__main__':
+    main()